@@ -0,0 +1,70 @@
+"""
+Compare the running time of each evaluator on a few workloads.
+
+Run from the python directory with:
+
+    python -m benchmarks.compare_evaluators
+"""
+
+import sys
+import timeit
+
+from scheme.parser import parse
+from scheme.interpreter import create_global_env
+from scheme.evaluators import EVALUATORS
+
+# Truthiness of numbers is used in place of comparisons, so
+# (if n ...) tests whether n is non-zero
+FIB = """
+(define fib (n)
+    (if n
+        (if (- n 1)
+            (+ (fib (- n 1)) (fib (- n 2)))
+            1)
+        0))
+"""
+
+COUNT = """
+(define count (n)
+    (if n (+ 1 (count (- n 1))) 0))
+"""
+
+LOOP = """
+(define loop (n acc)
+    (if n (loop (- n 1) (+ acc 1)) acc))
+"""
+
+WORKLOADS = [
+    ("fib 18", FIB, "(fib 18)"),
+    ("tail loop 20000", LOOP, "(loop 20000 0)"),
+    ("non-tail recursion 800", COUNT, "(count 800)"),
+    ("non-tail recursion 50000", COUNT, "(count 50000)"),
+]
+
+REPEAT = 3
+
+
+def time_workload(evaluate, definitions, call):
+    env = create_global_env()
+    for exp in parse(definitions):
+        evaluate(exp, env)
+    [call_exp] = parse(call)
+    return min(timeit.repeat(lambda: evaluate(call_exp, env), number=1, repeat=REPEAT))
+
+
+def main():
+    names = list(EVALUATORS)
+    print(f"{'workload':<28}" + "".join(f"{name:>20}" for name in names))
+    for workload_name, definitions, call in WORKLOADS:
+        row = f"{workload_name:<28}"
+        for name in names:
+            try:
+                elapsed = time_workload(EVALUATORS[name], definitions, call)
+                row += f"{elapsed * 1000:>18.1f}ms"
+            except RecursionError:
+                row += f"{'RecursionError':>20}"
+        print(row)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+Measure the latency and throughput of an evaluation server under load,
+from many concurrent sessions each sending a series of requests.
+
+Run from the python directory, against a server started with
+`python server.py`, with:
+
+    python -m benchmarks.load_test --sessions 20 --requests 50
+
+or against a server started in the same process with `--in-process`.
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from typing import List
+
+from scheme.server import EvaluationServer, request, OK
+
+SETUP = "(define loop (n acc) (if n (loop (- n 1) (+ acc 1)) acc))"
+REQUEST = "(loop 500 0)"
+
+
+async def run_session(
+    connect, requests: int, latencies: List[float], errors: List[str]
+):
+    reader, writer = await connect()
+    try:
+        await request(reader, writer, SETUP)
+        for _ in range(requests):
+            start = time.perf_counter()
+            _, status = await request(reader, writer, REQUEST)
+            latencies.append(time.perf_counter() - start)
+            if not status.startswith(OK):
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def load_test(args) -> int:
+    server = None
+    if args.in_process:
+        # Every session's requests are queued, rather than refused
+        evaluation_server = EvaluationServer(max_queued=args.sessions)
+        server = await evaluation_server.start_tcp(args.host, 0)
+        port = server.sockets[0].getsockname()[1]
+    else:
+        port = args.port
+
+    if args.unix:
+        connect = lambda: asyncio.open_unix_connection(args.unix)  # noqa: E731
+    else:
+        connect = lambda: asyncio.open_connection(args.host, port)  # noqa: E731
+
+    latencies: List[float] = []
+    errors: List[str] = []
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            run_session(connect, args.requests, latencies, errors)
+            for _ in range(args.sessions)
+        )
+    )
+    elapsed = time.perf_counter() - start
+    if server is not None:
+        server.close()
+        evaluation_server.close()
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(f"{len(latencies)} requests from {args.sessions} sessions in {elapsed:.2f}s")
+    print(f"throughput: {len(latencies) / elapsed:.1f} requests/s")
+    print(
+        f"latency: mean {statistics.mean(latencies) * 1000:.1f}ms,"
+        f" p50 {quantiles[49] * 1000:.1f}ms,"
+        f" p95 {quantiles[94] * 1000:.1f}ms,"
+        f" p99 {quantiles[98] * 1000:.1f}ms"
+    )
+    if errors:
+        print(f"{len(errors)} errors, e.g. {errors[0]}")
+        return 1
+    return 0
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    arg_parser.add_argument("--unix", metavar="PATH")
+    arg_parser.add_argument("--sessions", type=int, default=10)
+    arg_parser.add_argument("--requests", type=int, default=20)
+    arg_parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="start a server in this process rather than connecting to one",
+    )
+    return asyncio.run(load_test(arg_parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
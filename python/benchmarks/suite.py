@@ -0,0 +1,353 @@
+"""
+Time a suite of classic Scheme workloads, and compare the times with a
+baseline to find regressions.
+
+Run from the python directory with:
+
+    python -m benchmarks.suite --save baseline.json
+
+to record a baseline, and after making a change:
+
+    python -m benchmarks.suite --compare baseline.json
+
+which exits with status 1 if any benchmark is slower than its baseline by
+more than the threshold, 10% by default. Baselines are only comparable
+when recorded on the same machine, with the same Python.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from scheme.evaluators import DEFAULT_EVALUATOR, EVALUATORS, Evaluator
+from scheme.interpreter import create_global_env
+from scheme.parser import parse
+
+RUN_PY = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "run.py"
+)
+
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.10
+
+FIB = """
+(define fib (n)
+    (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2)))))
+"""
+
+TAK = """
+(define tak (x y z)
+    (if (< y x)
+        (tak (tak (- x 1) y z) (tak (- y 1) z x) (tak (- z 1) x y))
+        z))
+"""
+
+ACKERMANN = """
+(define ack (m n)
+    (if (= m 0)
+        (+ n 1)
+        (if (= n 0)
+            (ack (- m 1) 1)
+            (ack (- m 1) (ack m (- n 1))))))
+"""
+
+LET_DEPTH = 40
+
+# A procedure whose body is LET_DEPTH nested lets, each binding a variable
+# from the one bound by the let enclosing it
+DEEP_LET = (
+    "(define nest (x0) "
+    + "".join(f"(let ((x{i + 1} (+ x{i} 1))) " for i in range(LET_DEPTH))
+    + f"x{LET_DEPTH}"
+    + ")" * (LET_DEPTH + 1)
+    + """
+(define loop (n acc)
+    (if n (loop (- n 1) (+ acc (nest n))) acc))
+"""
+)
+
+CURRIED = """
+(define add3 (a b c) (+ a (+ b c)))
+(define loop (n acc)
+    (if n (loop (- n 1) (((add3 n) 1) acc)) acc))
+"""
+
+BEGIN_LENGTH = 200
+
+LONG_BEGIN = (
+    "(define sequence (x) (begin "
+    + " ".join(f"(+ x {i})" for i in range(BEGIN_LENGTH))
+    + """))
+(define loop (n acc)
+    (if n (loop (- n 1) (+ acc (sequence n))) acc))
+"""
+)
+
+PARSED_DEFINITIONS = 5000
+
+LARGE_FILE = "".join(
+    f"""
+(define f{i} (x y)
+    (let ((a (+ x {i})) (b (* y {i}.5)))
+        (if (< a b) [f{i} (- a 1) b] {{+ a b #true}})))
+"""
+    for i in range(PARSED_DEFINITIONS)
+)
+
+
+class Benchmark:
+    """
+    A workload, which is timed by calling the function returned by
+    `setup`. Each result of the function is checked against `expected`,
+    so that a change can't make a benchmark faster by breaking it.
+    """
+
+    __slots__ = ("name", "setup", "expected")
+
+    def __init__(
+        self, name: str, setup: Callable[[Evaluator], Callable[[], Any]], expected: Any
+    ):
+        self.name = name
+        self.setup = setup
+        self.expected = expected
+
+    def __repr__(self):
+        return f"<benchmark {self.name}>"
+
+
+def scheme_call(
+    definitions: str, call: str
+) -> Callable[[Evaluator], Callable[[], Any]]:
+    """
+    Set up a benchmark of a call, in an environment with the definitions
+    """
+
+    def setup(evaluate: Evaluator) -> Callable[[], Any]:
+        env = create_global_env()
+        for exp in parse(definitions):
+            evaluate(exp, env)
+        [call_exp] = parse(call)
+        return lambda: evaluate(call_exp, env)
+
+    return setup
+
+
+def parse_large_file(_evaluate: Evaluator) -> Callable[[], Any]:
+    return lambda: len(parse(LARGE_FILE))
+
+
+def run_py_startup(_evaluate: Evaluator) -> Callable[[], Any]:
+    """
+    Run a trivial program with run.py, which is mostly the time taken to
+    start Python and import the interpreter
+    """
+    # Removed once the benchmark's function, which refers to it, is freed
+    directory = tempfile.TemporaryDirectory()
+    path = os.path.join(directory.name, "startup.scm")
+    with open(path, "w") as f:
+        f.write("(display (+ 1 2))")
+
+    def run():
+        assert directory
+        return subprocess.run(
+            [sys.executable, RUN_PY, path, "--no-cache"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+
+    return run
+
+
+BENCHMARKS = [
+    Benchmark("fib 20", scheme_call(FIB, "(fib 20)"), 6765),
+    Benchmark("tak 18 12 6", scheme_call(TAK, "(tak 18 12 6)"), 7),
+    Benchmark("ackermann 3 4", scheme_call(ACKERMANN, "(ack 3 4)"), 125),
+    Benchmark(
+        f"let nesting {LET_DEPTH}",
+        scheme_call(DEEP_LET, "(loop 2000 0)"),
+        2000 * 2001 // 2 + 2000 * LET_DEPTH,
+    ),
+    Benchmark(
+        "curried application",
+        scheme_call(CURRIED, "(loop 20000 0)"),
+        20000 * 20001 // 2 + 20000,
+    ),
+    Benchmark(
+        f"begin of {BEGIN_LENGTH}",
+        scheme_call(LONG_BEGIN, "(loop 1000 0)"),
+        1000 * 1001 // 2 + 1000 * (BEGIN_LENGTH - 1),
+    ),
+    Benchmark(
+        f"parse {PARSED_DEFINITIONS} definitions",
+        parse_large_file,
+        PARSED_DEFINITIONS,
+    ),
+    Benchmark("run.py startup", run_py_startup, "3\n"),
+]
+
+# The times of each benchmark, in seconds, by benchmark name
+Results = Dict[str, Dict[str, float]]
+
+
+def time_benchmark(
+    benchmark: Benchmark, evaluate: Evaluator, repeat: int
+) -> Dict[str, float]:
+    run = benchmark.setup(evaluate)
+
+    def checked_run():
+        result = run()
+        if result != benchmark.expected:
+            raise Exception(
+                f"{benchmark.name} gave {result!r}, expected {benchmark.expected!r}"
+            )
+
+    # The first run is not timed, so that it can warm any caches
+    checked_run()
+    times = timeit.repeat(checked_run, number=1, repeat=repeat)
+    return {"min": min(times), "median": statistics.median(times)}
+
+
+def run_benchmarks(benchmarks: List[Benchmark], evaluator: str, repeat: int) -> Results:
+    evaluate = EVALUATORS[evaluator]
+    results = {}
+    for benchmark in benchmarks:
+        results[benchmark.name] = time_benchmark(benchmark, evaluate, repeat)
+        print(
+            f"{benchmark.name:<32}{results[benchmark.name]['min'] * 1000:>12.1f}ms",
+            file=sys.stderr,
+        )
+    return results
+
+
+def compare(
+    results: Results, baseline: Results, threshold: float
+) -> Tuple[List[str], List[str]]:
+    """
+    The lines of a table comparing the minimum times of each benchmark
+    with the baseline, and the names of the benchmarks which have become
+    slower than the baseline by more than the threshold, as a fraction
+    of the baseline's time
+    """
+    lines = [f"{'benchmark':<32}{'baseline':>12}{'current':>12}{'change':>10}"]
+    regressions = []
+    for name, times in results.items():
+        if name not in baseline:
+            lines.append(f"{name:<32}{'-':>12}{times['min'] * 1000:>10.1f}ms")
+            continue
+        before, after = baseline[name]["min"], times["min"]
+        change = after / before - 1
+        line = (
+            f"{name:<32}{before * 1000:>10.1f}ms{after * 1000:>10.1f}ms"
+            f"{change:>+10.1%}"
+        )
+        if change > threshold:
+            regressions.append(name)
+            line += "  REGRESSION"
+        lines.append(line)
+    return lines, regressions
+
+
+def environment() -> Dict[str, str]:
+    """
+    What the results depend on besides the interpreter
+    """
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "node": platform.node(),
+    }
+
+
+def save(path: str, evaluator: str, results: Results):
+    with open(path, "w") as f:
+        json.dump(
+            {"environment": environment(), "evaluator": evaluator, "results": results},
+            f,
+            indent=2,
+        )
+        f.write("\n")
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv: Optional[List[str]] = None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument(
+        "--evaluator", choices=EVALUATORS.keys(), default=DEFAULT_EVALUATOR
+    )
+    arg_parser.add_argument(
+        "--repeat",
+        type=int,
+        default=DEFAULT_REPEAT,
+        help="the number of timed runs of each benchmark, of which the fastest"
+        " is compared",
+    )
+    arg_parser.add_argument(
+        "-k",
+        "--filter",
+        metavar="TEXT",
+        help="only run the benchmarks whose names contain TEXT",
+    )
+    arg_parser.add_argument(
+        "--save", metavar="FILE", help="write the results to FILE as a baseline"
+    )
+    arg_parser.add_argument(
+        "--compare", metavar="FILE", help="compare the results with the baseline FILE"
+    )
+    arg_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="the fraction by which a benchmark must be slower than its baseline"
+        " to be a regression (default: %(default)s)",
+    )
+    args = arg_parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        baseline = load(args.compare)
+        if baseline["evaluator"] != args.evaluator:
+            arg_parser.error(
+                f"the baseline is of the {baseline['evaluator']} evaluator"
+            )
+        if baseline["environment"] != environment():
+            print(
+                "warning: the baseline was recorded in a different environment:"
+                f" {baseline['environment']}",
+                file=sys.stderr,
+            )
+
+    benchmarks = [
+        benchmark
+        for benchmark in BENCHMARKS
+        if args.filter is None or args.filter in benchmark.name
+    ]
+    results = run_benchmarks(benchmarks, args.evaluator, args.repeat)
+
+    if args.save:
+        save(args.save, args.evaluator, results)
+
+    lines, regressions = compare(
+        results, {} if baseline is None else baseline["results"], args.threshold
+    )
+    print("\n".join(lines))
+    if regressions:
+        print(f"{len(regressions)} regressions: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,16 @@
+import argparse
+
 from scheme.parser import parse, MissingClosingParenError
-from scheme.interpreter import seval, create_global_env
+from scheme.interpreter import create_global_env
+from scheme.evaluators import EVALUATORS, DEFAULT_EVALUATOR
+
+arg_parser = argparse.ArgumentParser(description="Interactive scheme interpreter")
+arg_parser.add_argument(
+    "--evaluator", choices=EVALUATORS.keys(), default=DEFAULT_EVALUATOR
+)
+args = arg_parser.parse_args()
+
+evaluate = EVALUATORS[args.evaluator]
 
 global_env = create_global_env()
 
@@ -15,7 +26,7 @@ while True:
 
     try:
         for parsed in parse(expr_str):
-            result = seval(parsed, global_env)
+            result = evaluate(parsed, global_env)
             awaiting_further_input = False
         if result is not None:
             print(result)
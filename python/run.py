@@ -1,27 +1,233 @@
+import argparse
+import json
 import sys
 
-from scheme.parser import parse, MissingClosingParenError
-from scheme.interpreter import seval, create_global_env
+from scheme.interpreter import create_global_env, inline_cache_stats
+from scheme.evaluators import EVALUATORS, DEFAULT_EVALUATOR
+from scheme.compiler import compile_program, disassemble
+from scheme import cache, image, jit, memo, profiler
+from scheme.folding import fold_constants
 
-with open(sys.argv[1], "r") as f:
+arg_parser = argparse.ArgumentParser(description="Run a scheme program")
+arg_parser.add_argument(
+    "filenames",
+    nargs="+",
+    metavar="filename",
+    help="the program to run, or with --batch, any number of programs"
+    " or .jsonl files of programs",
+)
+arg_parser.add_argument(
+    "--evaluator", choices=EVALUATORS.keys(), default=DEFAULT_EVALUATOR
+)
+arg_parser.add_argument(
+    "--disassemble",
+    action="store_true",
+    help="print the bytecode the program compiles to, instead of running it",
+)
+arg_parser.add_argument(
+    "--jit-threshold",
+    type=int,
+    metavar="CALLS",
+    help="compile procedures to Python once called this many times",
+)
+arg_parser.add_argument(
+    "--jit-stats",
+    action="store_true",
+    help="print the decisions made by the JIT once the program has run",
+)
+arg_parser.add_argument(
+    "--no-cache",
+    action="store_true",
+    help=f"always parse the program, without using or writing {cache.CACHE_DIRECTORY}",
+)
+arg_parser.add_argument(
+    "--fold-constants",
+    action="store_true",
+    help="simplify constant subexpressions before evaluating them",
+)
+arg_parser.add_argument(
+    "--verbose",
+    action="store_true",
+    help="report the optimizations made to the program on stderr",
+)
+arg_parser.add_argument(
+    "--inline-cache-stats",
+    action="store_true",
+    help="print the cache hits and misses of global variable lookups at the end",
+)
+arg_parser.add_argument(
+    "--memo-stats",
+    action="store_true",
+    help="print the cache statistics of memoized procedures at the end",
+)
+arg_parser.add_argument(
+    "--profile",
+    action="store_true",
+    help="print the calls and time of each procedure once the program has run",
+)
+arg_parser.add_argument(
+    "--profile-sort",
+    choices=profiler.SORT_KEYS,
+    default="exclusive",
+    help="the statistic to sort the --profile report by",
+)
+arg_parser.add_argument(
+    "--profile-stacks",
+    metavar="FILE",
+    help="profile the program, writing the time spent in each stack of"
+    " procedure calls to FILE in the collapsed format used by flamegraph.pl",
+)
+arg_parser.add_argument(
+    "--workers",
+    type=int,
+    metavar="N",
+    help="the number of worker processes for pmap, future and --batch"
+    " (default: one per CPU)",
+)
+arg_parser.add_argument(
+    "--chunk-size",
+    type=int,
+    default=1,
+    metavar="N",
+    help="the number of pmap applications sent to a worker at a time",
+)
+arg_parser.add_argument(
+    "--batch",
+    action="store_true",
+    help="run each program in a fresh environment in a pool of workers,"
+    " printing a JSON line with the result and timing of each",
+)
+arg_parser.add_argument(
+    "--as-completed",
+    action="store_true",
+    help="with --batch, print each result as soon as it is ready,"
+    " rather than in the order the programs were given",
+)
+arg_parser.add_argument(
+    "--prelude",
+    metavar="FILE",
+    help="with --batch, a program to load into every program's environment",
+)
+arg_parser.add_argument(
+    "--image",
+    metavar="FILE",
+    help="start from the global environment saved in an image,"
+    " rather than a new one",
+)
+arg_parser.add_argument(
+    "--save-image",
+    metavar="FILE",
+    help="save the global environment to an image once the program has run",
+)
+args = arg_parser.parse_args()
+
+# The options which only apply to running a single program
+SINGLE_PROGRAM_OPTIONS = (
+    "--disassemble",
+    "--jit-threshold",
+    "--jit-stats",
+    "--fold-constants",
+    "--verbose",
+    "--inline-cache-stats",
+    "--memo-stats",
+    "--profile",
+    "--profile-sort",
+    "--profile-stacks",
+    "--chunk-size",
+    "--image",
+    "--save-image",
+)
+
+if args.batch:
+    # Imported only here, as it imports multiprocessing, which would slow
+    # the start of every program
+    from scheme import batch
+
+    for option in SINGLE_PROGRAM_OPTIONS:
+        dest = option[2:].replace("-", "_")
+        if getattr(args, dest) != arg_parser.get_default(dest):
+            arg_parser.error(f"{option} can't be used with --batch")
+    prelude = (
+        cache.load_program(args.prelude, use_cache=not args.no_cache)
+        if args.prelude
+        else ()
+    )
+    jobs = (job for filename in args.filenames for job in batch.read_jobs(filename))
+    with batch.BatchRunner(prelude, args.workers, args.evaluator) as runner:
+        for result in runner.run(jobs, ordered=not args.as_completed):
+            print(json.dumps(result.as_dict()), flush=True)
+    sys.exit()
+
+if len(args.filenames) > 1:
+    arg_parser.error("only one program can be run without --batch")
+if args.prelude or args.as_completed:
+    arg_parser.error("--prelude and --as-completed can only be used with --batch")
+[filename] = args.filenames
+
+if args.jit_threshold is not None or args.jit_stats:
+    if args.evaluator != "recursive":
+        arg_parser.error("only the recursive evaluator uses the JIT")
+if args.jit_threshold is not None:
+    jit.enable(args.jit_threshold)
+
+if args.profile or args.profile_stacks:
+    if args.evaluator != "recursive":
+        arg_parser.error("only the recursive evaluator can be profiled")
+    profiler.enable()
+
+if args.workers is not None or args.chunk_size != arg_parser.get_default("chunk_size"):
+    # scheme.parallel is otherwise only imported if the program uses it
+    from scheme import parallel
+
+    parallel.configure(args.workers, args.chunk_size)
+
+evaluate = EVALUATORS[args.evaluator]
+
+
+def report(message: str):
+    print(message, file=sys.stderr)
+
+
+if args.image:
+    try:
+        global_env = image.load_image(args.image)
+    except (OSError, image.ImageError) as e:
+        arg_parser.error(str(e))
+else:
     global_env = create_global_env()
-    tree = []
-    input = ""
-    final_parse_error = None
-    for line in f:
-        try:
-            input += " " + line
-            for parsed in parse(input):
-                tree.append(parsed)
-            final_parse_error = None
-        except MissingClosingParenError as e:
-            final_parse_error = e
-            continue
-        else:
-            input = ""
-
-    if final_parse_error is not None:
-        raise final_parse_error
-
-    for exp in tree:
-        seval(exp, global_env)
+program = cache.load_program(filename, use_cache=not args.no_cache)
+if args.fold_constants:
+    program = (
+        fold_constants(exp, global_env, report if args.verbose else None)
+        for exp in program
+    )
+
+if args.disassemble:
+    print(disassemble(compile_program(tuple(program), filename)))
+else:
+    for exp in program:
+        evaluate(exp, global_env)
+
+profiler.disable()
+
+if args.save_image:
+    try:
+        image.save_image(global_env, args.save_image)
+    except (OSError, image.ImageError) as e:
+        arg_parser.error(str(e))
+
+if args.jit_stats:
+    print(jit.format_stats())
+
+if args.inline_cache_stats:
+    hits, misses = inline_cache_stats()
+    print(f"Global variable lookups: {hits} cache hits, {misses} misses")
+
+if args.memo_stats:
+    print(memo.format_stats())
+
+if args.profile:
+    print(profiler.format_stats(args.profile_sort))
+
+if args.profile_stacks:
+    profiler.write_collapsed_stacks(args.profile_stacks)
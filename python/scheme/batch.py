@@ -0,0 +1,169 @@
+"""
+Evaluation of many small, independent programs in a pool of warm worker
+processes.
+
+The global environment, with any prelude loaded, is built once before
+the workers are forked, so each worker starts with a copy of it. Each
+program is evaluated in a fresh copy of that environment, which only
+copies the table of global variables, so programs can't see each
+other's definitions and nothing needs to be reloaded between them.
+
+Results can be returned in the order the programs were given, or as
+each one completes. Each result includes the time taken to evaluate its
+program in the worker.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import as_completed, ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from .common import ParsedExpression
+from .evaluators import DEFAULT_EVALUATOR, EVALUATORS
+from .interpreter import create_global_env, Environment
+from .parser import parse
+
+# The environment each program's environment is copied from, and the
+# evaluator to use. Set before the workers are forked, so that they
+# inherit them.
+_base_env: Optional[Environment] = None
+_evaluator = DEFAULT_EVALUATOR
+
+
+class Job:
+    """
+    A program to evaluate, identified by e.g. the file it was read from
+    """
+
+    __slots__ = ("id", "source")
+
+    def __init__(self, id: Any, source: str):
+        self.id = id
+        self.source = source
+
+    def __repr__(self):
+        return f"<job {self.id!r}>"
+
+
+class JobResult:
+    """
+    The outcome of evaluating a program: the value of its last expression,
+    what it displayed, or the error it raised, and how long it took
+    """
+
+    __slots__ = ("id", "value", "output", "error", "seconds")
+
+    def __init__(
+        self,
+        id: Any,
+        value: Optional[str],
+        output: str,
+        error: Optional[str],
+        seconds: float,
+    ):
+        self.id = id
+        self.value = value
+        self.output = output
+        self.error = error
+        self.seconds = seconds
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "value": self.value,
+            "output": self.output,
+            "error": self.error,
+            "seconds": self.seconds,
+        }
+
+    def __repr__(self):
+        return f"<result of job {self.id!r}>"
+
+
+class BatchRunner:
+    def __init__(
+        self,
+        prelude: Iterable[ParsedExpression] = (),
+        workers: Optional[int] = None,
+        evaluator: str = DEFAULT_EVALUATOR,
+    ):
+        global _base_env, _evaluator
+        env = create_global_env()
+        evaluate = EVALUATORS[evaluator]
+        for exp in prelude:
+            evaluate(exp, env)
+
+        _base_env = env
+        _evaluator = evaluator
+        self._pool = ProcessPoolExecutor(
+            workers or os.cpu_count(), mp_context=multiprocessing.get_context("fork")
+        )
+        # With fork, all of the workers are started by the first submission
+        self._pool.submit(int).result()
+
+    def run(
+        self, jobs: Iterable[Job], ordered: bool = True, chunk_size: int = 1
+    ) -> Iterator[JobResult]:
+        """
+        Evaluate each job's program, yielding the results in the order of
+        the jobs, or if `ordered` is false, as soon as each is complete
+        """
+        if ordered:
+            return self._pool.map(run_job, jobs, chunksize=chunk_size)
+        futures = [self._pool.submit(run_job, job) for job in jobs]
+        return (future.result() for future in as_completed(futures))
+
+    def close(self):
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def run_job(job: Job) -> JobResult:
+    """
+    Evaluate a job's program in a copy of the base environment. Run in
+    a worker.
+    """
+    assert _base_env is not None
+    env = _base_env.copy()
+    evaluate = EVALUATORS[_evaluator]
+    output = io.StringIO()
+    value = error = None
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        try:
+            result = None
+            for exp in parse(job.source):
+                result = evaluate(exp, env)
+            value = None if result is None else str(result)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+    seconds = time.perf_counter() - start
+    return JobResult(job.id, value, output.getvalue(), error, seconds)
+
+
+def read_jobs(path: str) -> Iterator[Job]:
+    """
+    The jobs in a file: a program, identified by the file's path, or for
+    a `.jsonl` file, one job per line with its `source`, and optionally
+    an `id`, which defaults to the line number
+    """
+    with open(path) as f:
+        if not path.endswith(".jsonl"):
+            yield Job(path, f.read())
+            return
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            yield Job(record.get("id", line_number), record["source"])
@@ -0,0 +1,270 @@
+"""
+Loads large s-expression data files without building the whole tree of
+parsed expressions.
+
+The file is memory mapped and scanned once, recording each list and
+atom as a node in a table held in flat arrays: the node's kind, the
+offset in the file at which its token starts, and for lists, the index
+of the first node after the list's contents. Nodes are stored in the
+order they appear in the file, so the contents of a list follow it
+directly.
+
+The table takes a fixed number of bytes per token, and the text of
+atoms stays in the mapped file, which the operating system pages in
+and out as needed. Top level expressions, or any node within one, are
+only turned into parsed expressions when they are accessed.
+"""
+
+from __future__ import annotations
+
+import mmap
+import re
+from array import array
+from typing import Iterator, List, Tuple, Union
+
+from .common import ParsedExpression
+from .parser import atom_value, MissingClosingParenError
+
+Buffer = Union[bytes, mmap.mmap]
+
+TOKEN_PATTERN = re.compile(rb"[()\[\]{}]|[^\s()\[\]{}]+")
+
+ATOM = 0
+LIST = 1
+
+_OPENERS = frozenset(b"([{")
+_CLOSER_TO_OPENER = {ord(")"): ord("("), ord("]"): ord("["), ord("}"): ord("{")}
+
+
+class NodeTable:
+    """
+    The nodes of the expressions in a buffer, as a struct of arrays
+    """
+
+    kinds: array
+    offsets: array
+    ends: array
+    roots: array
+
+    def __init__(
+        self, buffer: Buffer, kinds: array, offsets: array, ends: array, roots: array
+    ):
+        self._buffer = buffer
+        self.kinds = kinds
+        self.offsets = offsets
+        self.ends = ends
+        self.roots = roots
+
+    @classmethod
+    def scan(cls, buffer: Buffer) -> NodeTable:
+        kinds = array("B")
+        offsets = array("q")
+        ends = array("q")
+        roots = array("q")
+        open_lists: List[int] = []
+        node_count = 0
+
+        for match in TOKEN_PATTERN.finditer(buffer):
+            start = match.start()
+            first = buffer[start]
+            if first in _CLOSER_TO_OPENER:
+                if not open_lists:
+                    raise SyntaxError(
+                        f"Unmatched {chr(first)} at {_describe(buffer, start)}"
+                    )
+                node = open_lists.pop()
+                opener = buffer[offsets[node]]
+                if _CLOSER_TO_OPENER[first] != opener:
+                    raise SyntaxError(
+                        f"Expected closing paren for {chr(opener)} opened at"
+                        f" {_describe(buffer, offsets[node])},"
+                        f" got {chr(first)} at {_describe(buffer, start)}"
+                    )
+                ends[node] = node_count
+                continue
+
+            if not open_lists:
+                roots.append(node_count)
+            offsets.append(start)
+            ends.append(node_count + 1)
+            if first in _OPENERS:
+                kinds.append(LIST)
+                open_lists.append(node_count)
+            else:
+                kinds.append(ATOM)
+            node_count += 1
+
+        if open_lists:
+            offset = offsets[open_lists[-1]]
+            raise MissingClosingParenError(
+                f"Missing expected closing paren for {chr(buffer[offset])}"
+                f" opened at {_describe(buffer, offset)}"
+            )
+        return cls(buffer, kinds, offsets, ends, roots)
+
+    def __len__(self):
+        """
+        The number of top level expressions
+        """
+        return len(self.roots)
+
+    def __getitem__(self, index: int) -> ParsedExpression:
+        return self.materialize(self.roots[index])
+
+    def __iter__(self) -> Iterator[ParsedExpression]:
+        """
+        Iterate over the top level expressions, materializing each one
+        only as it is reached
+        """
+        for root in self.roots:
+            yield self.materialize(root)
+
+    def node(self, index: int) -> Node:
+        return Node(self, index)
+
+    def root(self, index: int) -> Node:
+        """
+        The node of a top level expression, which can be inspected
+        without materializing the whole expression
+        """
+        return Node(self, self.roots[index])
+
+    @property
+    def node_count(self) -> int:
+        return len(self.kinds)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The size of the table, not including the buffer
+        """
+        return sum(a.itemsize * len(a) for a in (self.kinds, self.offsets, self.ends))
+
+    def text(self, index: int) -> str:
+        """
+        The source text of an atom's token
+        """
+        match = TOKEN_PATTERN.match(self._buffer, self.offsets[index])
+        assert match is not None
+        return match.group().decode()
+
+    def materialize(self, index: int) -> ParsedExpression:
+        """
+        Build the parsed expression of a node, as the parser would
+        """
+        kinds = self.kinds
+        ends = self.ends
+        if kinds[index] == ATOM:
+            return atom_value(self.text(index))
+
+        # The lists being built, innermost last, with their items so far.
+        # Lists may be nested deeper than the Python stack allows.
+        building: List[Tuple[int, List[ParsedExpression]]] = [(index, [])]
+        node = index + 1
+        while True:
+            list_node, items = building[-1]
+            if node == ends[list_node]:
+                building.pop()
+                value = tuple(items)
+                if not building:
+                    return value
+                building[-1][1].append(value)
+            elif kinds[node] == LIST:
+                building.append((node, []))
+                node += 1
+            else:
+                items.append(atom_value(self.text(node)))
+                node += 1
+
+    def close(self):
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Node:
+    """
+    A view of a list or atom in a NodeTable
+    """
+
+    __slots__ = ("_table", "index")
+
+    _table: NodeTable
+    index: int
+
+    def __init__(self, table: NodeTable, index: int):
+        self._table = table
+        self.index = index
+
+    @property
+    def is_list(self) -> bool:
+        return self._table.kinds[self.index] == LIST
+
+    @property
+    def text(self) -> str:
+        """
+        The source text of an atom
+        """
+        if self.is_list:
+            raise TypeError("A list has no text")
+        return self._table.text(self.index)
+
+    @property
+    def value(self) -> ParsedExpression:
+        return self._table.materialize(self.index)
+
+    def __iter__(self) -> Iterator[Node]:
+        """
+        Iterate over the items of a list
+        """
+        if not self.is_list:
+            raise TypeError("Only a list has items")
+        ends = self._table.ends
+        end = ends[self.index]
+        child = self.index + 1
+        while child < end:
+            yield Node(self._table, child)
+            child = ends[child]
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __getitem__(self, index: int) -> Node:
+        for i, child in enumerate(self):
+            if i == index:
+                return child
+        raise IndexError(index)
+
+    def __repr__(self):
+        kind = "list" if self.is_list else "atom"
+        return f"<{kind} node {self.index}>"
+
+
+def load(path: str) -> NodeTable:
+    """
+    Memory map a file and scan it into a node table. The file stays
+    mapped until the table is closed.
+    """
+    with open(path, "rb") as f:
+        try:
+            buffer: Buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # An empty file cannot be mapped
+            buffer = b""
+    try:
+        return NodeTable.scan(buffer)
+    except BaseException:
+        if isinstance(buffer, mmap.mmap):
+            buffer.close()
+        raise
+
+
+def _describe(buffer: Buffer, offset: int) -> str:
+    line_start = buffer.rfind(b"\n", 0, offset) + 1
+    line = buffer[:line_start].count(b"\n") + 1
+    return f"line {line}, column {offset - line_start + 1}"
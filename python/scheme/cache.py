@@ -0,0 +1,222 @@
+"""
+An on-disk cache of parsed programs, so that running the same source
+file again skips the parser.
+
+Like Python's __pycache__, each source file's cache lives in a
+`__schemecache__` directory alongside it. A cache file records the
+format version and a SHA-256 hash of the source it was parsed from, and
+is only used when both match, so editing the source or upgrading the
+parser invalidates it. It is followed by the parsed top level
+expressions, which are nested tuples of numbers, booleans and strings,
+each stored with marshal as it is read, and loaded one at a time as it
+is evaluated, so that only one expression is held in memory at a time
+whether the cache is used or not. Each is preceded by its length, as
+marshal loads an expression from bytes much faster than from a file.
+
+Analyzed expressions are not cached, as they hold references into the
+special form registry and the scopes they were analyzed in.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import itertools
+import marshal
+import os
+import tempfile
+from typing import BinaryIO, Callable, Iterable, Iterator, Optional, TextIO
+
+from .common import ParsedExpression
+from .parser import read_stream
+
+CACHE_DIRECTORY = "__schemecache__"
+CACHE_SUFFIX = ".parsed"
+
+# Increase whenever the parser changes the expressions it produces,
+# or the layout of cache files changes
+FORMAT_VERSION = 4
+
+MAGIC = b"SCMP"
+
+HASH_CHUNK_SIZE = 1 << 16
+
+LENGTH_SIZE = 4
+
+SourceReader = Callable[[TextIO], Iterable[ParsedExpression]]
+
+
+def cache_path(source_path: str) -> str:
+    directory, filename = os.path.split(os.path.abspath(source_path))
+    return os.path.join(directory, CACHE_DIRECTORY, filename + CACHE_SUFFIX)
+
+
+def source_hash(source_path: str) -> bytes:
+    digest = hashlib.sha256()
+    with open(source_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def load_program(
+    source_path: str,
+    read_source: SourceReader = read_stream,
+    use_cache: bool = True,
+) -> Iterator[ParsedExpression]:
+    """
+    Iterate over the top level expressions of a source file, using its
+    cached parsed expressions if they are up to date. Otherwise the
+    source is read with `read_source`, and the expressions are written to
+    the cache as they are read, so that they can be evaluated without
+    waiting for the rest of the file.
+    """
+    if not use_cache:
+        return _read_source_file(source_path, read_source)
+
+    path = cache_path(source_path)
+    digest = source_hash(source_path)
+    cached = read_cache(path, digest)
+    if cached is not None:
+        return _read_cached(cached, source_path, read_source, path, digest)
+    return _read_and_cache(source_path, read_source, path, digest)
+
+
+class CorruptCacheError(Exception):
+    pass
+
+
+def read_cache(path: str, digest: bytes) -> Optional[Iterator[ParsedExpression]]:
+    """
+    Iterate over the parsed expressions in a cache file, loading each as
+    it is needed, or return None if the file does not exist or is stale.
+    The iterator raises CorruptCacheError if the rest of the file turns
+    out to be unreadable.
+    """
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return None
+    try:
+        header = _header(digest)
+        if f.read(len(header)) != header:
+            f.close()
+            return None
+    except OSError:
+        f.close()
+        return None
+    return _load_expressions(f)
+
+
+def _load_expressions(f: BinaryIO) -> Iterator[ParsedExpression]:
+    with f:
+        try:
+            while length_bytes := f.read(LENGTH_SIZE):
+                length = int.from_bytes(length_bytes, "little")
+                data = f.read(length)
+                if len(length_bytes) < LENGTH_SIZE or len(data) < length:
+                    raise EOFError("The cache file is truncated")
+                yield marshal.loads(data)
+        except (OSError, EOFError, ValueError, TypeError) as e:
+            raise CorruptCacheError(f"Unreadable cache file {f.name}") from e
+
+
+def _read_cached(
+    cached: Iterator[ParsedExpression],
+    source_path: str,
+    read_source: SourceReader,
+    path: str,
+    digest: bytes,
+) -> Iterator[ParsedExpression]:
+    count = 0
+    try:
+        for exp in cached:
+            yield exp
+            count += 1
+    except CorruptCacheError:
+        # The expressions already yielded are those at the start of the
+        # source, as the cache was written from the same source, so the
+        # rest are read from the source, which also rewrites the cache
+        yield from itertools.islice(
+            _read_and_cache(source_path, read_source, path, digest), count, None
+        )
+
+
+def _read_source_file(
+    source_path: str, read_source: SourceReader
+) -> Iterator[ParsedExpression]:
+    with open(source_path, "r") as f:
+        yield from read_source(f)
+
+
+def _read_and_cache(
+    source_path: str, read_source: SourceReader, path: str, digest: bytes
+) -> Iterator[ParsedExpression]:
+    writer = _CacheWriter.open(path, digest)
+    if writer is None:
+        yield from _read_source_file(source_path, read_source)
+        return
+
+    complete = False
+    try:
+        for exp in _read_source_file(source_path, read_source):
+            writer.write(exp)
+            yield exp
+        complete = True
+    finally:
+        writer.close(keep=complete)
+
+
+class _CacheWriter:
+    """
+    Writes a cache file under a temporary name, renaming it once all of
+    the program has been read, so that neither concurrent runs nor runs
+    after a syntax error read a partially written cache. As with
+    __pycache__, failing to write the cache is not an error.
+    """
+
+    def __init__(self, path: str, temp_path: str, file: BinaryIO):
+        self._path = path
+        self._temp_path = temp_path
+        self._file = file
+        self._failed = False
+
+    @classmethod
+    def open(cls, path: str, digest: bytes) -> Optional[_CacheWriter]:
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            file = os.fdopen(fd, "wb")
+            file.write(_header(digest))
+        except OSError:
+            return None
+        return cls(path, temp_path, file)
+
+    def write(self, exp: ParsedExpression):
+        if self._failed:
+            return
+        try:
+            data = marshal.dumps(exp)
+            self._file.write(len(data).to_bytes(LENGTH_SIZE, "little"))
+            self._file.write(data)
+        except (OSError, ValueError):
+            self._failed = True
+
+    def close(self, keep: bool):
+        try:
+            self._file.close()
+            if keep and not self._failed:
+                os.replace(self._temp_path, self._path)
+            else:
+                os.unlink(self._temp_path)
+        except OSError:
+            pass
+
+
+def _header(digest: bytes) -> bytes:
+    return (
+        MAGIC
+        + FORMAT_VERSION.to_bytes(2, "little")
+        + marshal.version.to_bytes(2, "little")
+        + digest
+    )
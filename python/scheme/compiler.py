@@ -0,0 +1,378 @@
+"""
+Compiles parsed expressions to a linear bytecode, which is run by the
+stack machine in scheme.vm.
+
+Each procedure body is compiled to its own CodeObject, holding a list of
+(opcode, argument) instructions, a pool of constants (including the code
+objects of nested lambda expressions) and a table of global names.
+Local variables are resolved to frame slots with the same Scope used by
+the interpreter's lexical addressing, so compiled code uses the same
+Frames at runtime.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from .common import ParsedExpression, ParsedExpressionList
+from . import interpreter
+from .interpreter import (
+    analyze,
+    is_list,
+    is_let_assignment,
+    is_proc_header,
+    scan_definitions,
+    InlineCache,
+    ProcHeader,
+    Scope,
+    UNASSIGNED,
+)
+
+# Opcodes
+
+CONST = 0  # push constants[arg]
+LOAD_LOCAL = 1  # push slot arg of the current frame
+LOAD_DEREF = 2  # push slot arg[1] of the frame arg[0] levels up
+LOAD_CHECKED = 3  # as LOAD_DEREF, raising KeyError(arg[2]) if unassigned
+LOAD_GLOBAL = 4  # push the global variable names[arg], via global_caches[arg]
+DEFINE_GLOBAL = 5  # pop a value and define global variable names[arg]
+DEFINE_LOCAL = 6  # pop a value and assign it to internal definition slot arg
+STORE_LOCAL = 7  # pop a value and store it in slot arg of the current frame
+PUSH_FRAME = 8  # enter a new frame with arg slots, enclosed by the current one
+POP_FRAME = 9  # return to the enclosing frame
+JUMP = 10  # continue from instruction arg
+JUMP_IF_FALSE = 11  # pop a value, and if it is false continue from arg
+MAKE_CLOSURE = 12  # push a closure of code object constants[arg]
+CALL = 13  # call a procedure with arg arguments
+TAIL_CALL = 14  # as CALL, but replace the current procedure call
+RETURN = 15  # return from the current procedure call
+POP = 16  # discard the value on top of the stack
+EVAL_ANALYZED = 17  # evaluate the interpreter expression constants[arg]
+# Call the global variable names[arg[0]], via global_caches[arg[0]], with
+# arg[1] arguments. The last of them are the operands arg[2], each a slot
+# of the current frame, or ~i for constants[i], and the rest are popped.
+CALL_GLOBAL = 18
+TAIL_CALL_GLOBAL = 19  # as CALL_GLOBAL, but replace the current procedure call
+
+# The instructions which use the current frame, rather than its variables
+FRAME_OPCODES = frozenset(
+    {LOAD_DEREF, LOAD_CHECKED, PUSH_FRAME, POP_FRAME, MAKE_CLOSURE, EVAL_ANALYZED}
+)
+
+OPCODE_NAMES = {
+    value: name
+    for name, value in list(globals().items())
+    if name.isupper() and isinstance(value, int)
+}
+
+Instruction = Tuple[int, Any]
+
+
+class CodeObject:
+
+    name: str
+    n_params: int
+    frame_size: int
+    # The values of the slots of a call's frame after its arguments
+    spare_slots: Tuple[Any, ...]
+    # Whether a call needs a Frame, rather than just the list of its
+    # variables, as the code refers to the frame itself
+    needs_frame: bool
+    instructions: List[Instruction]
+    constants: List[Any]
+    names: List[str]
+    global_caches: List[InlineCache]
+
+    def __init__(self, name: str, n_params: int = 0):
+        self.name = name
+        self.n_params = n_params
+        self.frame_size = 0
+        self.spare_slots = ()
+        self.needs_frame = True
+        self.instructions = []
+        self.constants = []
+        self.names = []
+        self.global_caches = []
+        self._name_indices: Dict[str, int] = {}
+
+    def emit(self, op: int, arg: Any = None) -> int:
+        self.instructions.append((op, arg))
+        return len(self.instructions) - 1
+
+    def patch(self, index: int, arg: Any):
+        op, _ = self.instructions[index]
+        self.instructions[index] = (op, arg)
+
+    def add_constant(self, value: Any) -> int:
+        self.constants.append(value)
+        return len(self.constants) - 1
+
+    def add_name(self, name: str) -> int:
+        index = self._name_indices.get(name)
+        if index is None:
+            index = self._name_indices[name] = len(self.names)
+            self.names.append(name)
+            self.global_caches.append(InlineCache(name))
+        return index
+
+    @property
+    def next_index(self) -> int:
+        return len(self.instructions)
+
+    def __repr__(self):
+        return f"<code {self.name}>"
+
+
+class CompileError(Exception):
+    pass
+
+
+def compile_program(exps: ParsedExpressionList, name: str = "<program>"):
+    """
+    Compile a sequence of top level expressions, evaluated in the global
+    environment. Running the code returns the value of the last one.
+    """
+    code = CodeObject(name)
+    if not exps:
+        code.emit(CONST, code.add_constant(None))
+    for i, exp in enumerate(exps):
+        if i > 0:
+            code.emit(POP)
+        compile_expression(exp, code, None, tail=False)
+    code.emit(RETURN)
+    return code
+
+
+def compile_expression(
+    exp: ParsedExpression, code: CodeObject, scope: Optional[Scope], tail: bool
+):
+    if is_list(exp):
+        if exp and isinstance(exp[0], str):
+            compile_special_form = SPECIAL_FORM_COMPILERS.get(exp[0])
+            if compile_special_form is not None:
+                if compile_special_form(exp, code, scope, tail):
+                    return
+            elif exp[0] in interpreter.SPECIAL_FORMS:
+                _compile_analyzed(exp, code, scope)
+                return
+        _compile_application(exp, code, scope, tail)
+    elif isinstance(exp, str):
+        _compile_variable(exp, code, scope)
+    elif isinstance(exp, (bool, int, float)):
+        code.emit(CONST, code.add_constant(exp))
+    else:
+        raise CompileError("Bad expression")
+
+
+def _compile_analyzed(exp: ParsedExpression, code: CodeObject, scope: Optional[Scope]):
+    """
+    Fall back to the interpreter for special forms the compiler does
+    not know about. Analyzed expressions use the same frames as
+    compiled code, so can be evaluated in the current environment.
+    """
+    code.emit(EVAL_ANALYZED, code.add_constant(analyze(exp, scope)))
+
+
+def _compile_variable(name: str, code: CodeObject, scope: Optional[Scope]):
+    address = None if scope is None else scope.resolve(name)
+    if scope is None or address is None:
+        code.emit(LOAD_GLOBAL, code.add_name(name))
+        return
+    depth, index, may_be_unassigned = address
+    if may_be_unassigned and scope.unassigned_let_scope(name) is not None:
+        # Refers to the variable the let's variable shadows until assigned,
+        # which the interpreter's analyzed variable finds
+        code.emit(EVAL_ANALYZED, code.add_constant(analyze(name, scope)))
+    elif may_be_unassigned:
+        code.emit(LOAD_CHECKED, (depth, index, name))
+    elif depth == 0:
+        code.emit(LOAD_LOCAL, index)
+    else:
+        code.emit(LOAD_DEREF, (depth, index))
+
+
+def _compile_application(
+    exp: ParsedExpressionList, code: CodeObject, scope: Optional[Scope], tail: bool
+):
+    if not exp:
+        raise CompileError("Bad expression")
+    proc_exp, *arg_exps = exp
+    if isinstance(proc_exp, str) and (scope is None or scope.resolve(proc_exp) is None):
+        # The trailing arguments which are constants or local variables
+        # are loaded by the call instruction itself
+        operands: List[int] = []
+        while scope is not None and len(operands) < len(arg_exps):
+            operand = _operand(arg_exps[-len(operands) - 1], code, scope)
+            if operand is None:
+                break
+            operands.insert(0, operand)
+        for arg_exp in arg_exps[: len(arg_exps) - len(operands)]:
+            compile_expression(arg_exp, code, scope, tail=False)
+        code.emit(
+            TAIL_CALL_GLOBAL if tail else CALL_GLOBAL,
+            (code.add_name(proc_exp), len(arg_exps), tuple(operands)),
+        )
+        return
+    for sub_exp in exp:
+        compile_expression(sub_exp, code, scope, tail=False)
+    code.emit(TAIL_CALL if tail else CALL, len(arg_exps))
+
+
+def _operand(
+    exp: ParsedExpression, code: CodeObject, scope: Optional[Scope]
+) -> Optional[int]:
+    """
+    The operand of a call instruction for an argument which is a constant
+    or an assigned variable of the current frame, or None for any other
+    """
+    if isinstance(exp, (bool, int, float)):
+        return ~code.add_constant(exp)
+    if isinstance(exp, str) and scope is not None:
+        address = scope.resolve(exp)
+        if address is not None and address[0] == 0 and not address[2]:
+            return address[1]
+    return None
+
+
+def _compile_if(exp, code: CodeObject, scope: Optional[Scope], tail: bool):
+    if len(exp) != 4:
+        return False
+    _, test, true_branch, false_branch = exp
+    compile_expression(test, code, scope, tail=False)
+    jump_to_false_branch = code.emit(JUMP_IF_FALSE)
+    compile_expression(true_branch, code, scope, tail)
+    if tail:
+        # A tail expression is followed by a return, so return directly
+        # rather than jumping to it
+        code.emit(RETURN)
+        code.patch(jump_to_false_branch, code.next_index)
+        compile_expression(false_branch, code, scope, tail)
+        return True
+    jump_to_end = code.emit(JUMP)
+    code.patch(jump_to_false_branch, code.next_index)
+    compile_expression(false_branch, code, scope, tail)
+    code.patch(jump_to_end, code.next_index)
+    return True
+
+
+def _compile_begin(exp, code: CodeObject, scope: Optional[Scope], tail: bool):
+    if len(exp) < 2:
+        return False
+    statements = exp[1:]
+    for statement in statements[:-1]:
+        compile_expression(statement, code, scope, tail=False)
+        code.emit(POP)
+    compile_expression(statements[-1], code, scope, tail)
+    return True
+
+
+def _compile_let(exp, code: CodeObject, scope: Optional[Scope], tail: bool):
+    if not (len(exp) == 3 and is_list(exp[1])):
+        return False
+    assignments = [a for a in exp[1] if is_let_assignment(a)]
+    if len(assignments) != len(exp[1]):
+        return False
+
+    # Within a procedure, the let's variables are stored in spare slots
+    # of the procedure's frame, so only a top level let enters a frame
+    let_scope = Scope(enclosing=scope, shares_frame=scope is not None)
+    if not let_scope.shares_frame:
+        push_frame = code.emit(PUSH_FRAME)
+    indices = let_scope.add_let_variables(name for name, _ in assignments)
+    for (name, value_expr), index in zip(assignments, indices):
+        compile_expression(value_expr, code, let_scope, tail=False)
+        code.emit(STORE_LOCAL, index)
+        let_scope.assign_let_variable(name)
+
+    body = exp[2]
+    for name in scan_definitions(body):
+        let_scope.add_definition(name)
+    compile_expression(body, code, let_scope, tail)
+
+    if not let_scope.shares_frame:
+        code.patch(push_frame, let_scope.size)
+        if not tail:
+            # In tail position, returning from the procedure leaves the frame
+            code.emit(POP_FRAME)
+    return True
+
+
+def _compile_lambda(exp, code: CodeObject, scope: Optional[Scope], tail: bool):
+    if not (len(exp) == 3 and is_proc_header(exp[1])):
+        return False
+    lambda_code = compile_lambda(exp[1], exp[2], scope)
+    code.emit(MAKE_CLOSURE, code.add_constant(lambda_code))
+    return True
+
+
+def compile_lambda(
+    header: ProcHeader,
+    body: ParsedExpression,
+    scope: Optional[Scope],
+    name: str = "<lambda>",
+) -> CodeObject:
+    body_scope = Scope(header, scope)
+    for defined_name in scan_definitions(body):
+        body_scope.add_definition(defined_name)
+
+    code = CodeObject(name, len(header))
+    compile_expression(body, code, body_scope, tail=True)
+    code.emit(RETURN)
+    code.frame_size = body_scope.size
+    code.spare_slots = (UNASSIGNED,) * (code.frame_size - code.n_params)
+    code.needs_frame = any(op in FRAME_OPCODES for op, _ in code.instructions)
+    return code
+
+
+def _compile_define(exp, code: CodeObject, scope: Optional[Scope], tail: bool):
+    if len(exp) == 3 and isinstance(exp[1], str):
+        name = exp[1]
+        compile_expression(exp[2], code, scope, tail=False)
+    elif len(exp) == 4 and isinstance(exp[1], str) and is_proc_header(exp[2]):
+        name = exp[1]
+        lambda_code = compile_lambda(exp[2], exp[3], scope, name)
+        code.emit(MAKE_CLOSURE, code.add_constant(lambda_code))
+    else:
+        return False
+
+    if scope is None:
+        code.emit(DEFINE_GLOBAL, code.add_name(name))
+    else:
+        code.emit(DEFINE_LOCAL, (scope.add_definition(name), name))
+    code.emit(CONST, code.add_constant(None))
+    return True
+
+
+SPECIAL_FORM_COMPILERS = {
+    "if": _compile_if,
+    "begin": _compile_begin,
+    "let": _compile_let,
+    "lambda": _compile_lambda,
+    "define": _compile_define,
+}
+
+
+def disassemble(code: CodeObject) -> str:
+    """
+    Produce a human readable listing of a code object, followed by
+    the listings of the code objects of any lambdas within it
+    """
+    lines = [f"Disassembly of {code.name}:"]
+    nested = []
+    for index, (op, arg) in enumerate(code.instructions):
+        line = f"{index:>6} {OPCODE_NAMES[op]:<18}"
+        if arg is not None:
+            line += f"{arg!r:<10} "
+        if op in (CONST, MAKE_CLOSURE, EVAL_ANALYZED):
+            line += f"({code.constants[arg]!r})"
+        elif op in (LOAD_GLOBAL, DEFINE_GLOBAL):
+            line += f"({code.names[arg]})"
+        elif op in (CALL_GLOBAL, TAIL_CALL_GLOBAL):
+            line += f"({code.names[arg[0]]})"
+        lines.append(line.rstrip())
+        if op == MAKE_CLOSURE:
+            nested.append(code.constants[arg])
+    for nested_code in nested:
+        lines.append("")
+        lines.append(disassemble(nested_code))
+    return "\n".join(lines)
@@ -0,0 +1,18 @@
+from typing import Any, Callable, Dict
+
+from .common import ParsedExpression
+from .interpreter import seval, Environment
+from .explicit_control import ec_seval
+from .vm import vm_seval
+from .transpiler import py_seval
+
+Evaluator = Callable[[ParsedExpression, Environment], Any]
+
+EVALUATORS: Dict[str, Evaluator] = {
+    "recursive": seval,
+    "explicit-control": ec_seval,
+    "bytecode": vm_seval,
+    "python": py_seval,
+}
+
+DEFAULT_EVALUATOR = "recursive"
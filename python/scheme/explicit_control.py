@@ -0,0 +1,204 @@
+"""
+An explicit-control evaluator, modeled on SICP chapter 5.5 [1].
+
+Rather than recursing through `seval`, the evaluator runs a single loop
+over a small set of registers, saving whatever it needs to resume a
+partially evaluated expression on a stack which lives on the heap. The
+depth of recursion of the Scheme program being evaluated is therefore
+bounded only by memory, and not by the Python stack.
+
+It evaluates the same analyzed expressions as the recursive evaluator,
+and produces the same Procedure objects, so that the two can share a
+global environment.
+
+[1] https://sarabander.github.io/sicp/html/5_002e4.xhtml
+"""
+
+from __future__ import annotations
+
+from typing import Any, List
+
+from .common import ParsedExpression
+from .interpreter import (
+    analyze,
+    create_frame,
+    AnalyzedExpression,
+    BeginExpression,
+    DefineProcExpression,
+    Env,
+    Environment,
+    FrameLocalVariable,
+    IfStatement,
+    InternalDefinition,
+    LambdaExpression,
+    LetStatement,
+    LocalVariable,
+    Primitive,
+    ProcApplication,
+    Procedure,
+    Symbol,
+    TailCall,
+    UnassignedCheckingLocalVariable,
+    VariableDefinition,
+)
+
+# Labels for the points at which evaluation resumes once a subexpression
+# has been evaluated. Each is saved on the stack along with the registers
+# needed to resume there.
+
+EV_IF_DECIDE = 0
+EV_APPL_DID_OPERATOR = 1
+EV_APPL_ACCUMULATE_ARG = 2
+EV_SEQUENCE_CONTINUE = 3
+EV_LET_ASSIGN = 4
+EV_DEFINITION_ASSIGN = 5
+
+# Expressions which are evaluated without evaluating any subexpressions,
+# so can be evaluated by the recursive evaluator without any recursion
+LEAF_EXPRESSION_TYPES = frozenset(
+    (
+        Primitive,
+        Symbol,
+        LocalVariable,
+        FrameLocalVariable,
+        UnassignedCheckingLocalVariable,
+        LambdaExpression,
+    )
+)
+
+
+def ec_seval(exp: ParsedExpression, env: Environment):
+    return execute(analyze(exp), env)
+
+
+def execute(exp: AnalyzedExpression, env: Env):
+    """
+    Evaluate an analyzed expression without recursing on the Python stack
+    """
+    stack: List[Any] = []
+    val: Any = None
+    evaluating = True
+
+    while True:
+
+        if evaluating:
+            # eval-dispatch
+            exp_type = type(exp)
+
+            if exp_type in LEAF_EXPRESSION_TYPES:
+                val = exp.seval(env)
+                evaluating = False
+
+            elif type(exp) is IfStatement:
+                stack.append((EV_IF_DECIDE, exp, env))
+                exp = exp._test
+
+            elif type(exp) is ProcApplication:
+                stack.append((EV_APPL_DID_OPERATOR, exp, env))
+                exp = exp._proc_name_or_expr
+
+            elif type(exp) is BeginExpression:
+                statements = exp._statements
+                if len(statements) > 1:
+                    stack.append((EV_SEQUENCE_CONTINUE, exp, env, 1))
+                exp = statements[0]
+
+            elif type(exp) is LetStatement:
+                if exp._frame_size is not None:
+                    env = create_frame(exp._frame_size, [], env)
+                if exp._values:
+                    stack.append((EV_LET_ASSIGN, exp, env, 0))
+                    exp = exp._values[0]
+                else:
+                    exp = exp._body
+
+            elif type(exp) is VariableDefinition or type(exp) is InternalDefinition:
+                stack.append((EV_DEFINITION_ASSIGN, exp, env))
+                exp = exp._definition
+
+            elif type(exp) is DefineProcExpression:
+                exp = exp._equivalent_define
+
+            else:
+                # A special form registered from outside this module, which
+                # this evaluator has no knowledge of
+                val = exp.seval(env)
+                evaluating = False
+                if isinstance(val, TailCall):
+                    exp, env, val, evaluating = _apply(val.proc, val.args)
+
+            continue
+
+        if not stack:
+            return val
+
+        saved = stack.pop()
+        label = saved[0]
+
+        if label == EV_IF_DECIDE:
+            _, if_exp, env = saved
+            exp = if_exp._true_branch if val else if_exp._false_branch
+            evaluating = True
+
+        elif label == EV_APPL_DID_OPERATOR:
+            _, appl_exp, env = saved
+            proc = val
+            if not callable(proc):
+                raise Exception("Invalid function application")
+            arg_exps = appl_exp._proc_args
+            if arg_exps:
+                stack.append((EV_APPL_ACCUMULATE_ARG, appl_exp, env, proc, []))
+                exp = arg_exps[0]
+                evaluating = True
+            else:
+                exp, env, val, evaluating = _apply(proc, [])
+
+        elif label == EV_APPL_ACCUMULATE_ARG:
+            _, appl_exp, env, proc, args = saved
+            args.append(val)
+            arg_exps = appl_exp._proc_args
+            if len(args) < len(arg_exps):
+                stack.append(saved)
+                exp = arg_exps[len(args)]
+                evaluating = True
+            else:
+                exp, env, val, evaluating = _apply(proc, args)
+
+        elif label == EV_SEQUENCE_CONTINUE:
+            _, begin_exp, env, index = saved
+            statements = begin_exp._statements
+            if index + 1 < len(statements):
+                stack.append((EV_SEQUENCE_CONTINUE, begin_exp, env, index + 1))
+            exp = statements[index]
+            evaluating = True
+
+        elif label == EV_LET_ASSIGN:
+            _, let_exp, frame, index = saved
+            env = frame
+            values = let_exp._values
+            frame.values[let_exp._slots[index]] = val
+            if index + 1 < len(values):
+                stack.append((EV_LET_ASSIGN, let_exp, env, index + 1))
+                exp = values[index + 1]
+            else:
+                exp = let_exp._body
+            evaluating = True
+
+        elif label == EV_DEFINITION_ASSIGN:
+            _, define_exp, env = saved
+            define_exp.assign(env, val)
+            val = None
+
+
+def _apply(proc, args):
+    """
+    Apply a procedure, returning the new contents of the exp, env and val
+    registers, and whether the machine should go on to evaluate exp.
+    The body of a compound procedure is evaluated without saving anything
+    on the stack, so calls in tail position run in constant space.
+    """
+    if isinstance(proc, Procedure):
+        if len(args) < proc.arity:
+            return None, None, proc.partially_apply(args), False
+        return proc.body, proc.bind(args), None, True
+    return None, None, proc(*args), False
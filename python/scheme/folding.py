@@ -0,0 +1,327 @@
+"""
+Constant folding, an optional pass which simplifies parsed expressions
+before they are evaluated:
+
+- applications of pure builtins to literal arguments, e.g. `(* 60 60)`,
+  are replaced by their values
+- `if` expressions whose test is a literal are replaced by the branch
+  which would be taken
+- `let` bindings of literals are substituted into the rest of the let,
+  and a let left with no bindings is replaced by its body. Bindings are
+  kept if the let contains a special form the folder doesn't know, into
+  which they can't be substituted, or a let which rebinds their names
+  after referring to them, as a lambda may still refer to them.
+
+A builtin is only folded if its name refers to the builtin itself in
+the global environment at the time of folding, and is not shadowed by a
+local variable. Expressions are folded one top level expression at a
+time, just before they are evaluated, so the pass sees any earlier
+redefinitions.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List, Mapping, Optional, Set
+
+from . import interpreter
+from . import sch_builtins
+from .common import ParsedExpression
+from .interpreter import (
+    Environment,
+    is_let_assignment,
+    is_list,
+    is_proc_header,
+    LetAssignment,
+    scan_definitions,
+)
+from .parser import unparse
+
+PURE_BUILTINS = frozenset(
+    (
+        sch_builtins.add,
+        sch_builtins.minus,
+        sch_builtins.mul,
+        sch_builtins.truediv,
+        sch_builtins.and_,
+        sch_builtins.or_,
+        sch_builtins.not_,
+        sch_builtins.eq,
+        sch_builtins.lt,
+        sch_builtins.gt,
+        sch_builtins.le,
+        sch_builtins.ge,
+    )
+)
+
+LITERAL_TYPES = (bool, int, float)
+
+Reporter = Callable[[str], None]
+
+
+class _NotConstant:
+    def __repr__(self):
+        return "<not constant>"
+
+
+# The value in a local scope of a variable which is not a known literal
+NOT_CONSTANT = _NotConstant()
+
+
+class _ShadowedUntilAssigned:
+    """
+    The value, in an assignment of a let, of a variable bound by a later
+    assignment of the same let. Until it is assigned, a reference to the
+    variable gives the value of the binding it shadows, but a lambda may
+    be called once it has been assigned.
+    """
+
+    __slots__ = ("shadowed",)
+
+    def __init__(self, shadowed: Any):
+        self.shadowed = shadowed
+
+
+Locals = Mapping[str, Any]
+
+
+def fold_constants(
+    exp: ParsedExpression, env: Environment, report: Optional[Reporter] = None
+) -> ParsedExpression:
+    """
+    Fold the constant subexpressions of a top level expression, calling
+    `report` with a description of each folding made
+    """
+    return ConstantFolder(env, report).fold(exp, {})
+
+
+def is_literal(exp: ParsedExpression) -> bool:
+    return type(exp) in LITERAL_TYPES
+
+
+class ConstantFolder:
+    def __init__(self, env: Environment, report: Optional[Reporter] = None):
+        self._env = env
+        self._report = report
+        # The names rebound by a let after an earlier assignment of the let
+        # referred to them, whose enclosing bindings must be kept, as the
+        # reference may be to them
+        self._rebound_after_use: Set[str] = set()
+
+    def fold(self, exp: ParsedExpression, local_vars: Locals) -> ParsedExpression:
+        if isinstance(exp, str):
+            value = local_vars.get(exp, NOT_CONSTANT)
+            if isinstance(value, _ShadowedUntilAssigned):
+                value = value.shadowed
+            return exp if value is NOT_CONSTANT else value
+        if not is_list(exp) or not exp:
+            return exp
+
+        head = exp[0]
+        if isinstance(head, str):
+            fold_special_form = SPECIAL_FORM_FOLDERS.get(head)
+            if fold_special_form is not None:
+                folded = fold_special_form(self, exp, local_vars)
+                if folded is not None:
+                    return folded
+            elif head in interpreter.SPECIAL_FORMS:
+                # A special form registered from elsewhere, whose syntax
+                # is unknown, so can't be folded
+                return exp
+        return self._fold_application(exp, local_vars)
+
+    def _fold_application(self, exp, local_vars: Locals) -> ParsedExpression:
+        folded = tuple(self.fold(sub_exp, local_vars) for sub_exp in exp)
+        proc = self._pure_builtin(folded[0], local_vars)
+        args = folded[1:]
+        if proc is None or not all(is_literal(arg) for arg in args):
+            return folded
+        try:
+            value = proc(*args)
+        except (ArithmeticError, TypeError):
+            # Leave the error to be raised when the expression is evaluated
+            return folded
+        if not is_literal(value):
+            return folded
+        self._log(f"folded {unparse(exp)} => {unparse(value)}")
+        return value
+
+    def _pure_builtin(self, exp: ParsedExpression, local_vars: Locals):
+        if not isinstance(exp, str) or exp in local_vars:
+            return None
+        try:
+            value = self._env[exp]
+        except KeyError:
+            return None
+        try:
+            return value if value in PURE_BUILTINS else None
+        except TypeError:
+            # An unhashable value can't be a builtin
+            return None
+
+    def _fold_if(self, exp, local_vars: Locals) -> Optional[ParsedExpression]:
+        if len(exp) != 4:
+            return None
+        test = self.fold(exp[1], local_vars)
+        if is_literal(test):
+            branch = exp[2] if test else exp[3]
+            self._log(f"pruned {unparse(exp)} => {unparse(branch)}")
+            return self.fold(branch, local_vars)
+        return (
+            exp[0],
+            test,
+            self.fold(exp[2], local_vars),
+            self.fold(exp[3], local_vars),
+        )
+
+    def _fold_begin(self, exp, local_vars: Locals) -> Optional[ParsedExpression]:
+        if len(exp) < 2:
+            return None
+        return (exp[0], *(self.fold(statement, local_vars) for statement in exp[1:]))
+
+    def _fold_let(self, exp, local_vars: Locals) -> Optional[ParsedExpression]:
+        if not (len(exp) == 3 and is_list(exp[1])):
+            return None
+        assignments = [a for a in exp[1] if is_let_assignment(a)]
+        if len(assignments) != len(exp[1]):
+            return None
+        names = [name for name, _ in assignments]
+        body = exp[2]
+        definitions = scan_definitions(body)
+        if len(set(names)) != len(names):
+            # Left for the interpreter to report
+            return None
+
+        # Bindings can only be dropped if every reference to them is
+        # substituted, which can't be known if the let contains a form
+        # the folder doesn't understand
+        keep_all = _contains_opaque_form(exp)
+        enclosing_rebound = self._rebound_after_use
+        self._rebound_after_use = set()
+        let_vars: Dict[str, Any] = dict(local_vars)
+        folded_assignments: List[LetAssignment] = []
+        inlined: Set[str] = set()
+        # The variables which earlier assignments may refer to, through a
+        # lambda which is called once they are assigned
+        referred_to_early: Set[str] = set()
+        for index, (name, value_exp) in enumerate(assignments):
+            later = _symbols(value_exp).intersection(names[index + 1 :])
+            value_vars = let_vars
+            if later:
+                referred_to_early.update(later)
+                self._rebound_after_use.update(later)
+                value_vars = dict(let_vars)
+                for later_name in later:
+                    shadowed = let_vars.get(later_name, NOT_CONSTANT)
+                    if isinstance(shadowed, _ShadowedUntilAssigned):
+                        shadowed = shadowed.shadowed
+                    value_vars[later_name] = _ShadowedUntilAssigned(shadowed)
+            value = self.fold(value_exp, value_vars)
+            folded_assignments.append((name, value))
+            if (
+                is_literal(value)
+                and name not in definitions
+                and name not in referred_to_early
+                and not keep_all
+            ):
+                self._log(f"inlined {name} = {unparse(value)}")
+                let_vars[name] = value
+                inlined.add(name)
+            else:
+                let_vars[name] = NOT_CONSTANT
+
+        for name in definitions:
+            let_vars[name] = NOT_CONSTANT
+        folded_body = self.fold(body, let_vars)
+
+        # A binding which has been inlined is still kept if a let within
+        # this one rebinds its name after referring to it
+        rebound = self._rebound_after_use
+        self._rebound_after_use = enclosing_rebound | rebound
+        kept = tuple(
+            (name, value)
+            for name, value in folded_assignments
+            if name not in inlined or name in rebound
+        )
+        if not kept and not definitions:
+            return folded_body
+        return (exp[0], kept, folded_body)
+
+    def _fold_lambda(self, exp, local_vars: Locals) -> Optional[ParsedExpression]:
+        if not (len(exp) == 3 and is_proc_header(exp[1])):
+            return None
+        return (exp[0], exp[1], self._fold_body(exp[1], exp[2], local_vars))
+
+    def _fold_define(self, exp, local_vars: Locals) -> Optional[ParsedExpression]:
+        if len(exp) == 3 and isinstance(exp[1], str):
+            return (exp[0], exp[1], self.fold(exp[2], local_vars))
+        if len(exp) == 4 and isinstance(exp[1], str) and is_proc_header(exp[2]):
+            return (*exp[:3], self._fold_body(exp[2], exp[3], local_vars))
+        return None
+
+    def _fold_define_memo(self, exp, local_vars: Locals) -> Optional[ParsedExpression]:
+        if not (len(exp) in (4, 5) and isinstance(exp[1], str)):
+            return None
+        header = exp[-2]
+        if not is_proc_header(header):
+            return None
+        return (*exp[:-1], self._fold_body(header, exp[-1], local_vars))
+
+    def _fold_body(
+        self, header, body: ParsedExpression, local_vars: Locals
+    ) -> ParsedExpression:
+        # A lambda may be called once the variables shadowed until they
+        # are assigned have been assigned
+        body_vars: Dict[str, Any] = {
+            name: NOT_CONSTANT if isinstance(value, _ShadowedUntilAssigned) else value
+            for name, value in local_vars.items()
+        }
+        for name in (*header, *scan_definitions(body)):
+            body_vars[name] = NOT_CONSTANT
+        return self.fold(body, body_vars)
+
+    def _log(self, message: str):
+        if self._report is not None:
+            self._report(message)
+
+
+def _symbols(exp: ParsedExpression) -> Set[str]:
+    symbols = set()
+    pending = [exp]
+    while pending:
+        exp = pending.pop()
+        if is_list(exp):
+            pending.extend(exp)
+        elif isinstance(exp, str):
+            symbols.add(exp)
+    return symbols
+
+
+def _contains_opaque_form(exp: ParsedExpression) -> bool:
+    """
+    Whether an expression contains a special form which the folder
+    doesn't know the syntax of, so can't substitute constants into
+    """
+    pending = [exp]
+    while pending:
+        exp = pending.pop()
+        if not (is_list(exp) and exp):
+            continue
+        head = exp[0]
+        if (
+            isinstance(head, str)
+            and head in interpreter.SPECIAL_FORMS
+            and head not in SPECIAL_FORM_FOLDERS
+        ):
+            return True
+        pending.extend(exp)
+    return False
+
+
+SPECIAL_FORM_FOLDERS = {
+    "if": ConstantFolder._fold_if,
+    "begin": ConstantFolder._fold_begin,
+    "let": ConstantFolder._fold_let,
+    "lambda": ConstantFolder._fold_lambda,
+    "define": ConstantFolder._fold_define,
+    "define-memo": ConstantFolder._fold_define_memo,
+}
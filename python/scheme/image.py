@@ -0,0 +1,124 @@
+"""
+Images of a global environment, like Lisp images, so that a program's
+definitions can be saved once and restored at startup with a single
+load, rather than by evaluating them all again.
+
+An image holds the environment's variables with their values, including
+procedures with their analyzed bodies and the frames they enclose.
+Builtins are stored by the name they are bound to in a new global
+environment, and restored as the builtins of the running interpreter.
+
+An image is pickled, so only load images you trust. It starts with a
+header recording the image format version and a digest of the
+interpreter's source, and is only loaded by the same version of the
+interpreter that saved it.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import io
+import os
+import pickle
+from typing import Dict
+
+from .interpreter import create_global_env, Environment
+
+MAGIC = b"SCMI"
+
+# Increase whenever the layout of images changes
+FORMAT_VERSION = 1
+
+_SCHEME_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+class ImageError(Exception):
+    pass
+
+
+def save_image(env: Environment, path: str):
+    """
+    Save a global environment to an image file, which is replaced
+    atomically
+    """
+    stream = io.BytesIO()
+    stream.write(_header())
+    try:
+        _Pickler(stream).dump(env)
+    except (pickle.PicklingError, TypeError, AttributeError) as e:
+        raise ImageError(f"Cannot save the environment: {e}") from e
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(stream.getvalue())
+        os.replace(temp_path, path)
+    except BaseException:
+        # The file may not have been created, and a failure to remove it
+        # mustn't hide the error which caused it
+        with contextlib.suppress(OSError):
+            os.unlink(temp_path)
+        raise
+
+
+def load_image(path: str) -> Environment:
+    """
+    Restore a global environment from an image file
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    header = _header()
+    if not data.startswith(MAGIC):
+        raise ImageError(f"{path} is not an image")
+    if not data.startswith(header):
+        raise ImageError(f"{path} was saved by a different version of the interpreter")
+    stream = io.BytesIO(data)
+    stream.seek(len(header))
+    env = _Unpickler(stream).load()
+    if not isinstance(env, Environment):
+        raise ImageError(f"{path} does not hold an environment")
+    return env
+
+
+def interpreter_digest() -> bytes:
+    """
+    A digest of the interpreter's source, which changes whenever the
+    classes stored in images might have changed
+    """
+    digest = hashlib.sha256()
+    for filename in sorted(os.listdir(_SCHEME_DIRECTORY)):
+        if filename.endswith(".py"):
+            digest.update(filename.encode())
+            with open(os.path.join(_SCHEME_DIRECTORY, filename), "rb") as f:
+                digest.update(f.read())
+    return digest.digest()
+
+
+def _header() -> bytes:
+    return MAGIC + FORMAT_VERSION.to_bytes(2, "little") + interpreter_digest()
+
+
+def _builtins() -> Dict[str, object]:
+    return dict(create_global_env().items())
+
+
+class _Pickler(pickle.Pickler):
+    def __init__(self, file):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self._builtin_names = {id(value): name for name, value in _builtins().items()}
+
+    def persistent_id(self, obj):
+        return self._builtin_names.get(id(obj))
+
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, file):
+        super().__init__(file)
+        self._builtins = _builtins()
+
+    def persistent_load(self, name):
+        try:
+            return self._builtins[name]
+        except KeyError:
+            raise ImageError(f"The image refers to an unknown builtin {name}")
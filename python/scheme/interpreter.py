@@ -1,9 +1,26 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Tuple, Optional, TypeGuard
+import copy
+import weakref
+from sys import intern
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Tuple,
+    Optional,
+    Protocol,
+    Set,
+    TypeGuard,
+    Union,
+)
 
 from .common import ParsedExpression, ParsedExpressionList
-from . import sch_builtins
+from .parser import unparse
+from . import memo, sch_builtins, vectors
 
 
 class NullEnvironment:
@@ -13,12 +30,23 @@ class NullEnvironment:
 
 
 class Environment:
+    """
+    A table of variables, used for the global environment, in which
+    variables are looked up by name. The variables of procedure calls
+    and let statements are instead stored in Frames.
+    """
 
     _enclosing: Environment | NullEnvironment
+    globals: Environment
+    # Increased whenever a variable is defined or assigned, so that
+    # cached values of the variables can be checked to be current
+    version: int
 
     def __init__(self, enclosing: Optional[Environment] = None):
         self._enclosing = NullEnvironment() if enclosing is None else enclosing
         self._table: Dict[str, Any] = {}
+        self.globals = self
+        self.version = 0
 
     def __getitem__(self, key: str):
         try:
@@ -30,11 +58,345 @@ class Environment:
         if key not in self._table:
             raise KeyError(key)
         self._table[key] = value
+        self.version += 1
 
     def define(self, key: str, value):
         if key in self._table:
             raise Exception(f"'{key}' already defined.")
-        self._table[key] = value
+        # Symbols are interned by the parser, so interning names as they
+        # are defined lets lookups find them by identity
+        self._table[intern(key)] = value
+        self.version += 1
+
+    def defines(self, key: str) -> bool:
+        """
+        Whether the variable is defined in this environment itself,
+        rather than in an enclosing one
+        """
+        return key in self._table
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        """
+        The names and values of the variables defined in this
+        environment itself
+        """
+        return iter(self._table.items())
+
+    def copy(self) -> Environment:
+        """
+        A new environment with copies of the same variables, to which
+        variables can be added without affecting this one. The values are
+        copied with everything they refer to, up to the builtins, so that
+        procedures already defined look up global variables in the new
+        environment.
+        """
+        env = Environment()
+        env._enclosing = self._enclosing
+        env.version = self.version
+        env._table = copy.deepcopy(
+            self._table, {id(self): env, id(self._enclosing): self._enclosing}
+        )
+        return env
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # Re-intern the names, which unpickling doesn't
+        self._table = {intern(name): value for name, value in self._table.items()}
+
+
+class Unassigned:
+    """
+    The contents of a frame slot for an internal definition which has
+    not yet been evaluated
+    """
+
+    def __repr__(self):
+        return "<unassigned>"
+
+    def __reduce__(self):
+        # Unpickle as the same sentinel, so that slots can still be
+        # checked against it by identity
+        return "UNASSIGNED"
+
+
+UNASSIGNED = Unassigned()
+
+
+class Frame:
+    """
+    The variables of a single procedure call or let statement, stored in
+    slots at the indices determined by lexical addressing
+    """
+
+    __slots__ = ("values", "enclosing", "globals")
+
+    values: List[Any]
+    enclosing: Frame | Environment
+    globals: Environment
+
+    def __init__(self, values: List[Any], enclosing: Frame | Environment):
+        self.values = values
+        self.enclosing = enclosing
+        self.globals = enclosing.globals
+
+
+Env = Union[Environment, Frame]
+
+
+class Scope:
+    """
+    The compile time counterpart of a Frame: the names of the variables
+    which will be stored in each slot of the frame.
+
+    A scope may share the frame of its enclosing scope, as a let within a
+    procedure body does, in which case its variables are given slots after
+    those of the enclosing scope. Since nothing in the language reassigns
+    a variable, each slot is still assigned at most once per frame, so
+    sharing is safe even when the frame is captured by a closure.
+    """
+
+    _indices: Dict[str, int]
+    _internal_definitions: set[str]
+    # The variables of a let whose assignments are being analyzed, which
+    # are not assigned until the assignments before them are evaluated
+    _unassigned_lets: set[str]
+    _enclosing: Optional[Scope]
+    _shares_frame: bool
+    # The scope which owns the frame, and the number of slots allocated
+    # in the frame so far by it and the scopes sharing it
+    _frame_scope: Scope
+    _frame_size: int
+
+    def __init__(
+        self,
+        names: Iterable[str] = (),
+        enclosing: Optional[Scope] = None,
+        shares_frame: bool = False,
+    ):
+        self._indices = {}
+        self._internal_definitions = set()
+        self._unassigned_lets = set()
+        self._enclosing = enclosing
+        self._shares_frame = shares_frame
+        if not shares_frame:
+            self._frame_scope = self
+        elif enclosing is not None:
+            self._frame_scope = enclosing._frame_scope
+        else:
+            raise ValueError("A scope without an enclosing scope can't share its frame")
+        self._frame_size = 0
+        for name in names:
+            self.add(name)
+
+    def add(self, name: str) -> int:
+        """
+        Add a variable which is bound as soon as the frame is created
+        """
+        if name in self._indices:
+            raise Exception(f"'{name}' already defined.")
+        frame_scope = self._frame_scope
+        index = self._indices[name] = frame_scope._frame_size
+        frame_scope._frame_size += 1
+        return index
+
+    def add_definition(self, name: str) -> int:
+        """
+        Add a variable bound by an internal define, which is unassigned
+        until the define is evaluated
+        """
+        if name in self._indices:
+            return self._indices[name]
+        self._internal_definitions.add(name)
+        return self.add(name)
+
+    def add_let_variables(self, names: Iterable[str]) -> List[int]:
+        """
+        Add the variables of a let, which are unassigned until
+        `assign_let_variable` is called for each in turn
+        """
+        indices = []
+        for name in names:
+            indices.append(self.add(name))
+            self._unassigned_lets.add(name)
+        return indices
+
+    def assign_let_variable(self, name: str):
+        self._unassigned_lets.discard(name)
+
+    def resolve(self, name: str) -> Optional[Tuple[int, int, bool]]:
+        """
+        Find the lexical address of a variable, as the number of frames
+        to go up and the index within that frame, and whether the variable
+        may be unassigned. Returns None for global variables.
+        """
+        scope: Optional[Scope] = self
+        depth = 0
+        while scope is not None:
+            index = scope._indices.get(name)
+            if index is None:
+                index = scope.capture(name)
+            if index is not None:
+                return depth, index, scope._may_be_unassigned(name)
+            if not scope._shares_frame:
+                depth += 1
+            scope = scope._enclosing
+        return None
+
+    def capture(self, name: str) -> Optional[int]:
+        """
+        Overridden by ClosureScope, to add a variable of the scopes
+        enclosing a flat closure when the closure's body refers to it
+        """
+        return None
+
+    def may_be_unassigned(self, name: str) -> bool:
+        """
+        Whether a variable is a local variable bound by an internal define,
+        found without capturing it into any flat closure
+        """
+        scope = self._binding_scope(name)
+        return scope is not None and scope._may_be_unassigned(name)
+
+    def unassigned_let_scope(self, name: str) -> Optional[Scope]:
+        """
+        The scope of the let which binds a variable, if the variable is
+        not yet assigned as the let's assignments are being analyzed.
+        Until it is assigned, the name refers to the variable it shadows.
+        """
+        scope = self._binding_scope(name)
+        if scope is not None and name in scope._unassigned_lets:
+            return scope
+        return None
+
+    def _binding_scope(self, name: str) -> Optional[Scope]:
+        scope: Optional[Scope] = self
+        while scope is not None:
+            if name in scope._indices:
+                return scope
+            scope = scope._lookup_parent()
+        return None
+
+    def _may_be_unassigned(self, name: str) -> bool:
+        return name in self._internal_definitions or name in self._unassigned_lets
+
+    def _lookup_parent(self) -> Optional[Scope]:
+        return self._enclosing
+
+    @property
+    def size(self) -> int:
+        """
+        The number of slots in the frame, including those of any scopes
+        which share it
+        """
+        return self._frame_scope._frame_size
+
+    @property
+    def shares_frame(self) -> bool:
+        return self._shares_frame
+
+    @property
+    def enclosing(self) -> Optional[Scope]:
+        return self._enclosing
+
+
+Capture = Tuple[str, int, int]
+
+
+class ClosureScope(Scope):
+    """
+    The variables which a flat closure captures from the scopes enclosing
+    its lambda expression. When the closure is created, their values are
+    copied into a frame of their own which encloses the frames of the
+    closure's calls, so that the closure doesn't keep the frames it was
+    created in alive.
+
+    A variable is captured the first time the lambda's body refers to it.
+    Variables bound by internal defines may not yet be assigned when the
+    closure is created, so lambdas which may refer to them are not made
+    into flat closures.
+    """
+
+    _outer: Scope
+    # Each captured variable, with its lexical address in the scope of
+    # the lambda expression
+    captures: List[Capture]
+
+    def __init__(self, outer: Scope):
+        super().__init__()
+        self._outer = outer
+        self.captures = []
+
+    def capture(self, name: str) -> Optional[int]:
+        address = self._outer.resolve(name)
+        if address is None:
+            return None
+        depth, index, may_be_unassigned = address
+        assert not may_be_unassigned
+        self.captures.append((name, depth, index))
+        return self.add(name)
+
+    def _lookup_parent(self) -> Optional[Scope]:
+        return self._outer
+
+
+def create_frame(scope_size: int, values: List[Any], enclosing: Env) -> Frame:
+    if len(values) < scope_size:
+        values.extend([UNASSIGNED] * (scope_size - len(values)))
+    return Frame(values, enclosing)
+
+
+def scan_definitions(body: ParsedExpression) -> List[str]:
+    """
+    Find the names defined within a procedure or let body, so that they
+    can be allocated slots before the body is analyzed
+    """
+    if not (is_list(body) and body):
+        return []
+    if body[0] == "begin":
+        return [name for exp in body[1:] for name in scan_definitions(exp)]
+    if body[0] == "define" and len(body) in (3, 4) and isinstance(body[1], str):
+        return [body[1]]
+    if body[0] == "define-memo" and len(body) in (4, 5) and isinstance(body[1], str):
+        return [body[1]]
+    return []
+
+
+def refers_to_definitions(exp: ParsedExpression, scope: Scope) -> bool:
+    """
+    Whether an expression may refer to a variable of `scope` bound by an
+    internal define. Every symbol in the expression is checked, even if a
+    closer binding would shadow the variable, so the answer may be a
+    false positive but never a false negative.
+    """
+    pending = [exp]
+    while pending:
+        exp = pending.pop()
+        if is_list(exp):
+            pending.extend(exp)
+        elif isinstance(exp, str) and scope.may_be_unassigned(exp):
+            return True
+    return False
+
+
+# The builtins of scheme.parallel, which is imported when one of them is
+# first called, as importing multiprocessing takes several times as long
+# as importing the rest of the interpreter
+def pmap(proc: Callable, *sequences):
+    from . import parallel
+
+    return parallel.pmap(proc, *sequences)
+
+
+def future(proc: Callable, *args):
+    from . import parallel
+
+    return parallel.future(proc, *args)
+
+
+def touch(value):
+    from . import parallel
+
+    return parallel.touch(value)
 
 
 def create_global_env():
@@ -46,40 +408,91 @@ def create_global_env():
     env.define("and", sch_builtins.and_)
     env.define("or", sch_builtins.or_)
     env.define("not", sch_builtins.not_)
+    env.define("=", sch_builtins.eq)
+    env.define("<", sch_builtins.lt)
+    env.define(">", sch_builtins.gt)
+    env.define("<=", sch_builtins.le)
+    env.define(">=", sch_builtins.ge)
     env.define("display", sch_builtins.display)
     env.define("newline", sch_builtins.newline)
+    env.define("memoize", memo.memoize)
+    env.define("memo-clear", memo.memo_clear)
+    for name, builtin in vectors.BUILTINS.items():
+        env.define(name, builtin)
+    env.define("pmap", pmap)
+    env.define("future", future)
+    env.define("touch", touch)
     return env
 
 
+class AnalyzedExpression(Protocol):
+    """
+    The result of syntactic analysis: an expression which has already
+    been classified, and which can be evaluated any number of times
+    against different environments
+    """
+
+    def seval(self, env: Env) -> Any: ...
+
+
+SpecialFormAnalyzer = Callable[
+    [ParsedExpression, Optional[Scope]], Optional[AnalyzedExpression]
+]
+
+SPECIAL_FORMS: Dict[str, List[SpecialFormAnalyzer]] = {}
+
+
+def register_special_form(name: str, analyzer: SpecialFormAnalyzer):
+    """
+    Register an analyzer for list expressions whose head is the symbol
+    `name`. Analyzers registered for the same name are tried in order
+    of registration, and should return None if the expression is not
+    of their form, in which case it is treated as a procedure application.
+    Analyzers are given the scope in which the expression appears, which
+    must be passed on when analyzing subexpressions.
+    """
+    SPECIAL_FORMS.setdefault(name, []).append(analyzer)
+
+
 def seval(exp: ParsedExpression, env: Environment):
-    ORDER_OF_EXPRESSION_TYPES = (
-        Primitive.from_parsed_expression,  # Not preferred, but needed for mypy
-        Symbol.from_parsed_expression,
-        IfStatement.from_parsed_expression,
-        LetStatement.from_parsed_expression,
-        BeginExpression.from_parsed_expression,
-        VariableDefinition.from_parsed_expression,
-        DefineProcExpression.from_parsed_expression,
-        LambdaExpression.from_parsed_expression,
-        ProcApplication.from_parsed_expression,
-    )
-
-    for exp_type in ORDER_OF_EXPRESSION_TYPES:
-        exp_for_evaluation = exp_type(exp)
-        if exp_for_evaluation is not None:
-            return exp_for_evaluation.seval(env)
+    return analyze(exp).seval(env)
+
+
+def analyze(exp: ParsedExpression, scope: Optional[Scope] = None) -> AnalyzedExpression:
+    """
+    Classify a parsed expression (and, recursively, all of its
+    subexpressions) exactly once, so that evaluating the result
+    never has to inspect the parsed expression again.
+
+    Variables are resolved to their lexical addresses in `scope`, or
+    are looked up in the global environment if `scope` is None.
+    """
+    if is_list(exp):
+        if exp and isinstance(exp[0], str):
+            for analyzer in SPECIAL_FORMS.get(exp[0], ()):
+                analyzed = analyzer(exp, scope)
+                if analyzed is not None:
+                    return analyzed
+        return ProcApplication.from_list(exp, scope)
+
+    for exp_type in ORDER_OF_ATOM_TYPES:
+        analyzed = exp_type(exp, scope)
+        if analyzed is not None:
+            return analyzed
     else:
         raise Exception("Bad expression")
 
 
+def analyze_all(
+    exps: ParsedExpressionList, scope: Optional[Scope] = None
+) -> Tuple[AnalyzedExpression, ...]:
+    return tuple(analyze(exp, scope) for exp in exps)
+
+
 def sapply(
     proc_name: ParsedExpression, proc_args: ParsedExpressionList, env: Environment
 ):
-    proc = seval(proc_name, env)
-    if not callable(proc):
-        raise Exception("Invalid function application")
-    args = [seval(a, env) for a in proc_args]
-    return proc(*args)
+    return ProcApplication(analyze(proc_name), analyze_all(proc_args)).seval(env)
 
 
 def is_list(exp: ParsedExpression) -> TypeGuard[ParsedExpressionList]:
@@ -91,27 +504,64 @@ def is_list(exp: ParsedExpression) -> TypeGuard[ParsedExpressionList]:
 
 class ProcApplication:
 
-    _proc_name_or_expr: ParsedExpression
-    _proc_args: ParsedExpressionList
+    _proc_name_or_expr: AnalyzedExpression
+    _proc_args: Tuple[AnalyzedExpression, ...]
+    _in_tail_position: bool
 
     def __init__(
-        self, proc_name_or_expr: ParsedExpression, proc_args: ParsedExpressionList
+        self,
+        proc_name_or_expr: AnalyzedExpression,
+        proc_args: Tuple[AnalyzedExpression, ...],
     ):
         self._proc_name_or_expr = proc_name_or_expr
         self._proc_args = proc_args
+        self._in_tail_position = False
 
     @classmethod
-    def from_parsed_expression(cls, exp: ParsedExpression) -> Optional[ProcApplication]:
+    def from_parsed_expression(
+        cls, exp: ParsedExpression, scope: Optional[Scope]
+    ) -> Optional[ProcApplication]:
         if not is_list(exp):
             return None
+        return cls.from_list(exp, scope)
 
-        proc_name_or_expr = exp[0]
-        proc_args: ParsedExpressionList = exp[1:]
+    @classmethod
+    def from_list(
+        cls, exp: ParsedExpressionList, scope: Optional[Scope]
+    ) -> ProcApplication:
+        proc_name_or_expr = analyze(exp[0], scope)
+        proc_args = analyze_all(exp[1:], scope)
 
         return cls(proc_name_or_expr, proc_args)
 
-    def seval(self, env: Environment):
-        return sapply(self._proc_name_or_expr, self._proc_args, env)
+    def seval(self, env: Env):
+        proc = self._proc_name_or_expr.seval(env)
+        if not callable(proc):
+            raise Exception("Invalid function application")
+        # Evaluate the arguments of calls with up to three without the
+        # overhead of a comprehension
+        arg_exps = self._proc_args
+        n_args = len(arg_exps)
+        if n_args == 1:
+            args: Tuple[Any, ...] = (arg_exps[0].seval(env),)
+        elif n_args == 2:
+            args = (arg_exps[0].seval(env), arg_exps[1].seval(env))
+        elif n_args == 3:
+            args = (
+                arg_exps[0].seval(env),
+                arg_exps[1].seval(env),
+                arg_exps[2].seval(env),
+            )
+        elif n_args == 0:
+            args = ()
+        else:
+            args = tuple([a.seval(env) for a in arg_exps])
+        if self._in_tail_position and type(proc) in TAIL_CALLABLE_TYPES:
+            return TailCall(proc, args)
+        return proc(*args)
+
+    def mark_tail_position(self):
+        self._in_tail_position = True
 
 
 # primitive
@@ -125,7 +575,9 @@ class Primitive:
         self._value = value
 
     @classmethod
-    def from_parsed_expression(cls, exp: ParsedExpression) -> Optional[Primitive]:
+    def from_parsed_expression(
+        cls, exp: ParsedExpression, _scope: Optional[Scope]
+    ) -> Optional[Primitive]:
         if not (
             isinstance(exp, float) or isinstance(exp, int) or isinstance(exp, bool)
         ):
@@ -133,29 +585,207 @@ class Primitive:
 
         return cls(exp)
 
-    def seval(self, _env: Environment):
+    def seval(self, _env: Env):
         return self._value
 
 
 # Symbol
 
 
-class Symbol:
+class InlineCache:
+    """
+    The value of a global variable at one site which refers to it, and
+    the version of the global environment it was looked up in. While the
+    version is unchanged, the variable can't have been redefined, so the
+    value can be used without looking it up again.
+
+    Variables found in an environment enclosing the global environment
+    are not cached, as the version only covers the global environment's
+    own variables.
+    """
+
+    __slots__ = ("_name", "env", "version", "value", "hits", "misses", "__weakref__")
 
     _name: str
+    env: Optional[Environment]
+    version: int
+    value: Any
+    hits: int
+    misses: int
 
     def __init__(self, name: str):
         self._name = name
+        self.env = None
+        self.version = -1
+        self.value = None
+        self.hits = 0
+        self.misses = 0
+        _inline_caches.add(self)
+
+    def __setstate__(self, state):
+        _, slots = state
+        for name, value in slots.items():
+            setattr(self, name, value)
+        _inline_caches.add(self)
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def lookup(self, env: Environment):
+        if env is self.env and env.version == self.version:
+            self.hits += 1
+            inline_cache_totals.hits += 1
+            return self.value
+        return self.miss(env)
+
+    def miss(self, env: Environment):
+        self.misses += 1
+        inline_cache_totals.misses += 1
+        value = env[self._name]
+        if env.defines(self._name):
+            self.env = env
+            self.version = env.version
+            self.value = value
+        return value
+
+
+class InlineCacheTotals:
+    """
+    The hits and misses of every inline cache, counted as they happen,
+    so that those of caches which have since been collected are included
+    """
+
+    __slots__ = ("hits", "misses")
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+
+inline_cache_totals = InlineCacheTotals()
+
+_inline_caches: weakref.WeakSet[InlineCache] = weakref.WeakSet()
+
+
+def inline_caches() -> List[InlineCache]:
+    """
+    The inline caches of the sites which are still in use, e.g. in the
+    bodies of defined procedures
+    """
+    return list(_inline_caches)
+
+
+def inline_cache_stats() -> Tuple[int, int]:
+    """
+    The total hits and misses of all inline caches
+    """
+    return inline_cache_totals.hits, inline_cache_totals.misses
+
+
+class Symbol(InlineCache):
+    """
+    A reference to a global variable
+    """
+
+    __slots__ = ()
 
     @classmethod
-    def from_parsed_expression(cls, exp: ParsedExpression) -> Optional[Symbol]:
+    def from_parsed_expression(
+        cls, exp: ParsedExpression, scope: Optional[Scope]
+    ) -> Optional[Symbol | LocalVariable]:
         if not isinstance(exp, str):
             return None
 
-        return cls(exp)
+        address = None if scope is None else scope.resolve(exp)
+        if address is None:
+            return cls(exp)
+
+        depth, index, may_be_unassigned = address
+        if may_be_unassigned:
+            let_scope = scope.unassigned_let_scope(exp)  # type: ignore[union-attr]
+            if let_scope is not None:
+                shadowed = analyze(exp, let_scope.enclosing)
+                return UnassignedLetVariable(exp, depth, index, shadowed)
+            return UnassignedCheckingLocalVariable(exp, depth, index)
+        if depth == 0:
+            return FrameLocalVariable(exp, depth, index)
+        return LocalVariable(exp, depth, index)
+
+    def seval(self, env: Env):
+        globals = env.globals
+        # The cache check of InlineCache.lookup, inlined
+        if globals is self.env and globals.version == self.version:
+            self.hits += 1
+            inline_cache_totals.hits += 1
+            return self.value
+        return self.miss(globals)
+
+
+class LocalVariable:
+    """
+    A reference to a variable in a frame, by its lexical address
+    """
 
-    def seval(self, env: Environment):
-        return env[self._name]
+    _name: str
+    _depth: int
+    _index: int
+
+    def __init__(self, name: str, depth: int, index: int):
+        self._name = name
+        self._depth = depth
+        self._index = index
+
+    def seval(self, env: Env):
+        for _ in range(self._depth):
+            env = env.enclosing  # type: ignore[union-attr]
+        return env.values[self._index]  # type: ignore[union-attr]
+
+
+class FrameLocalVariable(LocalVariable):
+    """
+    A reference to a variable in the innermost frame
+    """
+
+    def seval(self, env: Env):
+        return env.values[self._index]  # type: ignore[union-attr]
+
+
+class UnassignedCheckingLocalVariable(LocalVariable):
+    """
+    A reference to a variable bound by an internal define, which may be
+    referenced before the define has been evaluated
+    """
+
+    def seval(self, env: Env):
+        value = super().seval(env)
+        if value is UNASSIGNED:
+            raise KeyError(self._name)
+        return value
+
+
+class UnassignedLetVariable(LocalVariable):
+    """
+    A reference to a variable of a let from within the let's assignments,
+    which until it is assigned refers to the variable it shadows, as all
+    of a let's variables are in scope in each of its assignments
+    """
+
+    _shadowed: AnalyzedExpression
+
+    def __init__(self, name: str, depth: int, index: int, shadowed: AnalyzedExpression):
+        super().__init__(name, depth, index)
+        self._shadowed = shadowed
+
+    def seval(self, env: Env):
+        for _ in range(self._depth):
+            env = env.enclosing  # type: ignore[union-attr]
+        value = env.values[self._index]  # type: ignore[union-attr]
+        if value is UNASSIGNED:
+            # The let's frame is that of the scope enclosing the let, or
+            # for a let with a frame of its own, encloses only globals
+            return self._shadowed.seval(env)
+        return value
 
 
 # Define
@@ -164,16 +794,16 @@ class Symbol:
 class VariableDefinition:
 
     _name: str
-    _definition: ParsedExpression
+    _definition: AnalyzedExpression
 
-    def __init__(self, name: str, definition: ParsedExpression):
+    def __init__(self, name: str, definition: AnalyzedExpression):
         self._name = name
         self._definition = definition
 
     @classmethod
     def from_parsed_expression(
-        cls, exp: ParsedExpression
-    ) -> Optional[VariableDefinition]:
+        cls, exp: ParsedExpression, scope: Optional[Scope]
+    ) -> Optional[VariableDefinition | InternalDefinition]:
         if not (is_list(exp) and len(exp) == 3 and exp[0] == "define"):
             return None
 
@@ -181,13 +811,48 @@ class VariableDefinition:
         if not isinstance(name, str):
             return None
 
-        definition = exp[2]
+        return create_definition(name, analyze(exp[2], scope), scope)
 
-        return cls(name, definition)
+    def seval(self, env: Env):
+        self.assign(env, self._definition.seval(env))
 
-    def seval(self, env: Environment):
-        value = seval(self._definition, env)
-        env.define(self._name, value)
+    def assign(self, env: Env, value):
+        env.define(self._name, value)  # type: ignore[union-attr]
+
+
+class InternalDefinition:
+    """
+    A define within a procedure or let body, which assigns to a slot
+    in the frame of that body
+    """
+
+    _name: str
+    _index: int
+    _definition: AnalyzedExpression
+
+    def __init__(self, name: str, index: int, definition: AnalyzedExpression):
+        self._name = name
+        self._index = index
+        self._definition = definition
+
+    def seval(self, env: Env):
+        self.assign(env, self._definition.seval(env))
+
+    def assign(self, env: Env, value):
+        values = env.values  # type: ignore[union-attr]
+        if values[self._index] is not UNASSIGNED:
+            raise Exception(f"'{self._name}' already defined.")
+        values[self._index] = value
+
+
+def create_definition(
+    name: str, definition: AnalyzedExpression, scope: Optional[Scope]
+) -> VariableDefinition | InternalDefinition:
+    if isinstance(definition, LambdaExpression):
+        definition.name = name
+    if scope is None:
+        return VariableDefinition(name, definition)
+    return InternalDefinition(name, scope.add_definition(name), definition)
 
 
 # Lambda
@@ -201,16 +866,44 @@ def is_proc_header(exp: ParsedExpression) -> TypeGuard[ProcHeader]:
 
 class LambdaExpression:
 
+    name: str
     _header: ProcHeader
-    _body: ParsedExpression
+    _body: AnalyzedExpression
+    _frame_size: int
+    # The initial contents of the frame slots after the parameters', for
+    # internal definitions and the variables of lets sharing the frame
+    _spare_slots: Tuple[Unassigned, ...]
+    _parsed_body: ParsedExpression
+    # For a flat closure, the names and lexical addresses of the variables
+    # it captures, or None if it captures the whole environment
+    _captures: Optional[Tuple[Capture, ...]]
+
+    # For tiered compilation: the number of calls of procedures created from
+    # this lambda, and the faster implementation they have been promoted to
+    calls: int
+    tier: Optional[Tier]
 
-    def __init__(self, header: ProcHeader, body: ParsedExpression):
+    def __init__(
+        self,
+        header: ProcHeader,
+        body: AnalyzedExpression,
+        frame_size: int,
+        parsed_body: ParsedExpression,
+        captures: Optional[Tuple[Capture, ...]] = (),
+    ):
+        self.name = "<lambda>"
         self._header = header
         self._body = body
+        self._frame_size = frame_size
+        self._spare_slots = (UNASSIGNED,) * (frame_size - len(header))
+        self._parsed_body = parsed_body
+        self._captures = captures
+        self.calls = 0
+        self.tier = None
 
     @classmethod
     def from_parsed_expression(
-        cls, exp: ParsedExpression
+        cls, exp: ParsedExpression, scope: Optional[Scope]
     ) -> Optional[LambdaExpression]:
         if not (is_list(exp) and len(exp) == 3 and exp[0] == "lambda"):
             return None
@@ -220,44 +913,260 @@ class LambdaExpression:
         if not is_proc_header(header):
             return None
 
-        body = exp[2]
+        return cls.from_header_and_body(header, exp[2], scope)
+
+    @classmethod
+    def from_header_and_body(
+        cls, header: ProcHeader, body: ParsedExpression, scope: Optional[Scope]
+    ) -> LambdaExpression:
+        closure_scope = None
+        if scope is not None and not refers_to_definitions(body, scope):
+            closure_scope = ClosureScope(scope)
+        body_scope = Scope(header, scope if closure_scope is None else closure_scope)
+        for name in scan_definitions(body):
+            body_scope.add_definition(name)
+
+        analyzed_body = analyze(body, body_scope)
+        mark_tail_position(analyzed_body)
+
+        captures: Optional[Tuple[Capture, ...]] = None
+        if scope is None:
+            captures = ()
+        elif closure_scope is not None:
+            captures = tuple(closure_scope.captures)
+        return cls(header, analyzed_body, body_scope.size, body, captures)
+
+    def seval(self, env: Env):
+        captures = self._captures
+        if captures is None:
+            return Procedure(self, env)
+        if not captures:
+            return Procedure(self, env.globals)
+
+        values = []
+        for _, depth, index in captures:
+            frame = env
+            for _ in range(depth):
+                frame = frame.enclosing  # type: ignore[union-attr]
+            values.append(frame.values[index])  # type: ignore[union-attr]
+        return Procedure(self, Frame(values, env.globals))
+
+    @property
+    def header(self) -> ProcHeader:
+        return self._header
+
+    @property
+    def parsed_body(self) -> ParsedExpression:
+        return self._parsed_body
+
+    @property
+    def is_top_level(self) -> bool:
+        """
+        Whether the lambda refers only to its own and global variables,
+        as it does if it appears outside of any procedure or let body
+        """
+        return self._captures == ()
+
+    @property
+    def captured_names(self) -> Optional[Tuple[str, ...]]:
+        """
+        The names of the variables a flat closure captures, or None if
+        the lambda's procedures capture the whole environment
+        """
+        if self._captures is None:
+            return None
+        return tuple(name for name, _, _ in self._captures)
+
+    def __getstate__(self):
+        # A compiled tier holds generated Python code, which can't be
+        # pickled, so a copy starts out interpreted again
+        state = self.__dict__.copy()
+        state["calls"] = 0
+        state["tier"] = None
+        return state
+
+
+class Tier(Protocol):
+    """
+    A faster implementation of the procedures created from a lambda
+    expression, which may fall back to Procedure.interpret
+    """
+
+    def enter(self, proc: Procedure, args) -> Any: ...
+
+
+# Installed by scheme.jit. Called when the procedures created from
+# a lambda expression have been called hot_call_threshold times.
+hot_procedure_hook: Optional[Callable[[LambdaExpression, Procedure], None]] = None
+hot_call_threshold = 0
+
+# Installed by scheme.profiler. Called in place of evaluating the body of
+# a procedure, to evaluate it and record the call.
+profile_hook: Optional[Callable[[Procedure, Tuple[Any, ...]], Any]] = None
+
+
+class Procedure:
+    """
+    A compound procedure, i.e. the result of evaluating a lambda expression
+    """
+
+    __slots__ = ("_lambda", "_env", "_bound_args", "arity", "body", "_binds_directly")
+
+    _lambda: LambdaExpression
+    _env: Env
+    _bound_args: Tuple[Any, ...]
+    arity: int
+    body: AnalyzedExpression
+    # Whether a call's arguments are the first slots of its frame, as is
+    # the case unless the procedure is partially applied
+    _binds_directly: bool
+
+    def __init__(
+        self,
+        lambda_expression: LambdaExpression,
+        env: Env,
+        bound_args: Tuple[Any, ...] = (),
+    ):
+        self._lambda = lambda_expression
+        self._env = env
+        self._bound_args = bound_args
+        self.arity = len(lambda_expression._header) - len(bound_args)
+        self.body = lambda_expression._body
+        self._binds_directly = not bound_args
+
+    def __call__(self, *args):
+        result = self.enter(args)
+        while type(result) is TailCall:
+            result = result.proc.enter(result.args)
+        return result
+
+    def enter(self, args):
+        """
+        Bind the arguments and evaluate the body, without running any
+        procedure call that the body makes in tail position. Instead,
+        such calls are returned as a TailCall for the caller to run
+        """
+        if len(args) != self.arity:
+            if len(args) < self.arity:
+                return self.partially_apply(args)
+            self._raise_arity_error(args)
+
+        if profile_hook is not None:
+            return profile_hook(self, args)
+        lambda_expression = self._lambda
+        if lambda_expression.tier is not None:
+            return lambda_expression.tier.enter(self, args)
+        if hot_procedure_hook is not None:
+            lambda_expression.calls += 1
+            if lambda_expression.calls == hot_call_threshold:
+                hot_procedure_hook(lambda_expression, self)
+
+        if self._binds_directly:
+            values = [*args, *lambda_expression._spare_slots]
+            return self.body.seval(Frame(values, self._env))
+        return self.body.seval(self.bind(args))
+
+    def interpret(self, args):
+        """
+        As enter, for a full set of arguments, but always evaluating
+        the analyzed body
+        """
+        return self.body.seval(self.bind(args))
+
+    def bind(self, args) -> Frame:
+        """
+        Create the frame in which the body is evaluated
+        for a call with a full set of arguments
+        """
+        if len(args) > self.arity:
+            self._raise_arity_error(args)
+        values = [*self._bound_args, *args, *self._lambda._spare_slots]
+        return Frame(values, self._env)
+
+    def partially_apply(self, args) -> Procedure:
+        return Procedure(self._lambda, self._env, (*self._bound_args, *args))
+
+    def _raise_arity_error(self, args):
+        raise Exception(f"Arity error, expected {self.arity}, got {len(args)}")
 
-        return cls(header, body)
+    @property
+    def name(self) -> str:
+        return self._lambda.name
 
-    def seval(self, env: Environment):
-        return self._make_lambda(self._header, self._body, env)
+    @property
+    def params(self) -> ProcHeader:
+        """
+        The parameters which have not been bound by partial application
+        """
+        return self._lambda._header[len(self._bound_args) :]
+
+    @property
+    def env(self) -> Env:
+        return self._env
+
+    @property
+    def bound_args(self) -> Tuple[Any, ...]:
+        return self._bound_args
+
+    @property
+    def lambda_expression(self) -> LambdaExpression:
+        return self._lambda
+
+    def __repr__(self):
+        params = " ".join(self.params)
+        return f"<procedure {self.name} ({params})>"
+
+
+class TailCall:
 
-    def _make_lambda(self, header: ProcHeader, body: ParsedExpression, env: Environment):
-        def proc(*args):
-            localenv = Environment(env)
-            for var_name, val in zip(header, args):
-                localenv.define(var_name, val)
-            if len(args) > len(header):
-                raise Exception(f"Arity error, expected {len(header)}, got {len(args)}")
-            if len(args) < len(header):
-                remaining_arg_names = header[len(args):]
-                return self._make_lambda(remaining_arg_names, body, localenv)
-            return seval(body, localenv)
+    __slots__ = ("proc", "args")
+
+    def __init__(self, proc: Procedure, args):
+        self.proc = proc
+        self.args = args
+
+
+# Types of procedure with an `enter` method, which may return a TailCall
+# rather than making a call in tail position itself, and which can therefore
+# be called in tail position without growing the Python stack
+TAIL_CALLABLE_TYPES: Set[type] = {Procedure}
+
+
+def mark_tail_position(exp: AnalyzedExpression):
+    """
+    Inform an analyzed expression that its value is the value of the
+    procedure body it appears in. Expression types which can make
+    procedure calls in tail position define `mark_tail_position`
+    """
+    mark = getattr(exp, "mark_tail_position", None)
+    if mark is not None:
+        mark()
 
-        return proc
 
 # Function definition syntactic_sugar
 
 
 class DefineProcExpression:
 
-    _name: str
-    _header: ProcHeader
-    _body: ParsedExpression
+    _equivalent_define: VariableDefinition | InternalDefinition
 
-    def __init__(self, name: str, header: ProcHeader, body: ParsedExpression):
-        self._name = name
-        self._header = header
-        self._body = body
+    def __init__(
+        self,
+        name: str,
+        header: ProcHeader,
+        body: ParsedExpression,
+        scope: Optional[Scope],
+    ):
+        """
+        Function define syntactic sugar is transformed into the equivalent
+        that uses a lambda expression at analysis time
+        """
+        equivalent_lambda = LambdaExpression.from_header_and_body(header, body, scope)
+        self._equivalent_define = create_definition(name, equivalent_lambda, scope)
 
     @classmethod
     def from_parsed_expression(
-        cls, exp: ParsedExpression
+        cls, exp: ParsedExpression, scope: Optional[Scope]
     ) -> Optional[DefineProcExpression]:
         if not (is_list(exp) and len(exp) == 4 and exp[0] == "define"):
             return None
@@ -270,18 +1179,82 @@ class DefineProcExpression:
         if not is_proc_header(header):
             return None
 
-        body = exp[3]
+        return cls(name, header, exp[3], scope)
 
-        return cls(name, header, body)
+    def seval(self, env: Env):
+        return self._equivalent_define.seval(env)
 
-    def seval(self, env: Environment):
-        """
-        Evaluate function define syntactic sugar by transforming into
-        the equivalent that uses a lambda expression before evaluating
-        """
-        equivalent_lambda: ParsedExpression = ("lambda", self._header, self._body)
-        equivalent_define = VariableDefinition(self._name, equivalent_lambda)
-        return equivalent_define.seval(env)
+
+class DefineMemoExpression:
+    """
+    `(define-memo name (params) body)` defines a procedure as define does,
+    but whose results are cached, as by the `memoize` builtin. The most
+    recently used results are kept, up to a size which may be given as
+    `(define-memo name size (params) body)`.
+    """
+
+    _equivalent_define: VariableDefinition | InternalDefinition
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int,
+        header: ProcHeader,
+        body: ParsedExpression,
+        scope: Optional[Scope],
+    ):
+        equivalent_lambda = LambdaExpression.from_header_and_body(header, body, scope)
+        equivalent_lambda.name = name
+        memoized = MemoizeExpression(equivalent_lambda, maxsize)
+        self._equivalent_define = create_definition(name, memoized, scope)
+
+    @classmethod
+    def from_parsed_expression(
+        cls, exp: ParsedExpression, scope: Optional[Scope]
+    ) -> Optional[DefineMemoExpression]:
+        if not (is_list(exp) and len(exp) in (4, 5) and exp[0] == "define-memo"):
+            return None
+
+        name = exp[1]
+        if not isinstance(name, str):
+            return None
+
+        maxsize = memo.DEFAULT_MAXSIZE
+        if len(exp) == 5:
+            size = exp[2]
+            if not isinstance(size, int) or isinstance(size, bool) or size < 1:
+                raise Exception(
+                    f"Invalid define-memo cache size {unparse(size)}, expected a"
+                    " positive integer"
+                )
+            maxsize = size
+
+        header = exp[-2]
+        if not is_proc_header(header):
+            return None
+
+        return cls(name, maxsize, header, exp[-1], scope)
+
+    def seval(self, env: Env):
+        return self._equivalent_define.seval(env)
+
+
+class MemoizeExpression:
+    """
+    Creates a memoized procedure, with a cache of its own, from a lambda
+    expression
+    """
+
+    _lambda: LambdaExpression
+    _maxsize: int
+
+    def __init__(self, lambda_expression: LambdaExpression, maxsize: int):
+        self._lambda = lambda_expression
+        self._maxsize = maxsize
+
+    def seval(self, env: Env):
+        cache = memo.MemoCache(self._lambda.name, self._maxsize)
+        return memo.MemoizedProcedure(self._lambda.seval(env), cache)
 
 
 # If statement
@@ -289,36 +1262,42 @@ class DefineProcExpression:
 
 class IfStatement:
 
-    _test: ParsedExpression
-    _true_branch: ParsedExpression
-    _false_branch: ParsedExpression
+    _test: AnalyzedExpression
+    _true_branch: AnalyzedExpression
+    _false_branch: AnalyzedExpression
 
     def __init__(
         self,
-        test: ParsedExpression,
-        true_branch: ParsedExpression,
-        false_branch: ParsedExpression,
+        test: AnalyzedExpression,
+        true_branch: AnalyzedExpression,
+        false_branch: AnalyzedExpression,
     ):
         self._test = test
         self._true_branch = true_branch
         self._false_branch = false_branch
 
     @classmethod
-    def from_parsed_expression(cls, exp: ParsedExpression) -> Optional[IfStatement]:
+    def from_parsed_expression(
+        cls, exp: ParsedExpression, scope: Optional[Scope]
+    ) -> Optional[IfStatement]:
         if not (is_list(exp) and len(exp) == 4 and exp[0] == "if"):
             return None
 
-        test = exp[1]
-        true_branch = exp[2]
-        false_branch = exp[3]
+        test = analyze(exp[1], scope)
+        true_branch = analyze(exp[2], scope)
+        false_branch = analyze(exp[3], scope)
 
         return cls(test, true_branch, false_branch)
 
-    def seval(self, env: Environment):
-        if seval(self._test, env):
-            return seval(self._true_branch, env)
+    def seval(self, env: Env):
+        if self._test.seval(env):
+            return self._true_branch.seval(env)
         else:
-            return seval(self._false_branch, env)
+            return self._false_branch.seval(env)
+
+    def mark_tail_position(self):
+        mark_tail_position(self._true_branch)
+        mark_tail_position(self._false_branch)
 
 
 # Let statement
@@ -337,16 +1316,42 @@ def is_let_assignment(exp: ParsedExpression) -> TypeGuard[LetAssignment]:
 
 
 class LetStatement:
+    """
+    Let assignments are evaluated in order, and each may refer to
+    the variables assigned before it. All of the let's variables are in
+    scope in each assignment, so that a lambda can refer to itself or to
+    variables assigned after it, but until a variable is assigned its
+    name refers to the variable it shadows.
+
+    A let within a procedure or let body stores its variables in spare
+    slots of the enclosing frame, rather than allocating a frame of its
+    own. Only a let outside of any body, which has no enclosing frame,
+    creates one.
+    """
+
+    _values: Tuple[AnalyzedExpression, ...]
+    _slots: Tuple[int, ...]
+    _body: AnalyzedExpression
+    # The size of the let's own frame, or None if it shares the
+    # enclosing frame
+    _frame_size: Optional[int]
 
-    _assignments: Tuple[LetAssignment, ...]
-    _body: ParsedExpression
-
-    def __init__(self, assignments: Tuple[LetAssignment, ...], body: ParsedExpression):
-        self._assignments = assignments
+    def __init__(
+        self,
+        values: Tuple[AnalyzedExpression, ...],
+        slots: Tuple[int, ...],
+        body: AnalyzedExpression,
+        frame_size: Optional[int],
+    ):
+        self._values = values
+        self._slots = slots
         self._body = body
+        self._frame_size = frame_size
 
     @classmethod
-    def from_parsed_expression(cls, exp: ParsedExpression) -> Optional[LetStatement]:
+    def from_parsed_expression(
+        cls, exp: ParsedExpression, scope: Optional[Scope]
+    ) -> Optional[LetStatement]:
         if not (is_list(exp) and len(exp) == 3 and exp[0] == "let"):
             return None
 
@@ -361,23 +1366,33 @@ class LetStatement:
             else:
                 return None
 
+        let_scope = Scope(enclosing=scope, shares_frame=scope is not None)
+        slots = let_scope.add_let_variables(name for name, _ in typed_assignments)
+        values = []
+        for name, value_expr in typed_assignments:
+            values.append(analyze(value_expr, let_scope))
+            let_scope.assign_let_variable(name)
+
         body = exp[2]
+        for name in scan_definitions(body):
+            let_scope.add_definition(name)
 
-        return cls(tuple(typed_assignments), body)
+        analyzed_body = analyze(body, let_scope)
+        frame_size = None if let_scope.shares_frame else let_scope.size
+        return cls(tuple(values), tuple(slots), analyzed_body, frame_size)
 
-    def seval(self, env: Environment):
-        assigments = self._assignments
-        body = self._body
+    def seval(self, env: Env):
+        if self._frame_size is not None:
+            env = create_frame(self._frame_size, [], env)
+        slots = env.values  # type: ignore[union-attr]
 
-        localenv = Environment(env)
+        for index, value_expr in zip(self._slots, self._values):
+            slots[index] = value_expr.seval(env)
 
-        for assignment in assigments:
-            name = assignment[0]
-            value_expr = assignment[1]
-            value = seval(value_expr, localenv)
-            localenv.define(name, value)
+        return self._body.seval(env)
 
-        return seval(body, localenv)
+    def mark_tail_position(self):
+        mark_tail_position(self._body)
 
 
 # Begin expression
@@ -385,20 +1400,37 @@ class LetStatement:
 
 class BeginExpression:
 
-    _statements: ParsedExpressionList
+    _statements: Tuple[AnalyzedExpression, ...]
 
-    def __init__(self, statements: ParsedExpressionList):
+    def __init__(self, statements: Tuple[AnalyzedExpression, ...]):
         self._statements = statements
 
     @classmethod
-    def from_parsed_expression(cls, exp: ParsedExpression):
+    def from_parsed_expression(cls, exp: ParsedExpression, scope: Optional[Scope]):
         if not (is_list(exp) and len(exp) >= 2 and exp[0] == "begin"):
             return
 
-        return cls(exp[1:])
+        return cls(analyze_all(exp[1:], scope))
 
-    def seval(self, env: Environment):
+    def seval(self, env: Env):
         result = None
         for exp in self._statements:
-            result = seval(exp, env)
+            result = exp.seval(env)
         return result
+
+    def mark_tail_position(self):
+        mark_tail_position(self._statements[-1])
+
+
+ORDER_OF_ATOM_TYPES = (
+    Primitive.from_parsed_expression,  # Not preferred, but needed for mypy
+    Symbol.from_parsed_expression,
+)
+
+register_special_form("if", IfStatement.from_parsed_expression)
+register_special_form("let", LetStatement.from_parsed_expression)
+register_special_form("begin", BeginExpression.from_parsed_expression)
+register_special_form("define", VariableDefinition.from_parsed_expression)
+register_special_form("define", DefineProcExpression.from_parsed_expression)
+register_special_form("lambda", LambdaExpression.from_parsed_expression)
+register_special_form("define-memo", DefineMemoExpression.from_parsed_expression)
@@ -0,0 +1,241 @@
+"""
+Tiered compilation of hot procedures.
+
+While enabled, the interpreter counts the calls of the procedures created
+from each lambda expression. Once they reach the threshold, the lambda is
+compiled to Python with scheme.transpiler, with arithmetic on the builtin
+`+`, `-`, `*` and `/` compiled to Python operators, and later calls enter
+the compiled code instead of evaluating the analyzed body.
+
+The compiled code is guarded: it is only entered when every argument is an
+int or a float, the procedure belongs to the global environment it was
+compiled for, and the arithmetic operators are still bound to the builtins.
+Other calls are interpreted, and once a procedure's guards have failed
+`max_guard_failures` times it is deoptimized, discarding the compiled code
+and returning to the interpreter for good.
+
+Only lambdas which refer to no variables of an enclosing procedure or let
+are compiled, as the compiled code can only refer to its own and global
+variables. These include lambdas outside of any procedure or let body,
+and closures which capture nothing.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, FrozenSet, List, Optional
+
+from . import interpreter
+from .interpreter import Environment, LambdaExpression, Procedure
+from .transpiler import transpile_procedure, INLINABLE_OPERATORS, TranspileError
+
+DEFAULT_THRESHOLD = 1000
+DEFAULT_MAX_GUARD_FAILURES = 10
+
+INTERPRETED = "interpreted"
+COMPILED = "compiled"
+DEOPTIMIZED = "deoptimized"
+NOT_COMPILABLE = "not compilable"
+
+max_guard_failures = DEFAULT_MAX_GUARD_FAILURES
+
+
+class TierStats:
+    """
+    The tier decisions made for the procedures of one lambda expression
+    """
+
+    name: str
+    state: str
+    reason: Optional[str]
+    compiled_calls: int
+    guard_failures: int
+
+    def __init__(self, lambda_expression: LambdaExpression):
+        self.name = lambda_expression.name
+        self.state = INTERPRETED
+        self.reason = None
+        self.compiled_calls = 0
+        self.guard_failures = 0
+        self._lambda_expression = lambda_expression
+
+    @property
+    def interpreted_calls(self) -> int:
+        return self._lambda_expression.calls
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "reason": self.reason,
+            "interpreted_calls": self.interpreted_calls,
+            "compiled_calls": self.compiled_calls,
+            "guard_failures": self.guard_failures,
+        }
+
+
+_stats: List[TierStats] = []
+
+
+class CompiledTier:
+
+    _lambda_expression: LambdaExpression
+    _env: Environment
+    _function: Callable
+    _guarded_operators: Dict[str, Any]
+    _checked_version: int
+    _stats: TierStats
+
+    def __init__(
+        self,
+        lambda_expression: LambdaExpression,
+        env: Environment,
+        function: Callable,
+        inlined_operators: FrozenSet[str],
+        stats: TierStats,
+    ):
+        self._lambda_expression = lambda_expression
+        self._env = env
+        self._function = function
+        self._guarded_operators = {
+            name: INLINABLE_OPERATORS[name][0] for name in inlined_operators
+        }
+        # The version of the environment in which the operators were last
+        # found to be the builtins
+        self._checked_version = -1
+        self._stats = stats
+
+    def enter(self, proc: Procedure, args):
+        if self._guards_hold(proc, args):
+            self._stats.compiled_calls += 1
+            return self._function(*proc.bound_args, *args)
+
+        stats = self._stats
+        stats.guard_failures += 1
+        if stats.guard_failures >= max_guard_failures:
+            self._lambda_expression.tier = None
+            stats.state = DEOPTIMIZED
+        return proc.interpret(args)
+
+    def _guards_hold(self, proc: Procedure, args) -> bool:
+        if proc.env is not self._env:
+            return False
+        for arg in args:
+            arg_type = type(arg)
+            if arg_type is not int and arg_type is not float:
+                return False
+        for arg in proc.bound_args:
+            arg_type = type(arg)
+            if arg_type is not int and arg_type is not float:
+                return False
+        env = self._env
+        if env.version == self._checked_version:
+            return True
+        for name, builtin in self._guarded_operators.items():
+            try:
+                if env[name] is not builtin:
+                    return False
+            except KeyError:
+                return False
+        self._checked_version = env.version
+        return True
+
+
+def enable(
+    threshold: int = DEFAULT_THRESHOLD,
+    guard_failures: int = DEFAULT_MAX_GUARD_FAILURES,
+):
+    global max_guard_failures
+    if threshold < 1:
+        raise ValueError("threshold must be at least 1")
+    max_guard_failures = guard_failures
+    interpreter.hot_call_threshold = threshold
+    interpreter.hot_procedure_hook = promote
+
+
+def disable():
+    """
+    Stop counting calls and promoting procedures. Procedures which have
+    already been compiled remain compiled.
+    """
+    interpreter.hot_procedure_hook = None
+
+
+def is_enabled() -> bool:
+    return interpreter.hot_procedure_hook is promote
+
+
+def stats() -> List[TierStats]:
+    return sorted(
+        _stats,
+        key=lambda s: s.interpreted_calls + s.compiled_calls,
+        reverse=True,
+    )
+
+
+def reset_stats():
+    _stats.clear()
+
+
+def format_stats() -> str:
+    lines = [
+        f"{'procedure':<24}{'state':<16}{'interpreted':>12}"
+        f"{'compiled':>12}{'guard fails':>12}"
+    ]
+    for s in stats():
+        line = (
+            f"{s.name:<24}{s.state:<16}{s.interpreted_calls:>12}"
+            f"{s.compiled_calls:>12}{s.guard_failures:>12}"
+        )
+        if s.reason:
+            line += f"  ({s.reason})"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def promote(lambda_expression: LambdaExpression, proc: Procedure):
+    """
+    Compile a lambda expression whose procedures have become hot
+    """
+    stats = TierStats(lambda_expression)
+    _stats.append(stats)
+
+    env = proc.env
+    if not (lambda_expression.is_top_level and isinstance(env, Environment)):
+        stats.state = NOT_COMPILABLE
+        stats.reason = "not a top level lambda"
+        return
+
+    name = _global_name(lambda_expression, env)
+    try:
+        compiled = transpile_procedure(
+            name,
+            lambda_expression.header,
+            lambda_expression.parsed_body,
+            env,
+            self_proc=env[name] if name is not None else None,
+            inline_arithmetic=True,
+        )
+    except TranspileError as e:
+        stats.state = NOT_COMPILABLE
+        stats.reason = str(e)
+        return
+
+    lambda_expression.tier = CompiledTier(
+        lambda_expression, env, compiled.function, compiled.inlined_operators, stats
+    )
+    stats.state = COMPILED
+
+
+def _global_name(lambda_expression: LambdaExpression, env: Environment):
+    """
+    The name of the global variable the lambda's procedure is bound to,
+    so that its recursive calls can be compiled as direct calls
+    """
+    name = lambda_expression.name
+    try:
+        value = env[name]
+    except KeyError:
+        return None
+    if isinstance(value, Procedure) and value.lambda_expression is lambda_expression:
+        return name
+    return None
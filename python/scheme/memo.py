@@ -0,0 +1,197 @@
+"""
+Memoization of pure procedures, for recursive procedures which would
+otherwise recompute the same calls many times over.
+
+A memoized procedure caches its results keyed on its arguments, keeping
+the most recently used `maxsize` results. Arguments are keyed by type as
+well as value, so that e.g. `1`, `1.0` and `#true` are cached separately
+even though they compare equal. Calls with an unhashable argument are
+made without the cache.
+
+Procedures are memoized with `define-memo` or the `memoize` builtin, and
+their caches emptied with the `memo-clear` builtin. Partially applying a
+memoized procedure gives a memoized procedure sharing the same cache, so
+`((f 1) 2)` and `(f 1 2)` find the same result.
+"""
+
+from __future__ import annotations
+
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_MAXSIZE = 10_000
+
+_caches: weakref.WeakSet[MemoCache] = weakref.WeakSet()
+
+
+class MemoCache:
+    """
+    A least recently used cache of a procedure's results
+    """
+
+    name: str
+    maxsize: Optional[int]
+    hits: int
+    misses: int
+    evictions: int
+    # Calls made without the cache, as an argument was unhashable
+    uncached: int
+
+    def __init__(self, name: str, maxsize: Optional[int] = DEFAULT_MAXSIZE):
+        if maxsize is not None and maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.name = name
+        self.maxsize = maxsize
+        self._results: OrderedDict[Tuple[Any, ...], Any] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.uncached = 0
+        _caches.add(self)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        _caches.add(self)
+
+    def call(self, proc: Callable, args: Tuple[Any, ...]):
+        """
+        The result of applying `proc` to `args`, from the cache if it
+        has one
+        """
+        key = (*args, *map(type, args))
+        results = self._results
+        # Each change to the results is a single operation, so that calls
+        # from other threads, e.g. those of the server's sessions, can't
+        # remove a result between its lookup and its update
+        try:
+            result = results.pop(key)
+        except KeyError:
+            pass
+        except TypeError:
+            self.uncached += 1
+            return proc(*args)
+        else:
+            self.hits += 1
+            # Reinserted as the most recently used result
+            results[key] = result
+            return result
+
+        self.misses += 1
+        result = proc(*args)
+        results[key] = result
+        if self.maxsize is not None and len(results) > self.maxsize:
+            try:
+                results.popitem(last=False)
+            except KeyError:
+                # Emptied by another thread
+                pass
+            else:
+                self.evictions += 1
+        return result
+
+    def clear(self):
+        """
+        Discard the cached results, keeping the statistics
+        """
+        self._results.clear()
+
+    def __len__(self):
+        return len(self._results)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "uncached": self.uncached,
+        }
+
+
+class MemoizedProcedure:
+    """
+    A procedure whose results are cached. Called with fewer arguments than
+    it takes, it is partially applied, as compound procedures are.
+    """
+
+    __slots__ = ("_proc", "cache", "_bound_args", "arity")
+
+    _proc: Callable
+    cache: MemoCache
+    _bound_args: Tuple[Any, ...]
+    # The number of arguments still to be given, or None if the arity of
+    # the memoized procedure is unknown, as for builtins
+    arity: Optional[int]
+
+    def __init__(
+        self, proc: Callable, cache: MemoCache, bound_args: Tuple[Any, ...] = ()
+    ):
+        self._proc = proc
+        self.cache = cache
+        self._bound_args = bound_args
+        arity = getattr(proc, "arity", None)
+        self.arity = None if arity is None else arity - len(bound_args)
+
+    def __call__(self, *args):
+        arity = self.arity
+        if arity is not None and len(args) != arity:
+            if len(args) < arity:
+                return MemoizedProcedure(
+                    self._proc, self.cache, (*self._bound_args, *args)
+                )
+            raise Exception(f"Arity error, expected {arity}, got {len(args)}")
+        return self.cache.call(self._proc, (*self._bound_args, *args))
+
+    @property
+    def name(self) -> str:
+        return self.cache.name
+
+    @property
+    def procedure(self) -> Callable:
+        """
+        The procedure being memoized
+        """
+        return self._proc
+
+    def __repr__(self):
+        return f"<memoized procedure {self.name}>"
+
+
+def memoize(proc: Callable, maxsize: int = DEFAULT_MAXSIZE) -> MemoizedProcedure:
+    """
+    The `memoize` builtin
+    """
+    if isinstance(proc, MemoizedProcedure):
+        return proc
+    name = getattr(proc, "name", None) or getattr(proc, "__name__", None)
+    return MemoizedProcedure(proc, MemoCache(name or "<procedure>", maxsize))
+
+
+def memo_clear(proc: MemoizedProcedure):
+    """
+    The `memo-clear` builtin
+    """
+    if not isinstance(proc, MemoizedProcedure):
+        raise Exception(f"{proc!r} is not memoized")
+    proc.cache.clear()
+
+
+def caches() -> List[MemoCache]:
+    return list(_caches)
+
+
+def format_stats() -> str:
+    lines = [
+        f"{'procedure':<24}{'size':>10}{'hits':>12}{'misses':>12}"
+        f"{'evictions':>12}{'uncached':>10}"
+    ]
+    for cache in sorted(_caches, key=lambda c: c.hits + c.misses, reverse=True):
+        size = f"{len(cache)}/{cache.maxsize or '-'}"
+        lines.append(
+            f"{cache.name:<24}{size:>10}{cache.hits:>12}{cache.misses:>12}"
+            f"{cache.evictions:>12}{cache.uncached:>10}"
+        )
+    return "\n".join(lines)
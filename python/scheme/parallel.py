@@ -0,0 +1,228 @@
+"""
+Parallel evaluation of independent procedure applications in a pool of
+worker processes.
+
+`(pmap proc v ...)` applies a procedure to the elements of vectors, as
+`vector-map` does, with the applications split between the workers.
+`(future proc arg ...)` starts applying a procedure in a worker and
+returns at once, and `(touch f)` waits for a future's value.
+
+The workers are forked from the interpreter once a global environment
+is in use, so each starts with a copy of it, including any prelude
+already loaded. Procedures and arguments are pickled to send them to a
+worker, and results are pickled to send them back. Values bound to
+global variables, and the global environment itself, are sent as
+references to the worker's copy instead. Everything else, e.g. closures
+and numbers, is sent by value.
+
+The copies must match, so the workers are forked again whenever
+variables have been defined since they were forked. Programs which
+define everything first and then evaluate in parallel fork only once.
+
+Forking is only available on POSIX systems.
+"""
+
+from __future__ import annotations
+
+import io
+import multiprocessing
+import os
+import pickle
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from . import vectors
+from .parser import unparse
+
+# The number of worker processes, or None for one per CPU
+workers: Optional[int] = None
+# The number of pmap applications sent to a worker at a time
+chunk_size = 1
+
+_pool: Optional[ProcessPoolExecutor] = None
+# The global environment the workers were forked with, and its version
+# at the time. In the workers, these are their copies.
+_env: Any = None
+_env_version = -1
+# The name of each global variable's value, by the value's id
+_global_names: Dict[int, str] = {}
+
+# Values which are the same in every process, so aren't worth naming
+_PLAIN_TYPES = (int, float, bool, str, type(None))
+
+
+def configure(worker_count: Optional[int] = None, chunk: int = 1):
+    """
+    Set the number of workers and the pmap chunk size, shutting down the
+    current workers so that the next parallel evaluation uses them
+    """
+    global workers, chunk_size
+    if worker_count is not None and worker_count < 1:
+        raise ValueError("worker_count must be at least 1")
+    if chunk < 1:
+        raise ValueError("chunk must be at least 1")
+    workers = worker_count
+    chunk_size = chunk
+    shutdown()
+
+
+def shutdown():
+    global _pool, _env, _env_version
+    if _pool is not None:
+        _pool.shutdown()
+    _pool = None
+    _env = None
+    _env_version = -1
+    _global_names.clear()
+
+
+class ParallelError(Exception):
+    """
+    An error raised by an application evaluated in a worker
+    """
+
+
+class SchemeFuture:
+    """
+    The value of a procedure application being evaluated in a worker
+    """
+
+    __slots__ = ("_future", "_description")
+
+    def __init__(self, future: Future, description: str):
+        self._future = future
+        self._description = description
+
+    def touch(self):
+        try:
+            return _loads(self._future.result())
+        except Exception as e:
+            raise ParallelError(f"Error evaluating {self._description}: {e}") from e
+
+    def __repr__(self):
+        state = "done" if self._future.done() else "pending"
+        return f"<future {self._description} {state}>"
+
+
+def pmap(proc: Callable, *sequences: Sequence) -> Any:
+    """
+    The `pmap` builtin
+    """
+    pool = _pool_for(proc)
+    payloads = [_dumps((proc, args)) for args in zip(*sequences, strict=True)]
+    results: List[Any] = []
+    try:
+        for result in pool.map(_apply, payloads, chunksize=chunk_size):
+            results.append(_loads(result))
+    except Exception as e:
+        args = tuple(sequence[len(results)] for sequence in sequences)
+        raise ParallelError(f"Error evaluating {_describe(proc, args)}: {e}") from e
+    return _vector(results)
+
+
+def future(proc: Callable, *args) -> SchemeFuture:
+    """
+    The `future` builtin
+    """
+    pool = _pool_for(proc)
+    return SchemeFuture(
+        pool.submit(_apply, _dumps((proc, args))), _describe(proc, args)
+    )
+
+
+def touch(value):
+    """
+    The `touch` builtin. Touching a value which isn't a future gives the
+    value itself.
+    """
+    if isinstance(value, SchemeFuture):
+        return value.touch()
+    return value
+
+
+def _pool_for(proc: Callable) -> ProcessPoolExecutor:
+    """
+    The pool of workers forked with the global environment of `proc`,
+    forking them if they don't exist or their copy is out of date
+    """
+    global _pool, _env, _env_version
+    env = _globals_of(proc)
+    if env is None:
+        env = _env
+    if _pool is not None and env is _env and _version(env) == _env_version:
+        return _pool
+
+    shutdown()
+    _env = env
+    _env_version = _version(env)
+    if env is not None:
+        _global_names.update(
+            (id(value), name)
+            for name, value in env.items()
+            if not isinstance(value, _PLAIN_TYPES)
+        )
+    context = multiprocessing.get_context("fork")
+    _pool = ProcessPoolExecutor(workers or os.cpu_count(), mp_context=context)
+    return _pool
+
+
+def _globals_of(proc: Callable):
+    # Memoized procedures wrap the procedure with the environment
+    proc = getattr(proc, "procedure", proc)
+    env = getattr(proc, "env", None)
+    return None if env is None else env.globals
+
+
+def _version(env) -> int:
+    return -1 if env is None else env.version
+
+
+class _Pickler(pickle.Pickler):
+    def persistent_id(self, obj):
+        if obj is None:
+            return None
+        if obj is _env:
+            return ("env",)
+        name = _global_names.get(id(obj))
+        return None if name is None else ("global", name)
+
+
+class _Unpickler(pickle.Unpickler):
+    def persistent_load(self, pid):
+        if pid[0] == "env":
+            return _env
+        return _env[pid[1]]
+
+
+def _dumps(value) -> bytes:
+    stream = io.BytesIO()
+    _Pickler(stream, pickle.HIGHEST_PROTOCOL).dump(value)
+    return stream.getvalue()
+
+
+def _loads(data: bytes):
+    return _Unpickler(io.BytesIO(data)).load()
+
+
+def _apply(payload: bytes) -> bytes:
+    """
+    Run in a worker: apply a pickled procedure to its pickled arguments
+    """
+    proc, args = _loads(payload)
+    return _dumps(proc(*args))
+
+
+def _describe(proc: Callable, args: Tuple[Any, ...]) -> str:
+    name = getattr(proc, "name", None) or getattr(proc, "__name__", None)
+    items: List[str] = [name or repr(proc)]
+    for arg in args:
+        # Numbers, booleans and symbols are shown as they would be written
+        items.append(unparse(arg) if isinstance(arg, (int, float, str)) else repr(arg))
+    return "(" + " ".join(items) + ")"
+
+
+def _vector(values: List[Any]):
+    numpy = vectors.load_numpy()
+    if numpy is None:
+        return tuple(values)
+    return numpy.array(values)
@@ -1,10 +1,25 @@
 from __future__ import annotations
 
-from typing import Dict, Generator, List, Literal
+import re
+from sys import intern
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    TextIO,
+    Tuple,
+    Union,
+)
 
 from .common import ParsedExpression
 
-OPENER_TO_CLOSER: Dict[str, Literal[")", "]", "}"]] = {
+Closer = Literal[")", "]", "}"]
+
+OPENER_TO_CLOSER: Dict[str, Closer] = {
     "(": ")",
     "[": "]",
     "{": "}",
@@ -14,150 +29,350 @@ OPENER_TO_CLOSER: Dict[str, Literal[")", "]", "}"]] = {
 OPENERS = tuple(OPENER_TO_CLOSER.keys())
 CLOSERS = tuple(OPENER_TO_CLOSER.values())
 
+CLOSER_TO_OPENER = {closer: opener for opener, closer in OPENER_TO_CLOSER.items()}
 
-def parse(s: str):
-    return read(tokenize(s))
+DEFAULT_CHUNK_SIZE = 1 << 16
 
+# Each token is a paren, or a run of characters up to the next paren or
+# whitespace, so the source is split into tokens in a single scan
+TOKEN_PATTERN = re.compile(r"[()\[\]{}]|[^\s()\[\]{}]+")
 
-def read(tokens: Generator[TokenProcessor, None, None]):
+NUMBER_PATTERN = re.compile(
+    r"[+-]?(?:(?P<int>\d+)|(?P<float>(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?))"
+)
 
-    result: List[ParsedExpression] = []
-    stack: List[ListExpression] = []
+BOOLEANS = {"#true": True, "#false": False}
 
-    for token in tokens:
-        token.process(stack, result)
+# The characters atoms which are not symbols can start with
+_NUMBER_START = frozenset("0123456789+-.")
+_NON_SYMBOL_START = _NUMBER_START | {"#"}
 
-    if stack:
-        raise MissingClosingParenError("Missing expected )")
+Position = Tuple[int, int]
 
-    return result
 
+def parse(s: str, hash_cons: bool = False) -> List[ParsedExpression]:
+    reader = Reader(HashConsTable() if hash_cons else None)
+    return reader.feed(s) + reader.close()
 
-def tokenize(chars: str) -> Generator[TokenProcessor, None, None]:
-    STRING_TOKENS = (
-        chars.replace("(", " ( ")
-        .replace(")", " ) ")
-        .replace("[", " [ ")
-        .replace("]", " ] ")
-        .replace("{", " { ")
-        .replace("}", " } ")
-        .split()
-    )
 
-    for s_token in STRING_TOKENS:
-        if s_token in OPENERS:
-            yield OpenParen(s_token)
-        elif s_token in CLOSERS:
-            yield CloseParen(s_token)
-        else:
-            yield Atom(s_token)
+def atom_value(token: str) -> ParsedExpression:
+    """
+    The value of an atom, which is an int or float if it has the syntax
+    of one, a boolean if it is #true or #false, and otherwise a symbol.
+    Symbols are interned, so that every occurrence of a symbol is the
+    same string object.
+    """
+    first = token[0]
+    if first in _NUMBER_START:
+        if token.isdecimal():
+            return int(token)
+        match = NUMBER_PATTERN.fullmatch(token)
+        if match is not None:
+            return int(token) if match.lastgroup == "int" else float(token)
+    elif first == "#":
+        boolean = BOOLEANS.get(token)
+        if boolean is not None:
+            return boolean
+    return intern(token)
+
+
+def unparse(exp: ParsedExpression) -> str:
+    """
+    The source text of a parsed expression
+    """
+    if exp is True:
+        return "#true"
+    if exp is False:
+        return "#false"
+    if isinstance(exp, tuple):
+        return "(" + " ".join(unparse(item) for item in exp) + ")"
+    return str(exp)
 
 
-class ListExpression:
+class HashConsTable:
+    """
+    Shares structurally identical expressions, so that e.g. every
+    `(- n 1)` in a program is the same tuple.
 
-    def __init__(self, opening_paren: str):
+    Atoms are shared by type as well as value, so that `1`, `1.0` and
+    `#true` are kept apart even though they compare equal. Since the
+    items of a list are then all shared, lists are looked up by the
+    identities of their items.
+
+    The table is only needed while reading. Dropping it afterwards frees
+    its keys, leaving just the shared expressions.
+    """
+
+    def __init__(self):
+        self._atoms: Dict[Any, ParsedExpression] = {}
+        self._lists: Dict[Tuple[int, ...], ParsedExpression] = {}
+
+    def atom(self, value: ParsedExpression) -> ParsedExpression:
+        value_type = type(value)
+        if value_type is str:
+            # Symbols are already interned
+            return value
+        # The sign distinguishes 0.0 and -0.0
+        key = (value_type, value, value_type is float and str(value))
+        return self._atoms.setdefault(key, value)
+
+    def list(self, items: List[ParsedExpression]) -> ParsedExpression:
+        key = tuple(map(id, items))
+        shared = self._lists.get(key)
+        if shared is None:
+            shared = self._lists[key] = tuple(items)
+        return shared
+
+    def __len__(self):
         """
-        Create a ListExpression for the parser stack,
-        specifying the symbol used to close that list
-        expression
+        The number of distinct expressions in the table
         """
-        self._closer = OPENER_TO_CLOSER[opening_paren]
-        self._items: List[TokenProcessor] = []
+        return len(self._atoms) + len(self._lists)
 
-    def append(self, item: TokenProcessor):
-        self._items.append(item)
 
-    def __getitem__(self, key):
-        return self._items[key]
+class Token:
+    """
+    A token of source text, with the line and column (both counting
+    from 1) at which it starts
+    """
 
-    @property
-    def closer(self):
-        return self._closer
+    __slots__ = ("text", "line", "column")
 
-    def to_tuple(self):
-        return tuple(self._items[:])
+    text: str
+    line: int
+    column: int
 
+    def __init__(self, text: str, line: int, column: int):
+        self.text = text
+        self.line = line
+        self.column = column
 
-class TokenProcessor:
-    """
-    Base class, subclasses of which are specialised to parse a particular
-    sort of token
-    """
+    @property
+    def is_opener(self) -> bool:
+        return self.text in OPENER_TO_CLOSER
 
-    def process(self, stack, result):
-        raise NotImplementedError()
+    @property
+    def is_closer(self) -> bool:
+        return self.text in CLOSER_TO_OPENER
 
+    @property
+    def value(self) -> ParsedExpression:
+        """
+        The value of an atom
+        """
+        return atom_value(self.text)
 
-class OpenParen(TokenProcessor):
-    """
-    Parses open parentheses with the particular "opener" specified
-    e.g. ( [ or {
-    """
+    @property
+    def end(self) -> Position:
+        """
+        The line and column just past the end of the token
+        """
+        return self.line, self.column + len(self.text)
 
-    def __init__(self, token):
-        self._token = token
+    def __repr__(self):
+        return f"<token {self.text!r} at {self.line}:{self.column}>"
 
-    def process(self, stack, result):
-        stack.append(ListExpression(self._token))
 
+def tokenize(chars: str) -> Iterator[Token]:
+    lines = _LineCounter()
+    for match in TOKEN_PATTERN.finditer(chars):
+        yield Token(match.group(), *lines.position(chars, match.start()))
 
-class CloseParen(TokenProcessor):
+
+class _LineCounter:
     """
-    Parses closing parentheses, making sure that the type of
-    paren matches the current open paren
+    Converts offsets into source text, which may be read in chunks, into
+    line and column numbers. Offsets must be given in increasing order,
+    so that each newline is only counted once.
     """
 
-    def __init__(self, token: str):
-        self._closer = token
+    __slots__ = ("_line", "_line_start", "_counted")
 
-    def process(self, stack, result):
-        if not stack:
-            raise SyntaxError("Unmatched )")
-        top = stack.pop()
-        if top.closer != self._closer:
-            raise SyntaxError(f"Expected closing '{top.closer}'")
-        if stack:
-            # Add completed list to previous list in stack
-            stack[-1].append(top.to_tuple())
-        else:
-            # Add completed expression to result
-            result.append(top.to_tuple())
+    def __init__(self):
+        self._line = 1
+        # The offset at which the current line starts, which is negative
+        # if it started in an earlier chunk
+        self._line_start = 0
+        self._counted = 0
 
+    def position(self, text: str, offset: int) -> Position:
+        newlines = text.count("\n", self._counted, offset)
+        if newlines:
+            self._line += newlines
+            self._line_start = text.rindex("\n", self._counted, offset) + 1
+        self._counted = offset
+        return self._line, offset - self._line_start + 1
 
-class Atom(TokenProcessor):
+    def end_chunk(self, text: str):
+        """
+        Count the rest of a chunk, making later offsets relative to
+        the next one
+        """
+        self.position(text, len(text))
+        self._line_start -= len(text)
+        self._counted = 0
+
+
+class Reader:
     """
-    Parses atomic values
+    An incremental reader, which is fed source text a chunk at a time and
+    returns each top level expression as soon as it is complete.
+
+    The lists which are still open are kept between chunks, so that a
+    chunk may end anywhere, even part way through an atom, and each chunk
+    is only scanned once. Where a list was opened is only worked out for
+    lists left open at the end of a chunk, or when reporting an error.
+
+    Symbols are interned, and given a HashConsTable, identical
+    expressions are shared.
     """
 
-    def __init__(self, token: str):
-        self._token = token
+    def __init__(self, table: Optional[HashConsTable] = None):
+        # For each open list, the items of the list enclosing it, the
+        # paren which closes it, and where it was opened: its offset in
+        # the current chunk, or once that has been read, its position
+        self._enclosing_items: List[List[ParsedExpression]] = []
+        self._closers: List[Closer] = []
+        self._starts: List[Union[int, Position]] = []
+        self._items: List[ParsedExpression] = []
+        self._partial_token = ""
+        self._lines = _LineCounter()
+        self._table = table
+
+    def feed(self, chunk: str) -> List[ParsedExpression]:
+        text = self._partial_token + chunk
+        # The last token may continue in the next chunk
+        end = len(text)
+        while end > 0 and not _is_delimiter(text[end - 1]):
+            end -= 1
+        self._partial_token = text[end:]
+        return self._read(text[:end])
+
+    def close(self) -> List[ParsedExpression]:
+        """
+        Signal the end of the input, returning any remaining expressions
+        """
+        text, self._partial_token = self._partial_token, ""
+        result = self._read(text)
+        if self._closers:
+            closer = self._closers[-1]
+            raise MissingClosingParenError(
+                f"Missing expected {closer} for {CLOSER_TO_OPENER[closer]}"
+                f" opened at {_describe(self._starts[-1])}"
+            )
+        return result
 
-    def process(self, stack, result):
-        if not stack:
-            result.append(self._typed_atom())
-        else:
-            top = stack[-1]
-            top.append(self._typed_atom())
+    @property
+    def depth(self) -> int:
+        """
+        The number of lists opened but not yet closed
+        """
+        return len(self._closers)
+
+    def _read(self, text: str) -> List[ParsedExpression]:
+        enclosing_items = self._enclosing_items
+        closers = self._closers
+        starts = self._starts
+        items = self._items
+        table = self._table
+        result: List[ParsedExpression] = []
+        if not closers:
+            items = result
+        value: ParsedExpression
+
+        for match in TOKEN_PATTERN.finditer(text):
+            token = match.group()
+            first = token[0]
+            if first in OPENER_TO_CLOSER:
+                enclosing_items.append(items)
+                items = []
+                closers.append(OPENER_TO_CLOSER[token])
+                starts.append(match.start())
+                continue
+            if first in CLOSER_TO_OPENER:
+                if not closers:
+                    raise SyntaxError(
+                        f"Unmatched {token} at"
+                        f" {_describe(self._lines.position(text, match.start()))}"
+                    )
+                if closers[-1] != token:
+                    self._raise_mismatch(text, match.start())
+                closers.pop()
+                starts.pop()
+                value = tuple(items) if table is None else table.list(items)
+                items = enclosing_items.pop()
+                if not closers:
+                    # A top level expression is complete
+                    result.append(value)
+                    items = result
+                    continue
+            elif first in _NON_SYMBOL_START:
+                value = atom_value(token)
+                if table is not None:
+                    value = table.atom(value)
+            else:
+                value = intern(token)
+            items.append(value)
+
+        self._items = items
+        self._resolve_starts(text)
+        self._lines.end_chunk(text)
+        return result
+
+    def _resolve_starts(self, text: str):
+        """
+        Work out the positions of the lists opened in a chunk which are
+        still open at its end, before the chunk is discarded
+        """
+        starts = self._starts
+        first_unresolved = len(starts)
+        while first_unresolved > 0 and isinstance(starts[first_unresolved - 1], int):
+            first_unresolved -= 1
+        for i in range(first_unresolved, len(starts)):
+            starts[i] = self._lines.position(text, starts[i])  # type: ignore[arg-type]
+
+    def _raise_mismatch(self, text: str, offset: int):
+        self._resolve_starts(text)
+        closer = self._closers[-1]
+        raise SyntaxError(
+            f"Expected closing '{closer}' at"
+            f" {_describe(self._lines.position(text, offset))}"
+            f" for {CLOSER_TO_OPENER[closer]} opened at {_describe(self._starts[-1])}"
+        )
+
+
+def read_chunks(
+    chunks: Iterable[str], table: Optional[HashConsTable] = None
+) -> Iterator[ParsedExpression]:
+    """
+    Yield each top level expression in a sequence of chunks of source
+    text as soon as it has been read
+    """
+    reader = Reader(table)
+    for chunk in chunks:
+        yield from reader.feed(chunk)
+    yield from reader.close()
 
-    def _typed_atom(self):
 
-        if self._token == "#true":
-            return True
+def read_stream(
+    stream: TextIO,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    table: Optional[HashConsTable] = None,
+) -> Iterator[ParsedExpression]:
+    """
+    Yield each top level expression read from a text stream, e.g. an open
+    file, as soon as it has been read
+    """
+    return read_chunks(iter(lambda: stream.read(chunk_size), ""), table)
 
-        if self._token == "#false":
-            return False
 
-        try:
-            return int(self._token)
-        except ValueError:
-            pass
+def _is_delimiter(char: str) -> bool:
+    return char.isspace() or char in OPENER_TO_CLOSER or char in CLOSER_TO_OPENER
 
-        try:
-            return float(self._token)
-        except ValueError:
-            pass
 
-        return self._token
+def _describe(start: Union[int, Position]) -> str:
+    line, column = start  # type: ignore[misc]
+    return f"line {line}, column {column}"
 
 
 class MissingClosingParenError(SyntaxError):
@@ -0,0 +1,204 @@
+"""
+A profiler of compound procedures, which records for each named procedure
+the number of times it was called, the wall time spent in it, and the
+memory blocks it allocated.
+
+The time spent in a procedure is given inclusive of the procedures it
+calls, and exclusive of them. As a call in tail position replaces the
+call making it, the time spent in a procedure called in tail position is
+not included in the inclusive time of the procedure calling it. The time
+of recursive calls is only counted once in the inclusive time.
+
+Allocated blocks are the net number of memory blocks allocated by Python
+during the procedure's own evaluation, excluding the procedures it calls,
+i.e. the blocks still in use when it returns.
+
+The time spent in each stack of procedure calls can also be written in
+the collapsed stack format, one line per stack with the exclusive time
+in microseconds, for tools such as flamegraph.pl and speedscope.
+
+Procedures are profiled as they are entered by the recursive evaluator,
+and evaluated by it, even if the JIT has compiled them.
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from . import interpreter
+from .interpreter import Procedure
+
+SORT_KEYS = ("exclusive", "inclusive", "calls", "allocated", "name")
+
+
+class ProcedureStats:
+    """
+    The calls of the procedures with a given name
+    """
+
+    __slots__ = (
+        "name",
+        "calls",
+        "inclusive_time",
+        "exclusive_time",
+        "allocated_blocks",
+        "_active_calls",
+    )
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.inclusive_time = 0.0
+        self.exclusive_time = 0.0
+        self.allocated_blocks = 0
+        self._active_calls = 0
+
+    def __repr__(self):
+        return f"<profile of {self.name}: {self.calls} calls>"
+
+
+class _StackNode:
+    """
+    A procedure called with a given stack of callers, and the time spent
+    in it with that stack, excluding the procedures it calls
+    """
+
+    __slots__ = ("name", "children", "time")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.children: Dict[str, _StackNode] = {}
+        self.time = 0.0
+
+    def child(self, name: str) -> _StackNode:
+        node = self.children.get(name)
+        if node is None:
+            node = self.children[name] = _StackNode(name)
+        return node
+
+
+class _Call:
+    """
+    A procedure call in progress, and the totals of the calls it has made
+    """
+
+    __slots__ = ("node", "child_time", "child_blocks")
+
+    def __init__(self, node: _StackNode):
+        self.node = node
+        self.child_time = 0.0
+        self.child_blocks = 0
+
+
+_stats: Dict[str, ProcedureStats] = {}
+_root = _StackNode("")
+_calls: List[_Call] = []
+
+
+def enable():
+    interpreter.profile_hook = enter
+
+
+def disable():
+    interpreter.profile_hook = None
+
+
+def is_enabled() -> bool:
+    return interpreter.profile_hook is enter
+
+
+def reset_stats():
+    _stats.clear()
+    _root.children.clear()
+
+
+def enter(proc: Procedure, args) -> Any:
+    """
+    Evaluate the body of a procedure for a full set of arguments, as
+    Procedure.enter, recording the call
+    """
+    # Time the bookkeeping as part of the call, rather than the caller
+    start = time.perf_counter()
+    name = proc.name
+    stats = _stats.get(name)
+    if stats is None:
+        stats = _stats[name] = ProcedureStats(name)
+    parent = _calls[-1] if _calls else None
+    call = _Call((_root if parent is None else parent.node).child(name))
+    _calls.append(call)
+    stats._active_calls += 1
+
+    start_blocks = sys.getallocatedblocks()
+    try:
+        return proc.interpret(args)
+    finally:
+        blocks = sys.getallocatedblocks() - start_blocks
+        _calls.pop()
+        stats._active_calls -= 1
+        elapsed = time.perf_counter() - start
+
+        stats.calls += 1
+        if not stats._active_calls:
+            stats.inclusive_time += elapsed
+        stats.exclusive_time += elapsed - call.child_time
+        stats.allocated_blocks += blocks - call.child_blocks
+        call.node.time += elapsed - call.child_time
+        if parent is not None:
+            parent.child_time += elapsed
+            parent.child_blocks += blocks
+
+
+def stats(sort: str = "exclusive") -> List[ProcedureStats]:
+    """
+    The statistics of each procedure, sorted by name or in descending
+    order of the given statistic
+    """
+    if sort == "name":
+        return sorted(_stats.values(), key=lambda s: s.name)
+    key = {
+        "exclusive": lambda s: s.exclusive_time,
+        "inclusive": lambda s: s.inclusive_time,
+        "calls": lambda s: s.calls,
+        "allocated": lambda s: s.allocated_blocks,
+    }[sort]
+    return sorted(_stats.values(), key=key, reverse=True)
+
+
+def format_stats(sort: str = "exclusive", limit: Optional[int] = None) -> str:
+    lines = [
+        f"{'procedure':<24}{'calls':>10}{'inclusive s':>14}{'exclusive s':>14}"
+        f"{'per call us':>14}{'allocated':>12}"
+    ]
+    for s in stats(sort)[:limit]:
+        per_call = s.exclusive_time / s.calls * 1e6
+        lines.append(
+            f"{s.name:<24}{s.calls:>10}{s.inclusive_time:>14.6f}"
+            f"{s.exclusive_time:>14.6f}{per_call:>14.2f}{s.allocated_blocks:>12}"
+        )
+    return "\n".join(lines)
+
+
+def collapsed_stacks() -> Iterator[str]:
+    """
+    Each stack of procedure calls, outermost first and separated by
+    semicolons, with the time spent in it in whole microseconds
+    """
+    # Walked without recursion, as stacks can be deeper than Python's
+    path: List[str] = []
+    pending = [(node, 0) for node in reversed(_root.children.values())]
+    while pending:
+        node, depth = pending.pop()
+        del path[depth:]
+        path.append(node.name)
+        microseconds = round(node.time * 1e6)
+        if microseconds:
+            yield f"{';'.join(path)} {microseconds}"
+        pending.extend((child, depth + 1) for child in reversed(node.children.values()))
+
+
+def write_collapsed_stacks(path: str):
+    with open(path, "w") as f:
+        for line in collapsed_stacks():
+            f.write(f"{line}\n")
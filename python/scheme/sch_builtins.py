@@ -1,4 +1,4 @@
-from operator import add, mul, truediv, and_, or_, not_
+from operator import add, mul, truediv, and_, or_, not_, eq, lt, gt, le, ge
 from typing import Any, Optional  # noqa
 
 def display(value: Any):
@@ -0,0 +1,257 @@
+"""
+An evaluation server, which serves many sessions from one process.
+
+Each connection is a session with its own global environment, copied
+from a base environment which is built, and has any prelude loaded,
+once when the server starts.
+
+The protocol is line based. The client sends a line of source text, as
+it would type at the REPL, and the server replies with any lines
+displayed while evaluating it, each prefixed with `out `, followed by
+one status line:
+
+- `ok <value>` once the expressions have been evaluated, with the value
+  of the last one, which is empty if it has no value
+- `more` if the input is missing a closing paren, in which case the
+  next line continues it
+- `error <message>` if reading or evaluating the input failed, including
+  if the line isn't UTF-8, or is longer than the server's line limit
+
+Evaluation runs in a pool of threads, so the event loop goes on serving
+other sessions while one session evaluates a long running expression.
+As a thread can't be stopped, an evaluation which never ends keeps its
+thread. So that such evaluations can't stall every session, only a
+limited number of evaluations may wait for a thread, and any more are
+refused with an error until some have finished.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+from .common import ParsedExpression
+from .evaluators import DEFAULT_EVALUATOR, EVALUATORS
+from .interpreter import create_global_env, Environment
+from .parser import parse, MissingClosingParenError
+
+OUTPUT_PREFIX = "out "
+OK = "ok"
+MORE = "more"
+ERROR = "error"
+
+STATUSES = (OK, MORE, ERROR)
+
+# The default number of evaluations which may wait for a thread
+DEFAULT_MAX_QUEUED = 16
+
+Reply = Tuple[List[str], str]
+
+
+class Session:
+    """
+    The state of one client: its environment, and any input still
+    missing a closing paren
+    """
+
+    def __init__(self, env: Environment, evaluator: str = DEFAULT_EVALUATOR):
+        self.env = env
+        self._evaluate = EVALUATORS[evaluator]
+        self._pending = ""
+
+    def feed(self, line: str) -> Reply:
+        """
+        Evaluate a line of input, returning the lines it displayed and the
+        status line to reply with
+        """
+        source = f"{self._pending} {line}" if self._pending else line
+        output = io.StringIO()
+        with _thread_stdout.redirect(output):
+            try:
+                result = None
+                for parsed in parse(source):
+                    result = self._evaluate(parsed, self.env)
+            except MissingClosingParenError:
+                self._pending = source
+                return _lines(output), MORE
+            except Exception as e:
+                self._pending = ""
+                return _lines(output), f"{ERROR} {_one_line(str(e))}"
+        self._pending = ""
+        value = "" if result is None else _one_line(str(result))
+        return _lines(output), f"{OK} {value}".rstrip()
+
+
+class EvaluationServer:
+    def __init__(
+        self,
+        evaluator: str = DEFAULT_EVALUATOR,
+        prelude: Iterable[ParsedExpression] = (),
+        max_workers: Optional[int] = None,
+        max_queued: int = DEFAULT_MAX_QUEUED,
+    ):
+        self._evaluator = evaluator
+        self._base_env = create_global_env()
+        evaluate = EVALUATORS[evaluator]
+        for exp in prelude:
+            evaluate(exp, self._base_env)
+        if max_workers is None:
+            # ThreadPoolExecutor's default
+            max_workers = min(32, (os.cpu_count() or 1) + 4)
+        self._executor = ThreadPoolExecutor(max_workers, "scheme-session")
+        # The evaluations running or waiting for a thread, which are only
+        # counted by the event loop's thread
+        self._evaluations = 0
+        self._max_evaluations = max_workers + max_queued
+        self.session_count = 0
+
+    def new_session(self) -> Session:
+        self.session_count += 1
+        return Session(self._base_env.copy(), self._evaluator)
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        session = self.new_session()
+        try:
+            while True:
+                reply: Reply
+                try:
+                    line = (await _read_line(reader)).decode()
+                except ValueError as e:
+                    # The line is too long, or isn't UTF-8
+                    reply = [], f"{ERROR} {_one_line(str(e))}"
+                else:
+                    if not line:
+                        break
+                    reply = await self._feed(session, line.rstrip("\r\n"))
+                output, status = reply
+                for output_line in output:
+                    writer.write(f"{OUTPUT_PREFIX}{output_line}\n".encode())
+                writer.write(f"{status}\n".encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _feed(self, session: Session, line: str) -> Reply:
+        """
+        Evaluate a line of a session's input in a thread, unless too many
+        evaluations are already running or waiting for one
+        """
+        if self._evaluations >= self._max_evaluations:
+            return [], f"{ERROR} The server is busy, try again later"
+        self._evaluations += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, session.feed, line)
+        finally:
+            self._evaluations -= 1
+
+    async def start_tcp(self, host: str = "127.0.0.1", port: int = 0):
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def start_unix(self, path: str):
+        return await asyncio.start_unix_server(self.handle_connection, path)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def request(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter, line: str
+) -> Reply:
+    """
+    Send a line to a server, returning its reply
+    """
+    writer.write(f"{line}\n".encode())
+    await writer.drain()
+    output = []
+    while True:
+        reply = (await reader.readline()).decode()
+        if not reply:
+            raise ConnectionError("The server closed the connection")
+        reply = reply.rstrip("\n")
+        if reply.startswith(OUTPUT_PREFIX):
+            output.append(reply[len(OUTPUT_PREFIX) :])
+        elif reply.split(" ", 1)[0] in STATUSES:
+            return output, reply
+
+
+async def _read_line(reader: asyncio.StreamReader) -> bytes:
+    """
+    Read a line as StreamReader.readline does, but discard all of a line
+    longer than the reader's limit before raising ValueError, so that
+    reading can go on from the next line
+    """
+    try:
+        return await reader.readuntil(b"\n")
+    except asyncio.IncompleteReadError as e:
+        return e.partial
+    except asyncio.LimitOverrunError:
+        while True:
+            try:
+                await reader.readuntil(b"\n")
+                break
+            except asyncio.IncompleteReadError:
+                break
+            except asyncio.LimitOverrunError as e:
+                await reader.readexactly(e.consumed)
+        raise ValueError("The line is longer than the server's limit")
+
+
+class _ThreadStdout(io.TextIOBase):
+    """
+    Stands in for sys.stdout, sending what each thread prints to the
+    stream it has redirected its output to, if any, so that sessions
+    evaluating at the same time each get their own output
+    """
+
+    def __init__(self, stdout):
+        self._stdout = stdout
+        self._local = threading.local()
+
+    def redirect(self, stream: io.StringIO) -> _Redirection:
+        return _Redirection(self, stream)
+
+    def _stream(self):
+        stream = getattr(self._local, "stream", None)
+        return self._stdout if stream is None else stream
+
+    def write(self, text: str) -> int:
+        return self._stream().write(text)
+
+    def flush(self):
+        self._stream().flush()
+
+
+class _Redirection:
+    def __init__(self, thread_stdout: _ThreadStdout, stream: io.StringIO):
+        self._thread_stdout = thread_stdout
+        self._stream = stream
+
+    def __enter__(self):
+        if sys.stdout is not self._thread_stdout:
+            self._thread_stdout._stdout = sys.stdout
+            sys.stdout = self._thread_stdout
+        self._thread_stdout._local.stream = self._stream
+
+    def __exit__(self, *exc_info):
+        self._thread_stdout._local.stream = None
+
+
+_thread_stdout = _ThreadStdout(sys.stdout)
+
+
+def _lines(output: io.StringIO) -> List[str]:
+    return output.getvalue().splitlines()
+
+
+def _one_line(text: str) -> str:
+    return " ".join(text.splitlines())
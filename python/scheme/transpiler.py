@@ -0,0 +1,496 @@
+"""
+Translates top level procedure definitions into Python source code, which
+is compiled into real Python functions.
+
+Parameters and let bound variables become Python local variables, and
+global variables are looked up in the global environment when they are
+referenced, so that redefining them behaves as it does in the interpreter.
+Calls in tail position are run in constant stack space: calls of the
+procedure to itself become a loop, and other calls are returned as a
+TailCall to be run by the caller, as in the interpreter.
+
+Only definitions built from if, let, begin, lambda, procedure application,
+variables and literals are translated. Anything else raises TranspileError,
+and `py_seval` falls back to the interpreter.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from .common import ParsedExpression
+from . import interpreter, sch_builtins
+from .interpreter import (
+    is_list,
+    is_let_assignment,
+    is_proc_header,
+    seval,
+    Environment,
+    ProcHeader,
+    TailCall,
+)
+
+
+class TranspileError(Exception):
+    pass
+
+
+class CompiledProcedure:
+    """
+    A procedure whose body has been compiled to a Python function,
+    taking exactly one positional argument per parameter
+    """
+
+    __slots__ = (
+        "function",
+        "n_params",
+        "name",
+        "source",
+        "bound_args",
+        "inlined_operators",
+    )
+
+    function: Callable
+    n_params: int
+    name: str
+    source: Optional[str]
+    bound_args: Tuple[Any, ...]
+    inlined_operators: FrozenSet[str]
+
+    def __init__(
+        self,
+        function: Callable,
+        n_params: int,
+        name: str,
+        source: Optional[str] = None,
+        bound_args: Tuple[Any, ...] = (),
+    ):
+        self.function = function
+        self.n_params = n_params
+        self.name = name
+        self.source = source
+        self.bound_args = bound_args
+        self.inlined_operators = frozenset()
+
+    @property
+    def arity(self) -> int:
+        return self.n_params - len(self.bound_args)
+
+    def __call__(self, *args):
+        return finish(self.enter(args))
+
+    def enter(self, args):
+        """
+        As Procedure.enter, the function may return a TailCall
+        """
+        if len(args) == self.arity:
+            return self.function(*self.bound_args, *args)
+        if len(args) < self.arity:
+            return CompiledProcedure(
+                self.function,
+                self.n_params,
+                self.name,
+                self.source,
+                (*self.bound_args, *args),
+            )
+        raise Exception(f"Arity error, expected {self.arity}, got {len(args)}")
+
+    def __repr__(self):
+        return f"<compiled procedure {self.name}>"
+
+
+interpreter.TAIL_CALLABLE_TYPES.add(CompiledProcedure)
+
+
+def finish(result):
+    while type(result) is TailCall:
+        result = result.proc.enter(result.args)
+    return result
+
+
+def tail_call(proc, *args):
+    if type(proc) in interpreter.TAIL_CALLABLE_TYPES:
+        return TailCall(proc, args)
+    if not callable(proc):
+        raise Exception("Invalid function application")
+    return proc(*args)
+
+
+def py_seval(exp: ParsedExpression, env: Environment):
+    """
+    Evaluate an expression, translating it to Python if it is the
+    definition of a procedure, and using the interpreter otherwise
+    """
+    definition = procedure_definition(exp)
+    if definition is not None:
+        name, header, body = definition
+        try:
+            proc = transpile_procedure(name, header, body, env)
+        except TranspileError:
+            pass
+        else:
+            env.define(name, proc)
+            return None
+    return seval(exp, env)
+
+
+def procedure_definition(
+    exp: ParsedExpression,
+) -> Optional[Tuple[str, ProcHeader, ParsedExpression]]:
+    """
+    Match (define name (params...) body) or (define name (lambda (params...) body))
+    """
+    if not (is_list(exp) and exp and exp[0] == "define" and isinstance(exp[1], str)):
+        return None
+    if len(exp) == 4 and is_proc_header(exp[2]):
+        return exp[1], exp[2], exp[3]
+    if len(exp) == 3:
+        value = exp[2]
+        if (
+            is_list(value)
+            and len(value) == 3
+            and value[0] == "lambda"
+            and is_proc_header(value[1])
+        ):
+            return exp[1], value[1], value[2]
+    return None
+
+
+def transpile_procedure(
+    name: Optional[str],
+    header: ProcHeader,
+    body: ParsedExpression,
+    env: Environment,
+    self_proc: Any = None,
+    inline_arithmetic: bool = False,
+) -> CompiledProcedure:
+    """
+    Compile a procedure definition for the global environment `env`.
+
+    Calls of the global variable `name` are made directly, rather than
+    through the global environment, while it is bound to `self_proc`,
+    which defaults to the CompiledProcedure itself. `name` is None for
+    procedures which are not bound to a global variable.
+
+    If `inline_arithmetic` is set, applications of the global arithmetic
+    procedures are compiled to Python operators. The compiled procedure
+    is then only valid while those variables are bound to the builtins,
+    and the names of those it depends on are listed in `inlined_operators`.
+    """
+    generator = _CodeGenerator(name, header, inline_arithmetic)
+    source = generator.generate(body)
+    namespace: Dict[str, Any] = {
+        "__CompiledProcedure": CompiledProcedure,
+        "__TailCall": TailCall,
+        "__finish": finish,
+        "__tail_call": tail_call,
+    }
+    filename = f"<scheme procedure {name or '<lambda>'}>"
+    exec(compile(source, filename, "exec"), namespace)
+    proc = namespace["__make"](env, self_proc)
+    proc.source = source
+    proc.inlined_operators = frozenset(generator.inlined_operators)
+    return proc
+
+
+def generate_source(
+    name: Optional[str],
+    header: ProcHeader,
+    body: ParsedExpression,
+    inline_arithmetic: bool = False,
+) -> str:
+    return _CodeGenerator(name, header, inline_arithmetic).generate(body)
+
+
+LocalNames = Dict[str, str]
+
+INDENT = "    "
+
+TRANSLATABLE_SPECIAL_FORMS = ("if", "let", "begin", "lambda")
+
+# The builtins which applications may be compiled to Python operators for
+INLINABLE_OPERATORS = {
+    "+": (sch_builtins.add, "+"),
+    "-": (sch_builtins.minus, "-"),
+    "*": (sch_builtins.mul, "*"),
+    "/": (sch_builtins.truediv, "/"),
+}
+
+
+class _CodeGenerator:
+    """
+    Generates the source of a module defining `__make(__g, __self)`, which
+    returns the procedure as a CompiledProcedure, for global environment `__g`
+    """
+
+    inlined_operators: Set[str]
+
+    def __init__(
+        self, name: Optional[str], header: ProcHeader, inline_arithmetic: bool
+    ):
+        self._name = name
+        self._header = header
+        self._inline_arithmetic = inline_arithmetic
+        self._n_names = 0
+        self._lines: List[str] = []
+        self.inlined_operators = set()
+
+    def generate(self, body: ParsedExpression) -> str:
+        if len(set(self._header)) != len(self._header):
+            raise TranspileError("Duplicate parameter")
+        params = self._fresh_names(len(self._header))
+        local_names = dict(zip(self._header, params))
+
+        self._emit(0, "def __make(__g, __self=None):")
+        self._emit(1, f"def __f({', '.join(params)}):")
+        if self._name is None:
+            self._emit(2, "__is_self = False")
+        else:
+            self._emit(2, f"__is_self = __g[{self._name!r}] is __self")
+        self._emit(2, "while True:")
+        self._tail_statements(body, local_names, params, 3)
+        self._emit(
+            1,
+            f"__compiled = __CompiledProcedure(__f, {len(params)}, "
+            f"{self._name or '<lambda>'!r})",
+        )
+        self._emit(1, "if __self is None:")
+        self._emit(2, "__self = __compiled")
+        self._emit(1, "return __compiled")
+        return "\n".join(self._lines) + "\n"
+
+    def _emit(self, indent: int, line: str):
+        self._lines.append(INDENT * indent + line)
+
+    def _fresh_names(self, n: int, prefix: str = "v") -> List[str]:
+        names = [f"{prefix}{self._n_names + i}" for i in range(n)]
+        self._n_names += n
+        return names
+
+    def _is_self_call(self, exp, local_names: LocalNames):
+        return (
+            self._name is not None
+            and exp[0] == self._name
+            and self._name not in local_names
+            and len(exp) - 1 == len(self._header)
+        )
+
+    # Statements, for the tail position of the procedure body
+
+    def _tail_statements(
+        self,
+        exp: ParsedExpression,
+        local_names: LocalNames,
+        params: List[str],
+        indent: int,
+    ):
+        form = self._special_form(exp)
+
+        if form == "if" and is_list(exp):
+            self._emit(indent, f"if {self._expression(exp[1], local_names)}:")
+            self._tail_statements(exp[2], local_names, params, indent + 1)
+            self._emit(indent, "else:")
+            self._tail_statements(exp[3], local_names, params, indent + 1)
+
+        elif form == "begin" and is_list(exp):
+            for statement in exp[1:-1]:
+                self._emit(indent, self._expression(statement, local_names))
+            self._tail_statements(exp[-1], local_names, params, indent)
+
+        elif form == "let" and is_list(exp):
+            local_names = dict(local_names)
+            for (let_name, value_exp), py_name in self._let_bindings(exp):
+                value = self._expression(value_exp, local_names)
+                self._emit(indent, f"{py_name} = {value}")
+                local_names[let_name] = py_name
+            self._tail_statements(exp[2], local_names, params, indent)
+
+        elif form is None and is_list(exp) and self._is_self_call(exp, local_names):
+            # Loop rather than recursing, by rebinding the parameters
+            args = [self._expression(arg, local_names) for arg in exp[1:]]
+            temps = self._fresh_names(len(args), "__t")
+            if temps:
+                self._emit(indent, f"{_tuple(temps)} = {_tuple(args)}")
+            self._emit(indent, "if __is_self:")
+            if temps:
+                self._emit(indent + 1, f"{_tuple(params)} = {_tuple(temps)}")
+            self._emit(indent + 1, "continue")
+            operator = f"__g[{self._name!r}]"
+            self._emit(indent, f"return __tail_call({', '.join([operator, *temps])})")
+
+        else:
+            self._emit(indent, f"return {self._expression(exp, local_names, True)}")
+
+    # Expressions
+
+    def _expression(
+        self, exp: ParsedExpression, local_names: LocalNames, tail: bool = False
+    ) -> str:
+        form = self._special_form(exp)
+
+        if form == "if" and is_list(exp):
+            test = self._expression(exp[1], local_names)
+            true_branch = self._expression(exp[2], local_names, tail)
+            false_branch = self._expression(exp[3], local_names, tail)
+            return f"({true_branch} if {test} else {false_branch})"
+
+        if form == "begin" and is_list(exp):
+            statements = [self._expression(s, local_names) for s in exp[1:-1]]
+            statements.append(self._expression(exp[-1], local_names, tail))
+            return f"({', '.join(statements)},)[-1]"
+
+        if form == "let" and is_list(exp):
+            local_names = dict(local_names)
+            parts = []
+            for (let_name, value_exp), py_name in self._let_bindings(exp):
+                value = self._expression(value_exp, local_names)
+                parts.append(f"({py_name} := {value})")
+                local_names[let_name] = py_name
+            parts.append(self._expression(exp[2], local_names, tail))
+            return f"({', '.join(parts)},)[-1]"
+
+        if form == "lambda":
+            return self._lambda(exp, local_names)
+
+        if is_list(exp):
+            return self._application(exp, local_names, tail)
+
+        if isinstance(exp, str):
+            if exp in local_names:
+                return local_names[exp]
+            return f"__g[{exp!r}]"
+
+        if isinstance(exp, bool) or isinstance(exp, int):
+            return repr(exp)
+
+        if isinstance(exp, float) and math.isfinite(exp):
+            return repr(exp)
+
+        raise TranspileError(f"Cannot translate {exp!r}")
+
+    def _application(self, exp, local_names: LocalNames, tail: bool) -> str:
+        if not exp:
+            raise TranspileError("Empty application")
+        args = [self._expression(arg, local_names) for arg in exp[1:]]
+
+        if self._is_self_call(exp, local_names):
+            # Call the Python function directly, which may return a TailCall
+            result = self._fresh_names(1, "__r")[0]
+            operator = f"(__f if __is_self else __g[{self._name!r}])"
+            call = f"{result} := {operator}({', '.join(args)})"
+            return (
+                f"({result} if type({call}) is not __TailCall else __finish({result}))"
+            )
+
+        operator_name = exp[0]
+        if (
+            self._inline_arithmetic
+            and operator_name in INLINABLE_OPERATORS
+            and operator_name not in local_names
+            and len(args) in (1, 2)
+            and (len(args) == 2 or operator_name == "-")
+        ):
+            self.inlined_operators.add(operator_name)
+            python_operator = INLINABLE_OPERATORS[operator_name][1]
+            if len(args) == 1:
+                return f"({python_operator}{args[0]})"
+            return f"({args[0]} {python_operator} {args[1]})"
+
+        operator = self._expression(operator_name, local_names)
+        if tail:
+            return f"__tail_call({', '.join([operator, *args])})"
+        return f"{operator}({', '.join(args)})"
+
+    def _lambda(self, exp, local_names: LocalNames) -> str:
+        header = exp[1]
+        if len(set(header)) != len(header):
+            raise TranspileError("Duplicate parameter")
+        params = self._fresh_names(len(header))
+        body = self._expression(
+            exp[2], {**local_names, **dict(zip(header, params))}, True
+        )
+
+        # Capture the enclosing variables by value, since the enclosing
+        # function may rebind its parameters when it loops
+        captured = [
+            py_name
+            for py_name in sorted(set(local_names.values()))
+            if re.search(rf"\b{py_name}\b", body)
+        ]
+        signature = ", ".join(params)
+        if captured:
+            keywords = ", ".join(f"{name}={name}" for name in captured)
+            signature = f"{signature}, *, {keywords}" if params else f"*, {keywords}"
+        function = f"(lambda {signature}: {body})" if signature else f"(lambda: {body})"
+        return f"__CompiledProcedure({function}, {len(params)}, '<lambda>')"
+
+    def _let_bindings(self, exp):
+        assignments = exp[1]
+        names = [name for name, _ in assignments]
+        if len(set(names)) != len(names):
+            raise TranspileError("Duplicate let variable")
+        for index, (_, value_exp) in enumerate(assignments):
+            # Python locals can't be referred to by a closure before they
+            # are assigned, as let variables can
+            if _lambdas_refer_to(value_exp, names[index:]):
+                raise TranspileError("Let assignment refers to a later variable")
+        return zip(assignments, self._fresh_names(len(assignments)))
+
+    def _special_form(self, exp: ParsedExpression) -> Optional[str]:
+        """
+        The special form an expression is an instance of, raising
+        TranspileError for special forms which cannot be translated
+        """
+        if not (is_list(exp) and exp and isinstance(exp[0], str)):
+            return None
+        head = exp[0]
+        if head not in interpreter.SPECIAL_FORMS:
+            return None
+        if head not in TRANSLATABLE_SPECIAL_FORMS:
+            raise TranspileError(f"Cannot translate {head}")
+
+        well_formed = {
+            "if": len(exp) == 4,
+            "begin": len(exp) >= 2,
+            "let": len(exp) == 3
+            and is_list(exp[1])
+            and all(is_let_assignment(a) for a in exp[1]),
+            "lambda": len(exp) == 3 and is_proc_header(exp[1]),
+        }[head]
+        if not well_formed:
+            raise TranspileError(f"Cannot translate malformed {head}")
+        return head
+
+
+def _lambdas_refer_to(exp: ParsedExpression, names: List[str]) -> bool:
+    """
+    Whether any lambda within an expression has a symbol in `names`
+    """
+    pending = [exp]
+    while pending:
+        exp = pending.pop()
+        if not is_list(exp):
+            continue
+        if exp and exp[0] == "lambda" and _mentions(exp, names):
+            return True
+        pending.extend(exp)
+    return False
+
+
+def _mentions(exp: ParsedExpression, names: List[str]) -> bool:
+    pending = [exp]
+    while pending:
+        exp = pending.pop()
+        if is_list(exp):
+            pending.extend(exp)
+        elif isinstance(exp, str) and exp in names:
+            return True
+    return False
+
+
+def _tuple(names: List[str]) -> str:
+    if len(names) == 1:
+        return f"{names[0]},"
+    return ", ".join(names)
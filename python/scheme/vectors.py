@@ -0,0 +1,120 @@
+"""
+Numeric vectors, backed by NumPy arrays, so that bulk numeric work is
+done by single C level operations rather than a procedure call per
+element.
+
+Vectors are created with `(vector x ...)` or `(make-vector n fill)`. The
+arithmetic and comparison builtins apply element-wise to vectors, and
+broadcast a number across a vector, as NumPy does. `vector-map` applies
+those builtins to whole vectors at once, and any other procedure to each
+element in turn.
+
+NumPy is optional, and is only imported when vectors are first used, as
+importing it takes longer than importing the rest of the interpreter.
+Without it, the vector builtins raise an error when called, and
+everything else works as before.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable
+
+from . import sch_builtins
+
+# The numpy module once imported, or False if it isn't installed
+_numpy: Any = None
+
+# Builtins which NumPy already applies element-wise when given arrays
+VECTORIZED_BUILTINS = frozenset(
+    (
+        sch_builtins.add,
+        sch_builtins.minus,
+        sch_builtins.mul,
+        sch_builtins.truediv,
+        sch_builtins.eq,
+        sch_builtins.lt,
+        sch_builtins.gt,
+        sch_builtins.le,
+        sch_builtins.ge,
+    )
+)
+
+
+def load_numpy() -> Any:
+    """
+    The numpy module, imported on the first call, or None if it isn't
+    installed
+    """
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            _numpy = False
+        else:
+            _numpy = numpy
+    return _numpy or None
+
+
+def _require_numpy() -> Any:
+    numpy = load_numpy()
+    if numpy is None:
+        raise Exception("Vectors require numpy, which is not installed")
+    return numpy
+
+
+def _scalar(value: Any) -> Any:
+    """
+    Convert a NumPy scalar to the equivalent Python number or boolean
+    """
+    return value.item() if isinstance(value, _numpy.generic) else value
+
+
+def vector(*values):
+    numpy = _require_numpy()
+    return numpy.array(values)
+
+
+def make_vector(length: int, fill=0):
+    numpy = _require_numpy()
+    return numpy.full(length, fill)
+
+
+def vector_ref(v, index: int):
+    _require_numpy()
+    return _scalar(v[index])
+
+
+def vector_length(v) -> int:
+    _require_numpy()
+    return len(v)
+
+
+def vector_map(proc: Callable, *vectors):
+    numpy = _require_numpy()
+    if proc in VECTORIZED_BUILTINS:
+        return proc(*vectors)
+    return numpy.array(
+        [proc(*map(_scalar, items)) for items in zip(*vectors, strict=True)]
+    )
+
+
+def sum_(v):
+    numpy = _require_numpy()
+    return _scalar(numpy.sum(v))
+
+
+def dot(v, w):
+    numpy = _require_numpy()
+    return _scalar(numpy.dot(v, w))
+
+
+BUILTINS = {
+    "vector": vector,
+    "make-vector": make_vector,
+    "vector-ref": vector_ref,
+    "vector-length": vector_length,
+    "vector-map": vector_map,
+    "sum": sum_,
+    "dot": dot,
+}
@@ -0,0 +1,289 @@
+"""
+A stack machine which runs the bytecode produced by scheme.compiler.
+
+All procedure calls between compiled procedures, including non-tail
+calls, are made within a single dispatch loop, with return addresses
+kept on a heap allocated call stack.
+"""
+
+from __future__ import annotations
+
+from typing import Any, List, Tuple
+
+from .common import ParsedExpression
+from .compiler import (
+    compile_program,
+    CodeObject,
+    CONST,
+    LOAD_LOCAL,
+    LOAD_DEREF,
+    LOAD_CHECKED,
+    LOAD_GLOBAL,
+    DEFINE_GLOBAL,
+    DEFINE_LOCAL,
+    STORE_LOCAL,
+    PUSH_FRAME,
+    POP_FRAME,
+    JUMP,
+    JUMP_IF_FALSE,
+    MAKE_CLOSURE,
+    CALL,
+    TAIL_CALL,
+    CALL_GLOBAL,
+    TAIL_CALL_GLOBAL,
+    RETURN,
+    POP,
+    EVAL_ANALYZED,
+)
+from .interpreter import (
+    create_frame,
+    Env,
+    Environment,
+    Frame,
+    inline_cache_totals,
+    UNASSIGNED,
+)
+
+
+class Closure:
+    """
+    A compound procedure whose body has been compiled to bytecode
+    """
+
+    __slots__ = ("code", "env", "bound_args")
+
+    code: CodeObject
+    env: Env
+    bound_args: Tuple[Any, ...]
+
+    def __init__(self, code: CodeObject, env: Env, bound_args: Tuple[Any, ...] = ()):
+        self.code = code
+        self.env = env
+        self.bound_args = bound_args
+
+    @property
+    def arity(self) -> int:
+        return self.code.n_params - len(self.bound_args)
+
+    def __call__(self, *args):
+        if len(args) < self.arity:
+            return Closure(self.code, self.env, (*self.bound_args, *args))
+        return run(self.code, self.bind(args))
+
+    def bind(self, args):
+        if len(args) > self.arity:
+            raise Exception(f"Arity error, expected {self.arity}, got {len(args)}")
+        values = [*self.bound_args, *args]
+        return create_frame(self.code.frame_size, values, self.env)
+
+    def __repr__(self):
+        return f"<closure {self.code.name}>"
+
+
+def vm_seval(exp: ParsedExpression, env: Environment):
+    return run(compile_program((exp,)), env)
+
+
+def run(code: CodeObject, env: Env):
+    """
+    Run a code object in the given environment, returning the value
+    it returns
+    """
+    stack: List[Any] = []
+    push = stack.append
+    pop = stack.pop
+    calls: List[Tuple[CodeObject, int, Env, List[Any]]] = []
+    totals = inline_cache_totals
+    instructions = code.instructions
+    constants = code.constants
+    pc = 0
+    # The variables of the current procedure call or let. A call of code
+    # which doesn't need a frame is run in the environment enclosing the
+    # frame it would have, so that no Frame is allocated for it.
+    values: List[Any] = env.values if type(env) is Frame else []
+
+    # The instructions are tested in roughly the order of how often they
+    # are run. Every branch except those of the calls continues the loop.
+    while True:
+        op, arg = instructions[pc]
+        pc += 1
+
+        if op == CALL_GLOBAL or op == TAIL_CALL_GLOBAL:
+            index, n_args, operands = arg
+            globals = env.globals
+            cache = code.global_caches[index]
+            if globals is cache.env and globals.version == cache.version:
+                cache.hits += 1
+                totals.hits += 1
+                proc = cache.value
+            else:
+                proc = cache.miss(globals)
+            tail = op == TAIL_CALL_GLOBAL
+            if (
+                len(operands) == 2
+                and n_args == 2
+                and not tail
+                and type(proc) is not Closure
+                and callable(proc)
+            ):
+                # A builtin, such as an arithmetic operator, applied to
+                # constants or local variables, which are passed to it
+                # without going through the stack
+                a, b = operands
+                push(
+                    proc(
+                        values[a] if a >= 0 else constants[~a],
+                        values[b] if b >= 0 else constants[~b],
+                    )
+                )
+                continue
+            for operand in operands:
+                push(values[operand] if operand >= 0 else constants[~operand])
+
+        elif op == LOAD_LOCAL:
+            push(values[arg])
+            continue
+
+        elif op == JUMP_IF_FALSE:
+            if not pop():
+                pc = arg
+            continue
+
+        elif op == RETURN:
+            if not calls:
+                return pop()
+            code, pc, env, values = calls.pop()
+            instructions = code.instructions
+            constants = code.constants
+            continue
+
+        elif op == CONST:
+            push(constants[arg])
+            continue
+
+        elif op == POP:
+            pop()
+            continue
+
+        elif op == CALL or op == TAIL_CALL:
+            n_args = arg
+            proc = stack[-n_args - 1]
+            del stack[-n_args - 1]
+            tail = op == TAIL_CALL
+
+        elif op == LOAD_GLOBAL:
+            globals = env.globals
+            cache = code.global_caches[arg]
+            if globals is cache.env and globals.version == cache.version:
+                cache.hits += 1
+                totals.hits += 1
+                push(cache.value)
+            else:
+                push(cache.miss(globals))
+            continue
+
+        elif op == JUMP:
+            pc = arg
+            continue
+
+        elif op == LOAD_DEREF:
+            depth, index = arg
+            frame = env
+            for _ in range(depth):
+                frame = frame.enclosing  # type: ignore[union-attr]
+            push(frame.values[index])  # type: ignore[union-attr]
+            continue
+
+        elif op == LOAD_CHECKED:
+            depth, index, name = arg
+            frame = env
+            for _ in range(depth):
+                frame = frame.enclosing  # type: ignore[union-attr]
+            value = frame.values[index]  # type: ignore[union-attr]
+            if value is UNASSIGNED:
+                raise KeyError(name)
+            push(value)
+            continue
+
+        elif op == MAKE_CLOSURE:
+            push(Closure(constants[arg], env))
+            continue
+
+        elif op == PUSH_FRAME:
+            frame = create_frame(arg, [], env)
+            env = frame
+            values = frame.values
+            continue
+
+        elif op == POP_FRAME:
+            env = env.enclosing  # type: ignore[union-attr]
+            values = env.values if type(env) is Frame else []
+            continue
+
+        elif op == STORE_LOCAL:
+            values[arg] = pop()
+            continue
+
+        elif op == DEFINE_LOCAL:
+            index, name = arg
+            if values[index] is not UNASSIGNED:
+                raise Exception(f"'{name}' already defined.")
+            values[index] = pop()
+            continue
+
+        elif op == DEFINE_GLOBAL:
+            env.define(code.names[arg], pop())  # type: ignore[union-attr]
+            continue
+
+        elif op == EVAL_ANALYZED:
+            push(constants[arg].seval(env))
+            continue
+
+        else:
+            raise Exception(f"Unknown opcode {op}")
+
+        # Call proc with the n_args arguments on top of the stack
+        if type(proc) is Closure and (
+            n_args == proc.code.n_params or n_args >= proc.arity
+        ):
+            args = stack[-n_args:] if n_args else []
+            del stack[len(stack) - n_args :]
+            if not tail:
+                calls.append((code, pc, env, values))
+            code = proc.code
+            if not proc.bound_args and n_args == code.n_params:
+                # Bind the arguments directly, as the common case of
+                # Closure.bind
+                args += code.spare_slots
+                values = args
+                env = Frame(args, proc.env) if code.needs_frame else proc.env
+            else:
+                frame = proc.bind(args)
+                env = frame
+                values = frame.values
+            instructions = code.instructions
+            constants = code.constants
+            pc = 0
+            continue
+        if not callable(proc):
+            raise Exception("Invalid function application")
+        elif n_args == 2:
+            second = pop()
+            value = proc(pop(), second)
+        elif n_args == 1:
+            value = proc(pop())
+        else:
+            args = stack[-n_args:] if n_args else []
+            del stack[len(stack) - n_args :]
+            value = proc(*args)
+        if not tail:
+            push(value)
+            continue
+        # A tail call of a procedure which is not compiled, so return
+        # its value from the current procedure
+        if not calls:
+            return value
+        push(value)
+        code, pc, env, values = calls.pop()
+        instructions = code.instructions
+        constants = code.constants
@@ -0,0 +1,59 @@
+import argparse
+import asyncio
+
+from scheme import cache
+from scheme.evaluators import EVALUATORS, DEFAULT_EVALUATOR
+from scheme.server import DEFAULT_MAX_QUEUED, EvaluationServer
+
+arg_parser = argparse.ArgumentParser(
+    description="Serve scheme sessions over a local socket"
+)
+arg_parser.add_argument(
+    "--evaluator", choices=EVALUATORS.keys(), default=DEFAULT_EVALUATOR
+)
+arg_parser.add_argument("--host", default="127.0.0.1")
+arg_parser.add_argument("--port", type=int, default=8765)
+arg_parser.add_argument(
+    "--unix", metavar="PATH", help="listen on a Unix socket instead of TCP"
+)
+arg_parser.add_argument(
+    "--prelude",
+    metavar="FILE",
+    help="a program to load into every session's environment",
+)
+arg_parser.add_argument(
+    "--workers",
+    type=int,
+    metavar="N",
+    help="the number of sessions which can evaluate at the same time",
+)
+arg_parser.add_argument(
+    "--max-queued",
+    type=int,
+    default=DEFAULT_MAX_QUEUED,
+    metavar="N",
+    help="the number of evaluations which can wait for a worker, beyond which"
+    " evaluations are refused (default: %(default)s)",
+)
+args = arg_parser.parse_args()
+
+
+async def main():
+    prelude = cache.load_program(args.prelude) if args.prelude else ()
+    evaluation_server = EvaluationServer(
+        args.evaluator, prelude, args.workers, args.max_queued
+    )
+    if args.unix:
+        server = await evaluation_server.start_unix(args.unix)
+    else:
+        server = await evaluation_server.start_tcp(args.host, args.port)
+    addresses = ", ".join(str(sock.getsockname()) for sock in server.sockets)
+    print(f"Serving on {addresses}")
+    async with server:
+        await server.serve_forever()
+
+
+try:
+    asyncio.run(main())
+except KeyboardInterrupt:
+    pass
@@ -0,0 +1,77 @@
+import json
+import multiprocessing
+
+import pytest
+
+from scheme.batch import BatchRunner, Job, read_jobs
+from scheme.parser import parse
+
+pytestmark = pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="batch workers are forked",
+)
+
+
+@pytest.fixture(scope="module")
+def runner():
+    prelude = parse("(define double (x) (* 2 x)) (define run-handler (x) (handler x))")
+    with BatchRunner(prelude, workers=2) as runner:
+        yield runner
+
+
+def test_results_are_in_order(runner):
+    jobs = [Job(i, f"(double {i})") for i in range(20)]
+
+    results = list(runner.run(jobs))
+
+    assert [result.id for result in results] == list(range(20))
+    assert [result.value for result in results] == [str(2 * i) for i in range(20)]
+    assert all(result.seconds >= 0 for result in results)
+
+
+def test_results_as_completed(runner):
+    jobs = [Job(i, f"(double {i})") for i in range(20)]
+
+    results = runner.run(jobs, ordered=False)
+
+    assert sorted(result.id for result in results) == list(range(20))
+
+
+def test_each_job_has_a_fresh_environment(runner):
+    jobs = [Job("first", "(define x 1) x"), Job("second", "(define x 2) x")]
+
+    assert [result.value for result in runner.run(jobs)] == ["1", "2"]
+
+
+def test_prelude_procedures_see_the_definitions_of_the_job(runner):
+    jobs = [Job("handler", "(define handler (x) (* x 2)) (run-handler 21)")]
+
+    [result] = runner.run(jobs)
+
+    assert (result.value, result.error) == ("42", None)
+
+
+def test_output_and_errors(runner):
+    jobs = [Job("display", "(display 5)"), Job("error", "(undefined 1)")]
+
+    displayed, failed = runner.run(jobs)
+
+    assert (displayed.output, displayed.value, displayed.error) == ("5\n", None, None)
+    assert failed.error == "KeyError: 'undefined'"
+
+
+def test_read_jobs(tmp_path):
+    program = tmp_path / "program.scheme"
+    program.write_text("(+ 1 2)")
+    jobs_file = tmp_path / "jobs.jsonl"
+    jobs_file.write_text(
+        json.dumps({"id": "a", "source": "1"}) + "\n\n" + json.dumps({"source": "2"})
+    )
+
+    jobs = [*read_jobs(str(program)), *read_jobs(str(jobs_file))]
+
+    assert [(job.id, job.source) for job in jobs] == [
+        (str(program), "(+ 1 2)"),
+        ("a", "1"),
+        (3, "2"),
+    ]
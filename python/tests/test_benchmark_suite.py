@@ -0,0 +1,38 @@
+from benchmarks.suite import BENCHMARKS, compare, main
+
+
+def times(seconds):
+    return {"min": seconds, "median": seconds}
+
+
+def test_slowdowns_beyond_the_threshold_are_regressions():
+    baseline = {"a": times(1.0), "b": times(1.0), "c": times(1.0)}
+    results = {"a": times(1.05), "b": times(1.2), "c": times(0.5)}
+
+    lines, regressions = compare(results, baseline, threshold=0.1)
+
+    assert regressions == ["b"]
+    assert lines[2].endswith("REGRESSION")
+    assert "-50.0%" in lines[3]
+
+
+def test_benchmarks_missing_from_the_baseline_are_not_compared():
+    lines, regressions = compare({"new": times(1.0)}, {}, threshold=0.1)
+
+    assert regressions == []
+    assert lines[1].split() == ["new", "-", "1000.0ms"]
+
+
+def test_baseline_is_saved_and_compared(tmp_path, capsys):
+    path = str(tmp_path / "baseline.json")
+    args = ["-k", "ackermann", "--repeat", "1"]
+
+    assert main([*args, "--save", path]) == 0
+    assert main([*args, "--compare", path, "--threshold", "9"]) == 0
+    assert "ackermann 3 4" in capsys.readouterr().out
+
+
+def test_benchmark_names_are_unique():
+    names = [benchmark.name for benchmark in BENCHMARKS]
+
+    assert len(names) == len(set(names))
@@ -0,0 +1,81 @@
+import pytest
+
+from scheme import bulk
+from scheme.parser import parse, MissingClosingParenError
+
+SOURCE = """
+(record 1 (name "a b") [values 1.5 -2 #true])
+atom
+{empty ()}
+(deep (((((x))))))
+"""
+
+
+@pytest.fixture
+def table(tmp_path):
+    path = tmp_path / "data.scheme"
+    path.write_text(SOURCE)
+    with bulk.load(str(path)) as table:
+        yield table
+
+
+def test_materializes_as_parser(table):
+    assert len(table) == 4
+    assert list(table) == parse(SOURCE)
+    assert table[1] == "atom"
+    assert table[-1] == ("deep", ((((("x",),),),),))
+
+
+def test_nodes(table):
+    record = table.root(0)
+
+    assert record.is_list
+    assert len(record) == 4
+    assert record[0].text == "record"
+    assert record[1].value == 1
+    assert record[2].value == ("name", '"a', 'b"')
+    assert [node.value for node in record[3]] == ["values", 1.5, -2, True]
+    with pytest.raises(IndexError):
+        record[4]
+
+    empty = table.root(2)[1]
+    assert empty.is_list
+    assert len(empty) == 0
+    assert empty.value == ()
+
+
+def test_table_size(table):
+    assert table.node_count == 24
+    assert table.nbytes == 24 * (1 + 8 + 8)
+
+
+def test_deeply_nested_list():
+    depth = 10000
+    table = bulk.NodeTable.scan(b"(" * depth + b"x" + b")" * depth)
+
+    value = table[0]
+    for _ in range(depth):
+        (value,) = value
+    assert value == "x"
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.scheme"
+    path.write_text("")
+
+    with bulk.load(str(path)) as table:
+        assert list(table) == []
+
+
+@pytest.mark.parametrize(
+    "source, error, message",
+    (
+        (b"(a)\n  (b))", SyntaxError, "Unmatched ) at line 2, column 6"),
+        (b"(a\n [b c}", SyntaxError, "for [ opened at line 2, column 2"),
+        (b"(a)\n (b", MissingClosingParenError, "( opened at line 2, column 2"),
+    ),
+)
+def test_syntax_errors(source, error, message):
+    with pytest.raises(error) as e:
+        bulk.NodeTable.scan(source)
+    assert message in str(e.value)
@@ -0,0 +1,164 @@
+import os
+
+import pytest
+
+from scheme import cache
+from scheme.parser import parse, read_stream
+
+SOURCE = "(define x 1)\n(display (+ x 2.5 #true))\n"
+
+
+def parse_program(source):
+    return tuple(parse(source))
+
+
+class CountingParser:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, stream):
+        self.calls += 1
+        return read_stream(stream)
+
+
+def load(path, read_source=read_stream, **kwargs):
+    return tuple(cache.load_program(path, read_source, **kwargs))
+
+
+def write_source(tmp_path, source=SOURCE):
+    path = tmp_path / "program.scheme"
+    path.write_text(source)
+    return str(path)
+
+
+def test_cold_start_writes_cache(tmp_path):
+    path = write_source(tmp_path)
+    parser = CountingParser()
+
+    program = load(path, parser)
+
+    assert program == parse_program(SOURCE)
+    assert parser.calls == 1
+    assert os.path.exists(cache.cache_path(path))
+    assert os.path.dirname(cache.cache_path(path)).endswith(cache.CACHE_DIRECTORY)
+
+
+def test_warm_start_skips_parser(tmp_path):
+    path = write_source(tmp_path)
+    load(path)
+    parser = CountingParser()
+
+    program = load(path, parser)
+
+    assert program == parse_program(SOURCE)
+    assert parser.calls == 0
+
+
+def test_warm_start_loads_expressions_as_they_are_needed(tmp_path, monkeypatch):
+    path = write_source(tmp_path)
+    load(path)
+    loaded = []
+    load_expression = cache.marshal.loads
+
+    def recording_load(data):
+        loaded.append(load_expression(data))
+        return loaded[-1]
+
+    monkeypatch.setattr(cache.marshal, "loads", recording_load)
+
+    program = cache.load_program(path, CountingParser())
+
+    assert loaded == []
+    assert next(program) == ("define", "x", 1)
+    assert loaded == [("define", "x", 1)]
+
+
+def test_changed_source_invalidates_cache(tmp_path):
+    path = write_source(tmp_path)
+    load(path)
+    write_source(tmp_path, "(display 42)")
+    parser = CountingParser()
+
+    program = load(path, parser)
+
+    assert program == (("display", 42),)
+    assert parser.calls == 1
+    assert load(path, parser) == (("display", 42),)
+    assert parser.calls == 1
+
+
+def test_format_version_invalidates_cache(tmp_path, monkeypatch):
+    path = write_source(tmp_path)
+    load(path)
+    monkeypatch.setattr(cache, "FORMAT_VERSION", cache.FORMAT_VERSION + 1)
+    parser = CountingParser()
+
+    load(path, parser)
+
+    assert parser.calls == 1
+
+
+def test_corrupt_cache_is_ignored(tmp_path):
+    path = write_source(tmp_path)
+    load(path)
+    with open(cache.cache_path(path), "r+b") as f:
+        data = f.read()
+        f.seek(0)
+        f.truncate()
+        f.write(data[: len(data) - 5])
+    parser = CountingParser()
+
+    assert load(path, parser) == parse_program(SOURCE)
+    assert parser.calls == 1
+
+
+def test_cache_found_corrupt_after_its_first_expressions_is_reparsed(tmp_path):
+    path = write_source(tmp_path)
+    load(path)
+    with open(cache.cache_path(path), "r+b") as f:
+        f.truncate(os.path.getsize(cache.cache_path(path)) - 5)
+    parser = CountingParser()
+    program = cache.load_program(path, parser)
+
+    assert next(program) == ("define", "x", 1)
+    assert parser.calls == 0
+    assert tuple(program) == parse_program(SOURCE)[1:]
+    assert parser.calls == 1
+    assert load(path, parser) == parse_program(SOURCE)
+    assert parser.calls == 1
+
+
+def test_disabled_cache(tmp_path):
+    path = write_source(tmp_path)
+    parser = CountingParser()
+
+    load(path, parser, use_cache=False)
+    load(path, parser, use_cache=False)
+
+    assert parser.calls == 2
+    assert not os.path.exists(cache.cache_path(path))
+
+
+def test_unwritable_cache_directory(tmp_path):
+    path = write_source(tmp_path)
+    # A file where the cache directory should be prevents writing the cache
+    (tmp_path / cache.CACHE_DIRECTORY).write_text("")
+
+    assert load(path) == parse_program(SOURCE)
+
+
+def test_syntax_error_does_not_write_cache(tmp_path):
+    path = write_source(tmp_path, "(display 1) (display")
+
+    with pytest.raises(SyntaxError):
+        load(path)
+
+    assert not os.path.exists(cache.cache_path(path))
+    assert os.listdir(tmp_path / cache.CACHE_DIRECTORY) == []
+
+
+def test_expressions_are_yielded_before_the_file_is_read(tmp_path):
+    path = write_source(tmp_path, "(display 1) (display")
+    program = cache.load_program(path)
+
+    assert next(program) == ("display", 1)
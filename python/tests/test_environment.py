@@ -1,6 +1,7 @@
 import pytest
 
-from scheme.interpreter import Environment
+from scheme.interpreter import create_global_env, Environment, seval
+from scheme.parser import parse
 
 
 def test_flat_environment_miss():
@@ -119,3 +120,54 @@ def test_more_realistic_example():
 
     for key in global_contents:
         assert env[key] == global_contents[key]
+
+
+def test_version_changes_on_define_and_assignment():
+
+    env = Environment()
+    version = env.version
+    env.define("foo", 1)
+    assert env.version > version
+
+    version = env.version
+    env["foo"] = 2
+    assert env.version > version
+
+    version = env.version
+    assert env["foo"] == 2
+    assert env.version == version
+
+
+def test_defines():
+
+    enclosing = Environment()
+    enclosing.define("foo", 1)
+    env = Environment(enclosing)
+    env.define("bar", 2)
+
+    assert env.defines("bar")
+    assert not env.defines("foo")
+
+
+def test_copy():
+
+    env = Environment()
+    env.define("foo", 1)
+    copy = env.copy()
+    copy.define("bar", 2)
+
+    assert copy["foo"] == 1
+    assert not env.defines("bar")
+    assert list(copy.items()) == [("foo", 1), ("bar", 2)]
+
+
+def test_procedures_in_a_copy_look_up_globals_in_the_copy():
+    env = create_global_env()
+    for exp in parse("(define run-handler (x) (handler x))"):
+        seval(exp, env)
+    copy = env.copy()
+    for exp in parse("(define handler (x) (* x 2))"):
+        seval(exp, copy)
+
+    assert seval(("run-handler", 21), copy) == 42
+    assert not env.defines("handler")
@@ -0,0 +1,76 @@
+import pytest
+
+from scheme.interpreter import seval, create_global_env
+from scheme.explicit_control import ec_seval
+
+
+@pytest.mark.parametrize(
+    "ast,result",
+    (
+        (("+", 1, 2), 3),
+        (("+", ("-", 2, 3), 5), 4),
+        (("/", 12, 5), 2.4),
+        (("and", ("or", True, False), True), True),
+        (("if", ("or", True, False), 1, 3), 1),
+        (("if", False, ("+", 4, 8), ("-", 3)), -3),
+        (("let", (("x", 5), ("y", 4), ("z", ("+", "x", 10))), ("-", "z", "y")), 11),
+        (("let", (), 7), 7),
+        (("begin", ("define", "x", 7), ("define", "y", 8), ("*", "x", "y")), 56),
+        ((("lambda", ("x", "y"), ("+", "x", "y")), 21, 22), 43),
+        (((("lambda", ("x", "y"), ("+", "x", "y")), 21), 22), 43),
+        (((("lambda", ("x",), ("lambda", ("y",), ("*", "x", "y"))), 3), 4), 12),
+        (("begin", ("define", "add", ("x", "y"), ("+", "x", "y")), ("add", 1, 2)), 3),
+        (("newline",), None),
+    ),
+)
+def test_explicit_control_agrees_with_recursive_evaluator(ast, result):
+    assert ec_seval(ast, create_global_env()) == result
+    assert seval(ast, create_global_env()) == result
+
+
+def test_define_returns_none():
+    env = create_global_env()
+    assert ec_seval(("define", "foo", ("+", 1, 2)), env) is None
+    assert ec_seval(("+", "foo", 11), env) == 14
+
+
+def test_invalid_function_application():
+    with pytest.raises(Exception, match="Invalid function application"):
+        ec_seval((1, 2), create_global_env())
+
+
+def test_procedures_are_shared_with_recursive_evaluator():
+    env = create_global_env()
+    ec_seval(("define", "incr", ("x",), ("+", "x", 1)), env)
+    assert seval(("incr", 1), env) == 2
+    seval(("define", "decr", ("x",), ("-", "x", 1)), env)
+    assert ec_seval(("decr", ("incr", 1)), env) == 1
+
+
+RECURSION_DEPTH = 20000
+
+
+def test_deep_non_tail_recursion():
+    env = create_global_env()
+    ec_seval(
+        ("define", "count", ("n",), ("if", "n", ("+", 1, ("count", ("-", "n", 1))), 0)),
+        env,
+    )
+    assert ec_seval(("count", RECURSION_DEPTH), env) == RECURSION_DEPTH
+
+    with pytest.raises(RecursionError):
+        seval(("count", RECURSION_DEPTH), env)
+
+
+def test_tail_recursion_runs_in_constant_space():
+    env = create_global_env()
+    ec_seval(
+        (
+            "define",
+            "count",
+            ("n", "acc"),
+            ("if", "n", ("count", ("-", "n", 1), ("+", "acc", 1)), "acc"),
+        ),
+        env,
+    )
+    assert ec_seval(("count", RECURSION_DEPTH, 0), env) == RECURSION_DEPTH
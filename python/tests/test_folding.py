@@ -0,0 +1,183 @@
+import pytest
+
+from scheme import interpreter
+from scheme.folding import fold_constants
+from scheme.interpreter import (
+    create_global_env,
+    register_special_form,
+    seval,
+    SPECIAL_FORMS,
+)
+from scheme.parser import parse
+
+
+def fold(source, env=None, report=None):
+    [exp] = parse(source)
+    return fold_constants(exp, create_global_env() if env is None else env, report)
+
+
+@pytest.mark.parametrize(
+    "source, folded",
+    (
+        ("(* 60 (* 60 24))", 86400),
+        ("(- 5)", -5),
+        ("(/ 1 4)", 0.25),
+        ("(not 0)", True),
+        ("(+ x (* 2 3))", ("+", "x", 6)),
+        ("(if #true a b)", "a"),
+        ("(if (- 1 1) a b)", "b"),
+        ("(if x (+ 1 1) b)", ("if", "x", 2, "b")),
+        ("(let ((x 2) (y (* x 3))) (+ x y))", 8),
+        ("(let ((x 2) (y z)) (+ x y))", ("let", (("y", "z"),), ("+", 2, "y"))),
+        ("(lambda (n) (+ n (* 2 2)))", ("lambda", ("n",), ("+", "n", 4))),
+        ("(define f (n) (- n (+ 1 1)))", ("define", "f", ("n",), ("-", "n", 2))),
+        (
+            "(define-memo f 8 (n) (- n (+ 1 1)))",
+            ("define-memo", "f", 8, ("n",), ("-", "n", 2)),
+        ),
+        ("(begin (display (+ 1 2)) 3)", ("begin", ("display", 3), 3)),
+    ),
+)
+def test_folding(source, folded):
+    assert fold(source) == folded
+
+
+@pytest.mark.parametrize(
+    "source",
+    (
+        # Errors are left to be raised when the expression is evaluated
+        "(/ 1 0)",
+        "(+ 1 2 3)",
+        # Impure builtins
+        "(display 1)",
+        # Unknown variables
+        "(f 1 2)",
+    ),
+)
+def test_not_folded(source):
+    assert fold(source) == parse(source)[0]
+
+
+def test_shadowed_builtins_are_not_folded():
+    assert fold("(lambda (+) (+ 1 2))") == ("lambda", ("+",), ("+", 1, 2))
+    assert fold("(let ((+ -)) (+ 1 2))") == ("let", (("+", "-"),), ("+", 1, 2))
+    assert fold("(define f () (begin (define * +) (* 2 3)))") == (
+        "define",
+        "f",
+        (),
+        ("begin", ("define", "*", "+"), ("*", 2, 3)),
+    )
+
+
+def test_shadowed_let_constants_are_not_substituted():
+    assert fold("(let ((x 1)) (lambda (x) x))") == ("lambda", ("x",), "x")
+    assert fold("(let ((x 1)) (begin (define x 2) x))") == (
+        "let",
+        (("x", 1),),
+        ("begin", ("define", "x", 2), "x"),
+    )
+
+
+def test_redefined_builtins_are_not_folded():
+    env = create_global_env()
+    env["+"] = lambda x, y: x * y
+
+    assert fold("(+ 2 3)", env) == ("+", 2, 3)
+    assert seval(fold("(+ 2 3)", env), env) == 6
+
+
+def test_registered_special_forms_are_left_alone(monkeypatch):
+    monkeypatch.setattr(
+        interpreter,
+        "SPECIAL_FORMS",
+        {name: list(analyzers) for name, analyzers in SPECIAL_FORMS.items()},
+    )
+    register_special_form("quote", lambda exp, scope: None)
+
+    assert fold("(quote (+ 1 2))") == ("quote", ("+", 1, 2))
+
+
+def test_let_bindings_are_kept_for_forms_which_are_not_folded(monkeypatch):
+    monkeypatch.setattr(
+        interpreter,
+        "SPECIAL_FORMS",
+        {name: list(analyzers) for name, analyzers in SPECIAL_FORMS.items()},
+    )
+    register_special_form("quote", lambda exp, scope: None)
+
+    assert fold("(let ((x 1)) (begin (quote x) (+ x 1)))") == (
+        "let",
+        (("x", 1),),
+        ("begin", ("quote", "x"), ("+", "x", 1)),
+    )
+
+
+def test_let_bindings_are_substituted_into_memoized_procedures():
+    source = """
+        (define f (m) (let ((x 1)) (begin (define-memo g (n) (+ n x)) (g m))))
+        (let ((x 1)) (begin (define-memo h (n) (+ n x)) (h 2)))
+    """
+    env = create_global_env()
+    results = [seval(fold_constants(exp, env), env) for exp in parse(source)]
+
+    assert results[1] == 3
+    assert seval(("f", 5), env) == 6
+
+
+def test_let_bindings_referred_to_by_earlier_lambdas_are_kept():
+    assert fold("(let ((f (lambda () y)) (y 1)) (f))") == (
+        "let",
+        (("f", ("lambda", (), "y")), ("y", 1)),
+        ("f",),
+    )
+    env = create_global_env()
+    assert seval(fold("(let ((y 5)) (let ((f (lambda () y)) (y 1)) (f)))"), env) == 1
+
+
+def test_references_to_later_let_bindings_are_to_the_shadowed_bindings():
+    assert fold("(let ((x 5)) (let ((y x) (x 6)) y))") == (
+        "let",
+        (("x", 5),),
+        ("let", (("x", 6),), 5),
+    )
+
+
+@pytest.mark.parametrize(
+    "source",
+    (
+        "(let ((x 5)) (let ((y x) (x 6)) y))",
+        "(let ((x 5)) (let ((f (lambda () x)) (y (f)) (x 6)) y))",
+        "((lambda (x) (let ((x 5)) (let ((y x) (x 6)) y))) 1)",
+        "((lambda (x) (let ((x 5)) (let ((f (lambda () x)) (y (f)) (x 6)) y))) 1)",
+    ),
+)
+def test_let_bindings_shadowed_by_later_assignments_are_kept(source):
+    env = create_global_env()
+    [exp] = parse(source)
+
+    assert seval(exp, env) == seval(fold_constants(exp, env), env) == 5
+
+
+def test_report():
+    messages = []
+    fold("(let ((x (+ 1 2))) (if #false x 0))", report=messages.append)
+
+    assert messages == [
+        "folded (+ 1 2) => 3",
+        "inlined x = 3",
+        "pruned (if #false x 0) => 0",
+    ]
+
+
+def test_folded_program_evaluates_the_same():
+    source = """
+        (define day (* 60 (* 60 24)))
+        (define f (x) (let ((k (+ 1 2)) (y x)) (if (not #false) (+ y k) 0)))
+        (f day)
+    """
+    env = create_global_env()
+    folded_env = create_global_env()
+    for exp in parse(source):
+        result = seval(exp, env)
+        folded_result = seval(fold_constants(exp, folded_env), folded_env)
+    assert result == folded_result == 86403
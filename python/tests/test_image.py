@@ -0,0 +1,117 @@
+import pytest
+
+from scheme import memo, sch_builtins
+from scheme.evaluators import EVALUATORS
+from scheme.image import ImageError, load_image, MAGIC, save_image
+from scheme.interpreter import create_global_env, seval
+from scheme.parser import parse
+
+
+def evaluate_all(source, env):
+    result = None
+    for exp in parse(source):
+        result = seval(exp, env)
+    return result
+
+
+def test_procedures_and_closures_are_restored(tmp_path):
+    env = create_global_env()
+    evaluate_all(
+        """
+        (define square (x) (* x x))
+        (define adder (n) (lambda (x) (+ x n)))
+        (define add5 (adder 5))
+        (define counter 0)
+        """,
+        env,
+    )
+    path = tmp_path / "env.image"
+    save_image(env, path)
+
+    restored = load_image(path)
+
+    assert evaluate_all("(square 7)", restored) == 49
+    assert evaluate_all("(add5 10)", restored) == 15
+    assert evaluate_all("counter", restored) == 0
+
+
+def test_builtins_are_restored_as_the_running_builtins(tmp_path):
+    env = create_global_env()
+    evaluate_all("(define plus +)", env)
+    path = tmp_path / "env.image"
+    save_image(env, path)
+
+    restored = load_image(path)
+
+    assert restored["+"] is sch_builtins.add
+    assert restored["plus"] is sch_builtins.add
+
+
+def test_restored_environment_is_independent(tmp_path):
+    env = create_global_env()
+    evaluate_all("(define x 1)", env)
+    path = tmp_path / "env.image"
+    save_image(env, path)
+
+    restored = load_image(path)
+    evaluate_all("(define y 2)", restored)
+
+    assert "y" in dict(restored.items())
+    assert "y" not in dict(env.items())
+
+
+def test_memoized_procedures_keep_their_caches(tmp_path):
+    env = create_global_env()
+    evaluate_all("(define-memo double (x) (* 2 x)) (double 4)", env)
+    path = tmp_path / "env.image"
+    save_image(env, path)
+
+    restored = load_image(path)
+
+    assert evaluate_all("(double 4)", restored) == 8
+    assert restored["double"].cache.hits == 1
+    assert restored["double"].cache in memo.caches()
+
+
+@pytest.mark.parametrize(
+    "evaluator", ["recursive", "explicit-control", "bytecode", "python"]
+)
+def test_restored_procedures_run_with_other_evaluators(tmp_path, evaluator):
+    env = create_global_env()
+    evaluate_all("(define count (n acc) (if n (count (- n 1) (+ acc 1)) acc))", env)
+    path = tmp_path / "env.image"
+    save_image(env, path)
+
+    restored = load_image(path)
+    [exp] = parse("(count 100 0)")
+
+    assert EVALUATORS[evaluator](exp, restored) == 100
+
+
+def test_image_from_a_different_interpreter_is_refused(tmp_path):
+    path = tmp_path / "env.image"
+    save_image(create_global_env(), path)
+    data = bytearray(path.read_bytes())
+    data[len(MAGIC) + 2] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+    with pytest.raises(ImageError, match="different version"):
+        load_image(path)
+
+
+def test_file_which_is_not_an_image_is_refused(tmp_path):
+    path = tmp_path / "program.scm"
+    path.write_text("(define x 1)")
+
+    with pytest.raises(ImageError, match="not an image"):
+        load_image(path)
+
+
+def test_failed_save_leaves_no_temporary_file(tmp_path):
+    path = tmp_path / "env.image"
+    path.mkdir()
+
+    with pytest.raises(OSError):
+        save_image(create_global_env(), path)
+
+    assert [p.name for p in tmp_path.iterdir()] == ["env.image"]
@@ -1,6 +1,17 @@
+import gc
+
 import pytest
 
-from scheme.interpreter import seval, create_global_env
+from scheme import interpreter
+from scheme.interpreter import (
+    seval,
+    analyze,
+    create_global_env,
+    register_special_form,
+    Environment,
+    SPECIAL_FORMS,
+)
+from scheme.parser import parse
 
 
 @pytest.mark.parametrize(
@@ -189,3 +200,502 @@ def test_haskell_style_partial_application():
     seval(define_incr, env)
 
     assert seval(("incr", 5), env) == 6
+
+
+def test_analyzed_expression_can_be_evaluated_repeatedly():
+
+    env = create_global_env()
+
+    analyzed = analyze(("+", "x", 1))
+
+    first_env = Environment(env)
+    first_env.define("x", 1)
+    second_env = Environment(env)
+    second_env.define("x", 10)
+
+    assert analyzed.seval(first_env) == 2
+    assert analyzed.seval(second_env) == 11
+
+
+def test_lambda_body_is_analyzed_once(monkeypatch):
+
+    env = create_global_env()
+
+    seval(("define", "add", ("x", "y"), ("+", "x", "y")), env)
+
+    analyze_calls = 0
+    original_analyze = interpreter.analyze
+
+    def counting_analyze(*args):
+        nonlocal analyze_calls
+        analyze_calls += 1
+        return original_analyze(*args)
+
+    monkeypatch.setattr(interpreter, "analyze", counting_analyze)
+
+    add = env["add"]
+    for i in range(10):
+        assert add(i, 1) == i + 1
+
+    assert analyze_calls == 0
+
+
+def test_register_special_form(monkeypatch):
+
+    monkeypatch.setattr(
+        interpreter,
+        "SPECIAL_FORMS",
+        {name: list(analyzers) for name, analyzers in SPECIAL_FORMS.items()},
+    )
+
+    class UnlessStatement:
+        def __init__(self, test, body):
+            self._test = test
+            self._body = body
+
+        @classmethod
+        def from_parsed_expression(cls, exp, scope):
+            if len(exp) != 3:
+                return None
+            return cls(analyze(exp[1], scope), analyze(exp[2], scope))
+
+        def seval(self, env):
+            if not self._test.seval(env):
+                return self._body.seval(env)
+
+    register_special_form("unless", UnlessStatement.from_parsed_expression)
+
+    env = create_global_env()
+    assert seval(("unless", False, ("+", 1, 2)), env) == 3
+    assert seval(("unless", True, ("+", 1, 2)), env) is None
+    assert seval((("lambda", ("x",), ("unless", False, "x")), 5), env) == 5
+
+
+def test_unmatched_special_form_falls_back_to_application():
+
+    env = create_global_env()
+    env.define("begin_", lambda: 1)
+
+    # A symbol which merely starts like a special form is an ordinary call
+    assert seval(("begin_",), env) == 1
+
+    # A malformed define is treated as a procedure application
+    with pytest.raises(KeyError):
+        seval(("define", 1, 2), env)
+
+
+TAIL_RECURSION_DEPTH = 10000
+
+
+def test_tail_recursion_in_if_runs_in_constant_stack():
+
+    env = create_global_env()
+
+    seval(
+        (
+            "define",
+            "count",
+            ("n", "acc"),
+            ("if", "n", ("count", ("-", "n", 1), ("+", "acc", 1)), "acc"),
+        ),
+        env,
+    )
+
+    assert seval(("count", TAIL_RECURSION_DEPTH, 0), env) == TAIL_RECURSION_DEPTH
+
+
+def test_tail_recursion_in_begin_and_let_runs_in_constant_stack():
+
+    env = create_global_env()
+
+    seval(
+        (
+            "define",
+            "count",
+            ("n", "acc"),
+            (
+                "if",
+                "n",
+                (
+                    "begin",
+                    ("+", 1, 1),
+                    ("let", (("m", ("-", "n", 1)),), ("count", "m", ("+", "acc", 1))),
+                ),
+                "acc",
+            ),
+        ),
+        env,
+    )
+
+    assert seval(("count", TAIL_RECURSION_DEPTH, 0), env) == TAIL_RECURSION_DEPTH
+
+
+def test_mutual_tail_recursion_runs_in_constant_stack():
+
+    env = create_global_env()
+
+    seval(("define", "even", ("n",), ("if", "n", ("odd", ("-", "n", 1)), True)), env)
+    seval(("define", "odd", ("n",), ("if", "n", ("even", ("-", "n", 1)), False)), env)
+
+    assert seval(("even", TAIL_RECURSION_DEPTH), env) is True
+    assert seval(("odd", TAIL_RECURSION_DEPTH), env) is False
+
+
+def test_non_tail_call_result_is_used():
+
+    env = create_global_env()
+
+    seval(("define", "incr", ("x",), ("+", "x", 1)), env)
+    seval(("define", "twice_incr", ("x",), ("incr", ("incr", "x"))), env)
+
+    assert seval(("twice_incr", 1), env) == 3
+    assert env["twice_incr"](5) == 7
+
+
+def test_internal_definitions():
+
+    env = create_global_env()
+
+    seval(
+        (
+            "define",
+            "f",
+            ("x",),
+            (
+                "begin",
+                (
+                    "define",
+                    "is_even",
+                    ("n",),
+                    ("if", "n", ("is_odd", ("-", "n", 1)), True),
+                ),
+                (
+                    "define",
+                    "is_odd",
+                    ("n",),
+                    ("if", "n", ("is_even", ("-", "n", 1)), False),
+                ),
+                ("define", "y", ("+", "x", 1)),
+                ("is_even", "y"),
+            ),
+        ),
+        env,
+    )
+
+    assert seval(("f", 3), env) is True
+    assert seval(("f", 4), env) is False
+
+    # Internal definitions do not leak into the global environment
+    with pytest.raises(KeyError):
+        seval("y", env)
+
+
+def test_internal_definition_used_before_evaluated():
+
+    env = create_global_env()
+
+    seval(("define", "f", (), ("begin", ("+", "y", 1), ("define", "y", 1))), env)
+
+    with pytest.raises(KeyError):
+        seval(("f",), env)
+
+
+def test_internal_definition_of_parameter():
+
+    env = create_global_env()
+
+    seval(("define", "f", ("x",), ("begin", ("define", "x", 1), "x")), env)
+
+    with pytest.raises(Exception, match="already defined"):
+        seval(("f", 2), env)
+
+
+def test_let_assignment_cannot_see_later_assignments():
+
+    env = create_global_env()
+    seval(("define", "y", 100), env)
+
+    exp = ("let", (("x", "y"), ("y", 1)), ("+", "x", "y"))
+
+    assert seval(exp, env) == 101
+
+
+LET_CLOSURE_PROGRAMS = (
+    ("(let ((fact (lambda (n) (if n (* n (fact (- n 1))) 1)))) (fact 5))", 120),
+    ("(let ((f (lambda () y)) (y 1)) (f))", 1),
+    (
+        """
+        (define parity (n)
+          (let ((even (lambda (i) (if i (odd (- i 1)) #true)))
+                (odd (lambda (i) (if i (even (- i 1)) #false))))
+            (even n)))
+        (parity 7)
+        """,
+        False,
+    ),
+    ("(define y 100) (define f (x) (let ((a y) (y x)) (+ a y))) (f 1)", 101),
+)
+
+
+@pytest.mark.parametrize("source,result", LET_CLOSURE_PROGRAMS)
+def test_let_lambdas_can_refer_to_themselves_and_later_assignments(source, result):
+    env = create_global_env()
+    value = None
+    for exp in parse(source):
+        value = seval(exp, env)
+
+    assert value == result
+
+
+def test_nested_closures_over_let_and_procedure_frames():
+
+    env = create_global_env()
+
+    seval(
+        (
+            "define",
+            "make_adder",
+            ("a",),
+            ("let", (("b", ("*", "a", 10)),), ("lambda", ("c",), ("+", "a", "b", "c"))),
+        ),
+        env,
+    )
+    seval(("define", "add_3_and_30", ("make_adder", 3)), env)
+
+    env["+"] = lambda *args: sum(args)
+
+    assert seval(("add_3_and_30", 1), env) == 34
+    assert seval(("add_3_and_30", 2), env) == 35
+
+
+def test_partial_application_of_partial_application():
+
+    env = create_global_env()
+
+    seval(("define", "f", ("x", "y", "z"), ("-", ("-", "x", "y"), "z")), env)
+
+    assert seval(((("f", 10), 2), 3), env) == 5
+    assert seval((("f", 10, 2), 3), env) == 5
+    assert seval((("f", 10), 2, 3), env) == 5
+
+    with pytest.raises(Exception, match="Arity error, expected 2, got 3"):
+        seval((("f", 10), 1, 2, 3), env)
+
+
+def test_global_inline_cache():
+    env = create_global_env()
+    seval(("define", "double", ("x",), ("+", "x", "x")), env)
+    double = env["double"]
+
+    assert double(1) == 2
+    [plus_site] = [
+        cache
+        for cache in interpreter.inline_caches()
+        if cache.name == "+" and cache.env is env
+    ]
+    assert (plus_site.hits, plus_site.misses) == (0, 1)
+
+    assert double(2) == 4
+    assert double(3) == 6
+    assert (plus_site.hits, plus_site.misses) == (2, 1)
+
+    # Redefining the variable invalidates the cache
+    env["+"] = lambda x, y: x * y
+    assert double(3) == 9
+    assert (plus_site.hits, plus_site.misses) == (2, 2)
+    assert double(4) == 16
+    assert (plus_site.hits, plus_site.misses) == (3, 2)
+
+
+def test_inline_cache_in_enclosing_environment_is_not_cached():
+    enclosing = create_global_env()
+    env = Environment(enclosing)
+    symbol = analyze("+")
+
+    assert symbol.seval(env) is enclosing["+"]
+    enclosing["+"] = max
+    assert symbol.seval(env) is max
+    assert symbol.misses == 2
+
+
+def test_inline_cache_stats():
+    env = create_global_env()
+    seval(("define", "double", ("x",), ("+", "x", "x")), env)
+    hits, misses = interpreter.inline_cache_stats()
+
+    env["double"](1)
+    env["double"](1)
+
+    assert interpreter.inline_cache_stats() == (hits + 1, misses + 1)
+
+
+def test_inline_cache_stats_include_collected_caches():
+    env = create_global_env()
+    seval(("define", "double", ("x",), ("+", "x", "x")), env)
+    env["double"](1)
+    env["double"](1)
+    hits, misses = interpreter.inline_cache_stats()
+
+    del env
+    gc.collect()
+
+    assert interpreter.inline_cache_stats() == (hits, misses)
+
+
+def test_procedure_introspection():
+    env = create_global_env()
+    seval(("define", "add3", ("x", "y", "z"), ("+", "x", ("+", "y", "z"))), env)
+    add3 = env["add3"]
+
+    assert add3.name == "add3"
+    assert add3.params == ("x", "y", "z")
+    assert add3.arity == 3
+    assert repr(add3) == "<procedure add3 (x y z)>"
+    assert not hasattr(add3, "__dict__")
+
+    add_to_1 = add3(1)
+    assert add_to_1.params == ("y", "z")
+    assert add_to_1.arity == 2
+    assert repr(add_to_1) == "<procedure add3 (y z)>"
+
+    assert repr(seval(("lambda", (), 1), env)) == "<procedure <lambda> ()>"
+
+
+@pytest.mark.parametrize("n_args", range(6))
+def test_calls_of_each_arity(n_args):
+    env = create_global_env()
+    params = tuple(f"x{i}" for i in range(n_args))
+    seval(("define", "f", params, ("begin", 0, *params)), env)
+    args = tuple(range(1, n_args + 1))
+
+    assert seval(("f", *args), env) == (args[-1] if args else 0)
+    with pytest.raises(Exception, match="Arity error"):
+        seval(("f", *args, 0), env)
+
+
+def test_procedure_with_internal_definitions_and_partial_application():
+    env = create_global_env()
+    seval(
+        (
+            "define",
+            "f",
+            ("x", "y"),
+            ("begin", ("define", "z", ("+", "x", "y")), ("*", "z", "z")),
+        ),
+        env,
+    )
+
+    assert seval(("f", 1, 2), env) == 9
+    assert seval((("f", 1), 2), env) == 9
+    with pytest.raises(Exception, match="Arity error, expected 1, got 2"):
+        seval((("f", 1), 2, 3), env)
+
+
+def test_let_within_procedure_shares_its_frame():
+    scope = interpreter.Scope(("a",))
+    let_scope = interpreter.Scope(("b",), scope, shares_frame=True)
+    inner_let_scope = interpreter.Scope(("c",), let_scope, shares_frame=True)
+
+    assert inner_let_scope.resolve("a") == (0, 0, False)
+    assert inner_let_scope.resolve("c") == (0, 2, False)
+    assert scope.size == 3
+
+    env = create_global_env()
+    seval(
+        (
+            "define",
+            "f",
+            ("x",),
+            ("let", (("y", ("+", "x", 1)),), ("let", (("z", ("*", "y", 2)),), "z")),
+        ),
+        env,
+    )
+
+    assert env["f"].lambda_expression._frame_size == 3
+    assert seval(("f", 1), env) == 4
+    assert seval(("f", 2), env) == 6
+
+
+def test_closure_captures_only_the_variables_it_uses():
+    env = create_global_env()
+    seval(
+        (
+            "define",
+            "make_adder",
+            ("a", "unused"),
+            ("let", (("b", ("*", "a", 10)),), ("lambda", ("c",), ("+", "b", "c"))),
+        ),
+        env,
+    )
+    add_30 = seval(("make_adder", 3, 0), env)
+
+    assert add_30.lambda_expression.captured_names == ("b",)
+    assert add_30.env.values == [30]
+    assert add_30.env.enclosing is env
+    assert add_30(1) == 31
+
+
+def test_nested_closures_capture_through_enclosing_closures():
+    env = create_global_env()
+    seval(
+        (
+            "define",
+            "f",
+            ("a",),
+            ("lambda", ("b",), ("lambda", ("c",), ("+", "a", "c"))),
+        ),
+        env,
+    )
+    middle = seval(("f", 1), env)
+    inner = middle(2)
+
+    assert middle.lambda_expression.captured_names == ("a",)
+    assert inner.lambda_expression.captured_names == ("a",)
+    assert inner(3) == 4
+
+
+def test_closure_without_free_variables_captures_nothing():
+    env = create_global_env()
+    seval(("define", "f", ("a",), ("lambda", ("b",), ("*", "b", "b"))), env)
+    square = seval(("f", 1), env)
+
+    assert square.lambda_expression.is_top_level
+    assert square.env is env
+    assert square(3) == 9
+
+
+def test_closure_over_internal_definitions_captures_the_frame():
+    env = create_global_env()
+    seval(
+        (
+            "define",
+            "f",
+            ("n",),
+            (
+                "begin",
+                ("define", "get", ("lambda", (), "later")),
+                ("define", "later", ("*", "n", 2)),
+                "get",
+            ),
+        ),
+        env,
+    )
+    get = seval(("f", 4), env)
+
+    assert get.lambda_expression.captured_names is None
+    assert get() == 8
+
+
+@pytest.mark.parametrize(
+    "exp,result",
+    (
+        (("=", 1, 1), True),
+        (("=", 1, 2), False),
+        (("<", 1, 2), True),
+        ((">", 1, 2), False),
+        (("<=", 2, 2), True),
+        ((">=", 1, 2), False),
+    ),
+)
+def test_comparisons(exp, result):
+    assert seval(exp, create_global_env()) is result
@@ -0,0 +1,149 @@
+import pytest
+
+from scheme import jit
+from scheme.interpreter import create_global_env, seval
+from scheme.parser import parse
+
+THRESHOLD = 5
+
+
+@pytest.fixture(autouse=True)
+def enabled_jit():
+    jit.enable(THRESHOLD, guard_failures=3)
+    yield
+    jit.disable()
+    jit.reset_stats()
+
+
+def evaluate_all(source, env):
+    result = None
+    for exp in parse(source):
+        result = seval(exp, env)
+    return result
+
+
+def stats_for(name):
+    [stats] = [s for s in jit.stats() if s.name == name]
+    return stats
+
+
+def test_hot_procedure_is_compiled():
+    env = create_global_env()
+    evaluate_all("(define add (x y) (+ x y))", env)
+
+    for i in range(THRESHOLD - 1):
+        assert env["add"](i, 1) == i + 1
+    assert jit.stats() == []
+
+    for i in range(10):
+        assert env["add"](i, 2) == i + 2
+
+    stats = stats_for("add")
+    assert stats.state == jit.COMPILED
+    assert stats.interpreted_calls == THRESHOLD
+    assert stats.compiled_calls == 9
+
+
+def test_compiled_recursion():
+    env = create_global_env()
+    evaluate_all(
+        """
+        (define fib (n)
+            (if n (if (- n 1) (+ (fib (- n 1)) (fib (- n 2))) 1) 0))
+        (define loop (n acc) (if n (loop (- n 1) (+ acc 1)) acc))
+        """,
+        env,
+    )
+
+    assert seval(("fib", 15), env) == 610
+    assert seval(("loop", 10000, 0), env) == 10000
+    assert stats_for("fib").state == jit.COMPILED
+    assert stats_for("loop").state == jit.COMPILED
+
+
+def test_partial_application_of_compiled_procedure():
+    env = create_global_env()
+    evaluate_all("(define add (x y) (+ x y))", env)
+    for i in range(THRESHOLD):
+        env["add"](i, 1)
+
+    assert seval((("add", 1), 2), env) == 3
+    assert stats_for("add").compiled_calls == 1
+
+
+def test_guard_failure_falls_back_to_interpreter_then_deoptimizes():
+    env = create_global_env()
+    env.define("cat", lambda a, b: a + b)
+    evaluate_all("(define twice (x) (+ x x))", env)
+    for i in range(THRESHOLD):
+        env["twice"](i)
+
+    assert env["twice"](2.5) == 5.0
+    assert stats_for("twice").guard_failures == 0
+
+    assert env["twice"](True) == 2
+    assert stats_for("twice").guard_failures == 1
+    assert stats_for("twice").state == jit.COMPILED
+
+    env["twice"](False)
+    env["twice"](False)
+    assert stats_for("twice").state == jit.DEOPTIMIZED
+
+    assert env["twice"](3) == 6
+    assert stats_for("twice").compiled_calls == 1
+
+
+def test_redefined_arithmetic_fails_guard():
+    env = create_global_env()
+    evaluate_all("(define add (x y) (+ x y))", env)
+    for i in range(THRESHOLD):
+        env["add"](i, 1)
+
+    env["+"] = lambda x, y: x * y
+
+    assert env["add"](3, 4) == 12
+    assert stats_for("add").guard_failures == 1
+
+
+def test_uncompilable_procedure_stays_interpreted():
+    env = create_global_env()
+    evaluate_all("(define f (x) (begin (define y x) y))", env)
+    for i in range(THRESHOLD + 1):
+        assert env["f"](i) == i
+
+    stats = stats_for("f")
+    assert stats.state == jit.NOT_COMPILABLE
+    assert stats.reason
+
+
+def test_nested_lambdas_are_not_compiled():
+    env = create_global_env()
+    evaluate_all("(define make_adder (x) (lambda (y) (+ x y)))", env)
+    add1 = env["make_adder"](1)
+    for i in range(THRESHOLD + 1):
+        assert add1(i) == i + 1
+
+    stats = stats_for("<lambda>")
+    assert stats.state == jit.NOT_COMPILABLE
+
+
+def test_disabled_jit_does_not_count_calls():
+    jit.disable()
+    env = create_global_env()
+    evaluate_all("(define add (x y) (+ x y))", env)
+    for i in range(THRESHOLD * 2):
+        env["add"](i, 1)
+
+    assert jit.stats() == []
+    assert not jit.is_enabled()
+
+
+def test_format_stats():
+    env = create_global_env()
+    evaluate_all("(define add (x y) (+ x y))", env)
+    for i in range(THRESHOLD + 1):
+        env["add"](i, 1)
+
+    report = jit.format_stats()
+    assert "add" in report
+    assert jit.COMPILED in report
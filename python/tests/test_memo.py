@@ -0,0 +1,138 @@
+import pytest
+
+from scheme import memo
+from scheme.interpreter import create_global_env, seval
+from scheme.parser import parse
+
+FIB = """
+(define-memo fib (n)
+  (if (- n 1)
+      (if (- n 2) (+ (fib (- n 1)) (fib (- n 2))) 1)
+      1))
+"""
+
+
+def evaluate_all(source, env):
+    result = None
+    for exp in parse(source):
+        result = seval(exp, env)
+    return result
+
+
+def test_define_memo_computes_each_call_once():
+    env = create_global_env()
+    evaluate_all(FIB, env)
+
+    assert evaluate_all("(fib 60)", env) == 1548008755920
+    cache = env["fib"].cache
+    assert (cache.misses, cache.hits) == (60, 57)
+
+    assert evaluate_all("(fib 60)", env) == 1548008755920
+    assert (cache.misses, cache.hits) == (60, 58)
+
+
+def test_least_recently_used_results_are_evicted():
+    env = create_global_env()
+    evaluate_all("(define-memo square 2 (x) (* x x))", env)
+    cache = env["square"].cache
+
+    evaluate_all("(square 1) (square 2) (square 1) (square 3)", env)
+    assert (len(cache), cache.evictions) == (2, 1)
+
+    evaluate_all("(square 1)", env)
+    assert cache.hits == 2
+    evaluate_all("(square 2)", env)
+    assert cache.misses == 4
+
+
+@pytest.mark.parametrize("size", ["0", "1.5", "#true", "(2)"])
+def test_cache_size_must_be_a_positive_integer(size):
+    with pytest.raises(Exception, match="Invalid define-memo cache size"):
+        evaluate_all(f"(define-memo square {size} (x) (* x x))", create_global_env())
+
+
+def test_memo_clear():
+    env = create_global_env()
+    evaluate_all(FIB, env)
+    evaluate_all("(fib 10)", env)
+    cache = env["fib"].cache
+
+    evaluate_all("(memo-clear fib)", env)
+    assert len(cache) == 0
+    assert evaluate_all("(fib 10)", env) == 55
+    assert cache.misses == 20
+
+    with pytest.raises(Exception, match="not memoized"):
+        evaluate_all("(memo-clear +)", env)
+
+
+def test_partial_application_shares_the_cache():
+    env = create_global_env()
+    evaluate_all("(define-memo add (x y) (+ x y))", env)
+    cache = env["add"].cache
+
+    assert evaluate_all("((add 1) 2)", env) == 3
+    assert evaluate_all("(add 1 2)", env) == 3
+    assert evaluate_all("(define add1 (add 1)) (add1 2)", env) == 3
+    assert (cache.misses, cache.hits) == (1, 2)
+    assert env["add1"].arity == 1
+
+    with pytest.raises(Exception, match="Arity error, expected 1, got 2"):
+        evaluate_all("(add1 2 3)", env)
+
+
+def test_memoize_builtin():
+    env = create_global_env()
+    evaluate_all("(define mul (x y) (* x y))", env)
+    evaluate_all("(define fast_mul (memoize mul 10))", env)
+    fast_mul = env["fast_mul"]
+
+    assert evaluate_all("(fast_mul 3 4)", env) == 12
+    assert evaluate_all("((fast_mul 3) 4)", env) == 12
+    assert (fast_mul.name, fast_mul.cache.maxsize) == ("mul", 10)
+    assert fast_mul.cache.hits == 1
+
+
+def test_arguments_are_cached_by_type():
+    calls = []
+
+    def identity(x):
+        calls.append(x)
+        return x
+
+    memoized = memo.memoize(identity)
+
+    assert memoized(1) == 1
+    assert memoized(True) is True
+    assert memoized(1.0) == 1.0
+    assert len(calls) == 3
+
+
+def test_unhashable_arguments_are_not_cached():
+    memoized = memo.memoize(len)
+
+    assert memoized([1, 2]) == 2
+    assert memoized([1, 2]) == 2
+    assert (memoized.cache.uncached, len(memoized.cache)) == (2, 0)
+
+
+def test_internal_define_memo():
+    env = create_global_env()
+    evaluate_all(
+        """
+        (define count (n)
+          (begin
+            (define-memo c (k) (if k (+ 1 (c (- k 1))) 0))
+            (c n)))
+        """,
+        env,
+    )
+    assert evaluate_all("(count 20)", env) == 20
+
+
+def test_format_stats():
+    env = create_global_env()
+    evaluate_all("(define-memo stats_test (x) x) (stats_test 1) (stats_test 1)", env)
+
+    [line] = [line for line in memo.format_stats().splitlines() if "stats_test" in line]
+    assert line.split() == ["stats_test", "1/10000", "1", "1", "0", "0"]
@@ -0,0 +1,96 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+
+import pytest
+
+from scheme import parallel
+from scheme.interpreter import create_global_env, seval
+from scheme.parser import parse
+
+pytestmark = pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="parallel evaluation forks its workers",
+)
+
+
+@pytest.fixture(autouse=True)
+def two_workers():
+    parallel.configure(2)
+    yield
+    parallel.configure()
+
+
+def evaluate_all(source, env):
+    result = None
+    for exp in parse(source):
+        result = seval(exp, env)
+    return result
+
+
+def test_future_and_touch():
+    env = create_global_env()
+    evaluate_all("(define square (x) (* x x))", env)
+
+    assert (
+        evaluate_all("(+ (touch (future square 3)) (touch (future square 4)))", env)
+        == 25
+    )
+    assert evaluate_all("(touch 7)", env) == 7
+
+
+def test_pmap():
+    env = create_global_env()
+    evaluate_all("(define add (x y) (+ x y))", env)
+
+    assert list(env["pmap"](env["add"], (1, 2, 3), (10, 20, 30))) == [11, 22, 33]
+    assert list(env["pmap"](env["+"], (1, 2), (3, 4))) == [4, 6]
+
+
+def test_closures_are_sent_by_value():
+    env = create_global_env()
+    evaluate_all("(define make_adder (x) (lambda (y) (+ x y)))", env)
+
+    assert evaluate_all("(touch (future (make_adder 5) 10))", env) == 15
+    assert evaluate_all("(touch (future (lambda (x) (* x 3)) 2))", env) == 6
+
+
+def test_workers_see_later_definitions():
+    env = create_global_env()
+    evaluate_all("(define double (x) (* 2 x))", env)
+    assert evaluate_all("(touch (future double 4))", env) == 8
+
+    evaluate_all("(define quadruple (x) (double (double x)))", env)
+    assert evaluate_all("(touch (future quadruple 4))", env) == 16
+
+
+def test_errors_name_the_failing_application():
+    env = create_global_env()
+    evaluate_all("(define divide (x y) (/ x y))", env)
+
+    with pytest.raises(parallel.ParallelError, match=r"\(divide 1 0\): division"):
+        evaluate_all("(touch (future divide 1 0))", env)
+    with pytest.raises(parallel.ParallelError, match=r"\(divide 2 0\)"):
+        env["pmap"](env["divide"], (1, 2), (1, 0))
+
+
+def test_results_which_are_globals_are_returned_by_reference():
+    env = create_global_env()
+    evaluate_all("(define identity (x) x) (define square (x) (* x x))", env)
+
+    assert evaluate_all("(touch (future identity square))", env) is env["square"]
+
+
+def test_parallel_is_imported_when_its_builtins_are_first_called():
+    check = (
+        "import sys; from scheme.interpreter import create_global_env, seval;"
+        " env = create_global_env(); assert 'scheme.parallel' not in sys.modules;"
+        " seval(('touch', 1), env); assert 'scheme.parallel' in sys.modules"
+    )
+
+    subprocess.run(
+        [sys.executable, "-c", check],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        check=True,
+    )
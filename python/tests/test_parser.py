@@ -1,6 +1,17 @@
+import io
+import sys
+
 import pytest
 
-from scheme.parser import parse
+from scheme.parser import (
+    parse,
+    read_chunks,
+    read_stream,
+    HashConsTable,
+    tokenize,
+    MissingClosingParenError,
+    Reader,
+)
 
 
 @pytest.mark.parametrize(
@@ -35,6 +46,10 @@ from scheme.parser import parse
         ("#true", [True]),
         ("#false", [False]),
         ("(#true b (c #false))", [(True, "b", ("c", False))]),
+        ("-12 +3 1.5 .5 1. -2.5e3 1E2", [-12, 3, 1.5, 0.5, 1.0, -2500.0, 100.0]),
+        ("- + . 1+ 2x -a #true? #t", ["-", "+", ".", "1+", "2x", "-a", "#true?", "#t"]),
+        ("1_000 nan inf", ["1_000", "nan", "inf"]),
+        ("(a(b)c)", [("a", ("b",), "c")]),
     ),
 )
 def test_parser_on_valid_inputs(input, parsed):
@@ -63,3 +78,111 @@ def test_parser_on_mismatched_parens(input, error_message):
     with pytest.raises(SyntaxError) as e:
         parse(input)
     assert error_message in str(e.value)
+
+
+SOURCE = "(define fib (n)\n  (if n (+ (fib (- n 1)) 12.5) #false))\nfoo (bar [1 2])"
+
+
+@pytest.mark.parametrize("chunk_size", (1, 2, 3, 7, len(SOURCE)))
+def test_reader_on_chunks(chunk_size):
+    chunks = [SOURCE[i : i + chunk_size] for i in range(0, len(SOURCE), chunk_size)]
+    assert list(read_chunks(chunks)) == parse(SOURCE)
+
+
+def test_reader_yields_expressions_as_they_close():
+    reader = Reader()
+
+    assert reader.feed("(a (b") == []
+    assert reader.depth == 2
+    assert reader.feed(" c)) (d") == [("a", ("b", "c"))]
+    assert reader.feed(") 12") == [("d",)]
+    assert reader.feed("3") == []
+    assert reader.close() == [123]
+
+
+def test_reader_on_missing_closing_paren():
+    reader = Reader()
+    reader.feed("(a b")
+    with pytest.raises(MissingClosingParenError):
+        reader.close()
+
+
+def test_read_stream():
+    assert list(read_stream(io.StringIO(SOURCE), chunk_size=4)) == parse(SOURCE)
+
+
+def test_tokenize_positions():
+    tokens = list(tokenize("(define x\n  [+ 1 2.5])"))
+
+    assert [(t.text, t.line, t.column) for t in tokens] == [
+        ("(", 1, 1),
+        ("define", 1, 2),
+        ("x", 1, 9),
+        ("[", 2, 3),
+        ("+", 2, 4),
+        ("1", 2, 6),
+        ("2.5", 2, 8),
+        ("]", 2, 11),
+        (")", 2, 12),
+    ]
+    assert tokens[1].end == (1, 8)
+    assert tokens[6].value == 2.5
+    assert tokens[0].is_opener and tokens[8].is_closer
+
+
+@pytest.mark.parametrize(
+    "input, error_message",
+    (
+        ("(a)\n  (b))", "Unmatched ) at line 2, column 6"),
+        (
+            "(a\n [b c}",
+            "Expected closing ']' at line 2, column 6 for [ opened at line 2, column 2",
+        ),
+        ("(a)\n (b\n (c)", "Missing expected ) for ( opened at line 2, column 2"),
+    ),
+)
+@pytest.mark.parametrize("chunk_size", (1, 4, 100))
+def test_error_positions(input, error_message, chunk_size):
+    chunks = [input[i : i + chunk_size] for i in range(0, len(input), chunk_size)]
+    with pytest.raises(SyntaxError) as e:
+        list(read_chunks(chunks))
+    assert str(e.value) == error_message
+
+
+def test_symbols_are_interned():
+    first, second = parse("(define foo-bar 1) (display foo-bar)")
+
+    assert first[1] is second[1]
+    assert first[1] is sys.intern("foo-bar")
+
+
+def test_hash_consing_shares_identical_expressions():
+    first, second = parse("(f (- n 1) 2.5) (g (- n 1) 2.5)", hash_cons=True)
+
+    assert first[1] is second[1]
+    assert first[2] is second[2]
+
+
+def test_hash_consing_keeps_equal_atoms_of_different_types_apart():
+    exps = parse("(f 1) (f 1.0) (f #true) (f 0.0) (f -0.0) ((f 1)) ((f 1.0))", True)
+
+    assert exps == [
+        ("f", 1),
+        ("f", 1.0),
+        ("f", True),
+        ("f", 0.0),
+        ("f", -0.0),
+        (("f", 1),),
+        (("f", 1.0),),
+    ]
+    assert [type(exp[1]) for exp in exps[:3]] == [int, float, bool]
+    assert str(exps[4][1]) == "-0.0"
+    assert type(exps[6][0][1]) is float
+
+
+def test_hash_cons_table_shared_between_reads():
+    table = HashConsTable()
+    [first] = read_chunks(["(a (b c))"], table)
+    [second] = read_chunks(["(d (b c))"], table)
+
+    assert first[1] is second[1]
@@ -0,0 +1,120 @@
+import pytest
+
+from scheme import interpreter, profiler
+from scheme.interpreter import create_global_env, seval
+from scheme.parser import parse
+
+
+@pytest.fixture(autouse=True)
+def enabled_profiler():
+    profiler.enable()
+    yield
+    profiler.disable()
+    profiler.reset_stats()
+
+
+def evaluate_all(source, env):
+    result = None
+    for exp in parse(source):
+        result = seval(exp, env)
+    return result
+
+
+def stats_for(name):
+    [stats] = [s for s in profiler.stats() if s.name == name]
+    return stats
+
+
+def test_calls_are_counted_per_procedure():
+    env = create_global_env()
+    result = evaluate_all(
+        """
+        (define fib (n) (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2)))))
+        (define double (x) (* 2 x))
+        (double (fib 10))
+        """,
+        env,
+    )
+
+    assert result == 110
+    assert stats_for("fib").calls == 177
+    assert stats_for("double").calls == 1
+
+
+def test_exclusive_time_excludes_callees():
+    env = create_global_env()
+    evaluate_all(
+        """
+        (define inner (n) (if n (inner (- n 1)) 0))
+        (define outer () (+ (inner 1000) 1))
+        (outer)
+        """,
+        env,
+    )
+    inner, outer = stats_for("inner"), stats_for("outer")
+
+    assert outer.inclusive_time == pytest.approx(
+        inner.inclusive_time + outer.exclusive_time
+    )
+    assert outer.exclusive_time < inner.exclusive_time
+
+
+def test_recursive_calls_are_counted_once_in_inclusive_time():
+    env = create_global_env()
+    evaluate_all(
+        "(define fib (n) (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2))))) (fib 12)",
+        env,
+    )
+    fib = stats_for("fib")
+
+    assert fib.inclusive_time == pytest.approx(fib.exclusive_time)
+
+
+def test_partial_application_is_not_a_call():
+    env = create_global_env()
+    evaluate_all("(define add (x y) (+ x y)) ((add 1) 2)", env)
+
+    assert stats_for("add").calls == 1
+
+
+def test_collapsed_stacks():
+    env = create_global_env()
+    evaluate_all(
+        """
+        (define leaf () (begin 1 2 3))
+        (define branch () (+ (leaf) (leaf)))
+        (define loop (n) (if n (begin (branch) (loop (- n 1))) 0))
+        (loop 200)
+        """,
+        env,
+    )
+    stacks = dict(line.rsplit(" ", 1) for line in profiler.collapsed_stacks())
+
+    assert set(stacks) <= {"loop", "loop;branch", "loop;branch;leaf"}
+    assert "loop;branch;leaf" in stacks
+    assert all(int(microseconds) > 0 for microseconds in stacks.values())
+
+
+def test_report_is_sorted():
+    env = create_global_env()
+    evaluate_all(
+        """
+        (define often (n) n)
+        (define rarely (n) (+ (often n) (+ (often n) (often n))))
+        (rarely 1)
+        """,
+        env,
+    )
+    lines = profiler.format_stats(sort="calls").splitlines()
+
+    assert lines[1].split()[:2] == ["often", "3"]
+    assert lines[2].split()[:2] == ["rarely", "1"]
+
+
+def test_disabled_profiler_records_nothing():
+    profiler.disable()
+    env = create_global_env()
+    evaluate_all("(define f (x) x) (f 1)", env)
+
+    assert interpreter.profile_hook is None
+    assert profiler.stats() == []
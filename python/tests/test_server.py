@@ -0,0 +1,139 @@
+import asyncio
+
+from scheme.parser import parse
+from scheme.server import EvaluationServer, request
+
+
+def serve(test, **server_args):
+    """
+    Run a coroutine function with a server and a function which
+    connects to it
+    """
+
+    async def run():
+        evaluation_server = EvaluationServer(**server_args)
+        server = await evaluation_server.start_tcp()
+        port = server.sockets[0].getsockname()[1]
+        try:
+            await test(lambda: asyncio.open_connection("127.0.0.1", port))
+        finally:
+            server.close()
+            await server.wait_closed()
+            evaluation_server.close()
+
+    asyncio.run(run())
+
+
+def test_session():
+    async def test(connect):
+        reader, writer = await connect()
+        assert await request(reader, writer, "(+ 1 2)") == ([], "ok 3")
+        assert await request(reader, writer, "(define x 5)") == ([], "ok")
+        assert await request(reader, writer, "(display (* x x))") == (["25"], "ok")
+        writer.close()
+
+    serve(test)
+
+
+def test_input_continues_until_parens_are_closed():
+    async def test(connect):
+        reader, writer = await connect()
+        assert await request(reader, writer, "(define f (x)") == ([], "more")
+        assert await request(reader, writer, "(* x 2))") == ([], "ok")
+        assert await request(reader, writer, "(f 4)") == ([], "ok 8")
+        writer.close()
+
+    serve(test)
+
+
+def test_errors_are_reported_and_the_session_continues():
+    async def test(connect):
+        reader, writer = await connect()
+        _, status = await request(reader, writer, "(undefined 1)")
+        assert status.startswith("error")
+        assert await request(reader, writer, "(+ 1 1)") == ([], "ok 2")
+        writer.close()
+
+    serve(test)
+
+
+def test_sessions_have_their_own_environments_with_the_prelude():
+    async def test(connect):
+        reader1, writer1 = await connect()
+        reader2, writer2 = await connect()
+        await request(reader1, writer1, "(define x 1)")
+        _, status = await request(reader2, writer2, "x")
+        assert status.startswith("error")
+        assert await request(reader2, writer2, "(double 21)") == ([], "ok 42")
+        writer1.close()
+        writer2.close()
+
+    serve(test, prelude=parse("(define double (x) (* 2 x))"))
+
+
+def test_prelude_procedures_see_the_definitions_of_the_session():
+    async def test(connect):
+        reader, writer = await connect()
+        await request(reader, writer, "(define handler (x) (* x 2))")
+        assert await request(reader, writer, "(run-handler 21)") == ([], "ok 42")
+        writer.close()
+
+    serve(test, prelude=parse("(define run-handler (x) (handler x))"))
+
+
+def test_lines_which_cannot_be_read_are_errors_and_the_session_continues():
+    async def test(connect):
+        reader, writer = await connect()
+        writer.write(b"(+ 1 \xff)\n")
+        assert (await reader.readline()).startswith(b"error 'utf-8' codec")
+        _, status = await request(reader, writer, f"(+ 1 {' ' * 70000} 2)")
+        assert status == "error The line is longer than the server's limit"
+        assert await request(reader, writer, "(+ 1 2)") == ([], "ok 3")
+        writer.close()
+
+    serve(test)
+
+
+def test_slow_session_does_not_stall_others():
+    async def test(connect):
+        slow_reader, slow_writer = await connect()
+        fast_reader, fast_writer = await connect()
+        await request(
+            slow_reader,
+            slow_writer,
+            "(define loop (n acc) (if n (loop (- n 1) (+ acc 1)) acc))",
+        )
+        slow = asyncio.create_task(request(slow_reader, slow_writer, "(loop 200000 0)"))
+        await asyncio.sleep(0.05)
+
+        assert await request(fast_reader, fast_writer, "(+ 1 2)") == ([], "ok 3")
+        assert not slow.done()
+        assert await slow == ([], "ok 200000")
+        slow_writer.close()
+        fast_writer.close()
+
+    serve(test)
+
+
+def test_evaluations_are_refused_while_every_thread_is_busy():
+    async def test(connect):
+        slow_reader, slow_writer = await connect()
+        fast_reader, fast_writer = await connect()
+        await request(
+            slow_reader,
+            slow_writer,
+            "(define loop (n acc) (if n (loop (- n 1) (+ acc 1)) acc))",
+        )
+        slow = asyncio.create_task(request(slow_reader, slow_writer, "(loop 200000 0)"))
+        await asyncio.sleep(0.05)
+
+        assert await request(fast_reader, fast_writer, "(+ 1 2)") == (
+            [],
+            "error The server is busy, try again later",
+        )
+        assert await slow == ([], "ok 200000")
+        assert await request(fast_reader, fast_writer, "(+ 1 2)") == ([], "ok 3")
+        slow_writer.close()
+        fast_writer.close()
+
+    serve(test, max_workers=1, max_queued=0)
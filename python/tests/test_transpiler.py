@@ -0,0 +1,162 @@
+import pytest
+
+from scheme import interpreter
+from scheme.interpreter import create_global_env, register_special_form, seval
+from scheme.parser import parse
+from scheme.transpiler import (
+    generate_source,
+    py_seval,
+    transpile_procedure,
+    CompiledProcedure,
+    TranspileError,
+)
+
+
+def define_all(source, env):
+    for exp in parse(source):
+        py_seval(exp, env)
+
+
+@pytest.mark.parametrize(
+    "definition,call,result",
+    (
+        ("(define add (x y) (+ x y))", "(add 1 2)", 3),
+        ("(define add (lambda (x y) (+ x y)))", "(add 1 2)", 3),
+        ("(define add (x y) (+ x y))", "((add 1) 2)", 3),
+        ("(define k () 7)", "(k)", 7),
+        ("(define f (x) (if x 1 2))", "(f #false)", 2),
+        ("(define f (x) (begin (+ x 1) (* x 2)))", "(f 4)", 8),
+        ("(define f (x) (let ((y (+ x 1)) (z (* y 2))) (- z x)))", "(f 3)", 5),
+        ("(define f (x) (let ((x (+ x 1))) (let ((x (* x 2))) x)))", "(f 3)", 8),
+        ("(define f (x) (+ (let ((y 2)) y) (begin 1 x)))", "(f 3)", 5),
+        ("(define f (x) (lambda (y) (- x y)))", "((f 10) 3)", 7),
+        ("(define f (x y z) (- (- x y) z))", "(((f 10) 2) 3)", 5),
+        ("(define f (x) (/ x 2.5))", "(f 5)", 2.0),
+    ),
+)
+def test_compiled_procedures_agree_with_interpreter(definition, call, result):
+    env = create_global_env()
+    define_all(definition, env)
+
+    name = parse(definition)[0][1]
+    assert isinstance(env[name], CompiledProcedure)
+    assert py_seval(parse(call)[0], env) == result
+
+    interpreter_env = create_global_env()
+    seval(parse(definition)[0], interpreter_env)
+    assert seval(parse(call)[0], interpreter_env) == result
+
+
+def test_self_tail_calls_loop():
+    env = create_global_env()
+    define_all("(define loop (n acc) (if n (loop (- n 1) (+ acc 1)) acc))", env)
+
+    assert "continue" in env["loop"].source
+    assert env["loop"](100000, 0) == 100000
+
+
+def test_mutual_tail_calls_run_in_constant_stack():
+    env = create_global_env()
+    define_all(
+        """
+        (define even (n) (if n (odd (- n 1)) #true))
+        (define odd (n) (if n (even (- n 1)) #false))
+        """,
+        env,
+    )
+
+    assert env["even"](10000) is True
+
+
+def test_tail_calls_between_compiled_and_interpreted_procedures():
+    env = create_global_env()
+    define_all("(define even (n) (if n (odd (- n 1)) #true))", env)
+    seval(parse("(define odd (n) (if n (even (- n 1)) #false))")[0], env)
+
+    assert env["even"](10000) is True
+
+
+def test_redefined_procedure_is_not_called_directly():
+    env = create_global_env()
+    define_all("(define f (n) (if n (f (- n 1)) 0))", env)
+    f = env["f"]
+
+    env["f"] = lambda n: "redefined"
+
+    assert f(3) == "redefined"
+
+
+def test_closures_capture_values_of_looping_parameters():
+    env = create_global_env()
+    env.define("list", lambda *args: args)
+    define_all(
+        """
+        (define make_adders (n acc)
+            (if n
+                (make_adders (- n 1) (list (lambda (x) (+ x n)) acc))
+                acc))
+        """,
+        env,
+    )
+
+    adders = env["make_adders"](2, ())
+    first, (second, _) = adders
+
+    assert first(10) == 11
+    assert second(10) == 12
+
+
+def test_arity_error():
+    env = create_global_env()
+    define_all("(define add (x y) (+ x y))", env)
+
+    with pytest.raises(Exception, match="Arity error, expected 2, got 3"):
+        env["add"](1, 2, 3)
+
+
+def test_falls_back_to_interpreter(monkeypatch):
+    monkeypatch.setattr(interpreter, "SPECIAL_FORMS", dict(interpreter.SPECIAL_FORMS))
+    register_special_form("quote", lambda exp, scope: None)
+
+    env = create_global_env()
+    define_all(
+        """
+        (define internal_define (x) (begin (define y 1) (+ x y)))
+        (define uses_quote (x) (quote x))
+        """,
+        env,
+    )
+
+    assert isinstance(env["internal_define"], interpreter.Procedure)
+    assert env["internal_define"](1) == 2
+    assert isinstance(env["uses_quote"], interpreter.Procedure)
+
+
+def test_cannot_translate_internal_define():
+    with pytest.raises(TranspileError):
+        transpile_procedure(
+            "f", ("x",), ("begin", ("define", "y", 1), "y"), create_global_env()
+        )
+
+
+def test_generated_source_uses_python_locals():
+    source = generate_source("add", ("x", "y"), ("+", "x", "y"))
+
+    assert "def __f(v0, v1):" in source
+    assert "__tail_call(__g['+'], v0, v1)" in source
+
+
+def test_let_lambda_referring_to_later_assignment_is_not_translated():
+    env = create_global_env()
+    define_all(
+        """
+        (define parity (n)
+          (let ((even (lambda (i) (if i (odd (- i 1)) #true)))
+                (odd (lambda (i) (if i (even (- i 1)) #false))))
+            (even n)))
+        """,
+        env,
+    )
+
+    assert not isinstance(env["parity"], CompiledProcedure)
+    assert env["parity"](7) is False
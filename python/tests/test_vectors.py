@@ -0,0 +1,80 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from scheme.interpreter import create_global_env, seval
+from scheme.parser import parse
+
+numpy = pytest.importorskip("numpy")
+
+
+def evaluate_all(source, env):
+    result = None
+    for exp in parse(source):
+        result = seval(exp, env)
+    return result
+
+
+@pytest.fixture
+def env():
+    env = create_global_env()
+    evaluate_all("(define v (vector 1 2 3)) (define w (vector 4 5 6))", env)
+    return env
+
+
+@pytest.mark.parametrize(
+    "source,result",
+    (
+        ("(+ v w)", [5, 7, 9]),
+        ("(- w v)", [3, 3, 3]),
+        ("(- v)", [-1, -2, -3]),
+        ("(* v 2)", [2, 4, 6]),
+        ("(/ w 2)", [2.0, 2.5, 3.0]),
+        ("(< v 2)", [True, False, False]),
+        ("(= v (vector 1 0 3))", [True, False, True]),
+        ("(make-vector 3 7)", [7, 7, 7]),
+    ),
+)
+def test_vectorized_builtins(env, source, result):
+    assert evaluate_all(source, env).tolist() == result
+
+
+def test_reductions(env):
+    assert evaluate_all("(sum v)", env) == 6
+    assert evaluate_all("(dot v w)", env) == 32
+    assert evaluate_all("(vector-length v)", env) == 3
+    assert evaluate_all("(vector-ref w 1)", env) == 5
+    assert type(evaluate_all("(sum v)", env)) is int
+
+
+def test_vector_map(env):
+    assert evaluate_all("(vector-map + v w)", env).tolist() == [5, 7, 9]
+    evaluate_all("(define square (x) (* x x))", env)
+    assert evaluate_all("(vector-map square v)", env).tolist() == [1, 4, 9]
+    assert evaluate_all("(vector-map (lambda (x y) (- y x)) v w)", env).tolist() == [
+        3,
+        3,
+        3,
+    ]
+
+
+def test_vector_map_over_vectors_of_different_lengths(env):
+    evaluate_all("(define add (x y) (+ x y))", env)
+    with pytest.raises(ValueError):
+        evaluate_all("(vector-map add v (vector 1))", env)
+
+
+def test_numpy_is_imported_when_vectors_are_first_used():
+    check = (
+        "import sys; from scheme.interpreter import create_global_env, seval;"
+        " env = create_global_env(); assert 'numpy' not in sys.modules;"
+        " seval(('vector', 1), env); assert 'numpy' in sys.modules"
+    )
+
+    subprocess.run(
+        [sys.executable, "-c", check],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        check=True,
+    )
@@ -0,0 +1,216 @@
+import pytest
+
+from scheme import interpreter
+from scheme.compiler import compile_program, disassemble
+from scheme.interpreter import analyze, create_global_env, register_special_form
+from scheme.parser import parse
+from scheme.vm import vm_seval, run, Closure
+
+
+@pytest.mark.parametrize(
+    "ast,result",
+    (
+        (("+", 1, 2), 3),
+        (("+", ("-", 2, 3), 5), 4),
+        (("/", 12, 5), 2.4),
+        (("and", ("or", True, False), True), True),
+        (("if", ("or", True, False), 1, 3), 1),
+        (("if", False, ("+", 4, 8), ("-", 3)), -3),
+        (("let", (("x", 5), ("y", 4), ("z", ("+", "x", 10))), ("-", "z", "y")), 11),
+        (("let", (), 7), 7),
+        (("begin", ("define", "x", 7), ("define", "y", 8), ("*", "x", "y")), 56),
+        ((("lambda", ("x", "y"), ("+", "x", "y")), 21, 22), 43),
+        (((("lambda", ("x", "y"), ("+", "x", "y")), 21), 22), 43),
+        (((("lambda", ("x",), ("lambda", ("y",), ("*", "x", "y"))), 3), 4), 12),
+        (("begin", ("define", "add", ("x", "y"), ("+", "x", "y")), ("add", 1, 2)), 3),
+        (
+            (
+                ("lambda", ("x",), ("let", (("y", 2),), ("+", ("let", (), "x"), "y"))),
+                1,
+            ),
+            3,
+        ),
+        (("newline",), None),
+    ),
+)
+def test_vm_agrees_with_interpreter(ast, result):
+    assert vm_seval(ast, create_global_env()) == result
+
+
+def test_closures_are_callable_from_python_and_interpreter():
+    env = create_global_env()
+    vm_seval(("define", "add", ("x", "y"), ("+", "x", "y")), env)
+
+    add = env["add"]
+    assert isinstance(add, Closure)
+    assert add(1, 2) == 3
+    assert add(1)(2) == 3
+    assert interpreter.seval(("add", 3, 4), env) == 7
+
+    with pytest.raises(Exception, match="Arity error, expected 2, got 3"):
+        add(1, 2, 3)
+
+
+def test_internal_definitions():
+    env = create_global_env()
+    vm_seval(
+        (
+            "define",
+            "f",
+            ("x",),
+            ("begin", ("define", "g", ("y",), ("+", "x", "y")), ("g", 10)),
+        ),
+        env,
+    )
+    assert vm_seval(("f", 1), env) == 11
+
+    vm_seval(("define", "h", (), ("begin", ("+", "z", 1), ("define", "z", 1))), env)
+    with pytest.raises(KeyError):
+        vm_seval(("h",), env)
+
+
+RECURSION_DEPTH = 20000
+
+
+def test_deep_non_tail_recursion():
+    env = create_global_env()
+    vm_seval(
+        ("define", "count", ("n",), ("if", "n", ("+", 1, ("count", ("-", "n", 1))), 0)),
+        env,
+    )
+    assert vm_seval(("count", RECURSION_DEPTH), env) == RECURSION_DEPTH
+
+
+def test_tail_calls_do_not_grow_the_call_stack():
+    env = create_global_env()
+    vm_seval(
+        (
+            "define",
+            "count",
+            ("n", "acc"),
+            ("if", "n", ("count", ("-", "n", 1), ("+", "acc", 1)), "acc"),
+        ),
+        env,
+    )
+    assert vm_seval(("count", RECURSION_DEPTH, 0), env) == RECURSION_DEPTH
+
+
+def test_falls_back_to_interpreter_for_unknown_special_forms(monkeypatch):
+    monkeypatch.setattr(interpreter, "SPECIAL_FORMS", dict(interpreter.SPECIAL_FORMS))
+
+    class Quote:
+        def __init__(self, value):
+            self._value = value
+
+        def seval(self, env):
+            return self._value
+
+    register_special_form("quote", lambda exp, scope: Quote(exp[1]))
+
+    env = create_global_env()
+    assert vm_seval((("lambda", ("x",), ("quote", "x")), 1), env) == "x"
+
+
+def test_run_program():
+    env = create_global_env()
+    program = parse("(define sq (x) (* x x)) (sq 9)")
+    assert run(compile_program(tuple(program)), env) == 81
+
+
+def test_disassemble():
+    code = compile_program(tuple(parse("(define sq (x) (* x x)) (sq 9)")))
+
+    listing = disassemble(code)
+
+    assert "Disassembly of <program>:" in listing
+    assert "MAKE_CLOSURE" in listing
+    assert "Disassembly of sq:" in listing
+    assert "TAIL_CALL_GLOBAL  (0, 2, (0, 0)) (*)" in listing
+
+
+def test_analyzed_and_compiled_code_share_frames():
+    env = create_global_env()
+    exp = ("let", (("x", 2),), ("*", "x", "x"))
+    assert analyze(exp).seval(env) == vm_seval(exp, env) == 4
+
+
+def test_global_inline_cache():
+    env = create_global_env()
+    code = compile_program(tuple(parse("(+ 1 2)")))
+    [plus_cache] = code.global_caches
+
+    assert run(code, env) == 3
+    assert run(code, env) == 3
+    assert (plus_cache.hits, plus_cache.misses) == (1, 1)
+
+    env["+"] = lambda x, y: x * y
+    assert run(code, env) == 2
+    assert (plus_cache.hits, plus_cache.misses) == (1, 2)
+
+
+def test_let_within_procedure_shares_its_frame():
+    env = create_global_env()
+    code = compile_program(
+        tuple(parse("(define f (x) (let ((y (+ x 1))) (let ((z (* y 2))) z)))"))
+    )
+    listing = disassemble(code)
+
+    assert "PUSH_FRAME" not in listing
+    run(code, env)
+    assert vm_seval(("f", 2), env) == 6
+    assert (
+        vm_seval(("let", (("x", 2),), ("let", (("y", 3),), ("*", "x", "y"))), env) == 6
+    )
+
+
+def test_let_lambdas_can_refer_to_themselves_and_later_assignments():
+    env = create_global_env()
+    source = """
+        (define parity (n)
+          (let ((even (lambda (i) (if i (odd (- i 1)) #true)))
+                (odd (lambda (i) (if i (even (- i 1)) #false))))
+            (even n)))
+        (define y 100)
+        (define f (x) (let ((a y) (y x)) (+ a y)))
+        """
+    for exp in parse(source):
+        vm_seval(exp, env)
+
+    assert vm_seval(parse("(parity 7)")[0], env) is False
+    assert vm_seval(parse("(f 1)")[0], env) == 101
+
+
+def test_calls_of_global_procedures():
+    env = create_global_env()
+    source = """
+        (define count (n acc) (if (< 0 n) (count (- n 1) (+ acc 1)) acc))
+        (define square (x) (* x x))
+        (define two 2)
+        (define apply-two (f) (f two))
+        """
+    for exp in parse(source):
+        vm_seval(exp, env)
+
+    assert vm_seval(parse("(count 5000 0)")[0], env) == 5000
+    assert vm_seval(parse("(apply-two square)")[0], env) == 4
+    assert vm_seval(parse("((lambda (x) (square (+ x 1))) 2)")[0], env) == 9
+    with pytest.raises(Exception, match="Invalid function application"):
+        vm_seval(parse("((lambda (x) (two x 1)) 2)")[0], env)
+    with pytest.raises(Exception, match="Arity error, expected 1, got 2"):
+        vm_seval(parse("((lambda (x) (square x 1)) 2)")[0], env)
+
+
+def test_frames_are_only_created_for_procedures_which_need_them():
+    env = create_global_env()
+    program = parse(
+        """
+        (define square (x) (* x x))
+        (define adder (n) (lambda (x) (+ x n)))
+        """
+    )
+    code = compile_program(tuple(program))
+    run(code, env)
+
+    assert not env["square"].code.needs_frame
+    assert env["adder"].code.needs_frame
+    assert vm_seval(parse("((adder (square 3)) 1)")[0], env) == 10